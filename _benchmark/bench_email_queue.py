@@ -0,0 +1,113 @@
+""" Benchmark of sending verification emails inline versus through the email queue.
+
+Starts a local aiosmtpd server that takes BENCHMARK_SMTP_DELAY_MS per message, like a remote mail server would.
+Compares the request latency of awaiting send_email inline with appending to the queue, and how fast the worker
+drains the queue with one and with EMAIL_WORKER_CONNECTIONS connections. Requires aiosmtpd and a Redis at
+REDIS_HOST/REDIS_PORT.
+
+    python -m _benchmark.bench_email_queue
+"""
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("SESSION_EXPIRE_TIME_SECONDS", "3600")
+os.environ.setdefault("SESSION_EXPIRE_TIME_SECONDS_TRUST_DEVICE", "86400")
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ["EMAIL_HOST"] = "127.0.0.1"
+os.environ["EMAIL_PORT"] = os.getenv("BENCHMARK_SMTP_PORT", "8025")
+os.environ["EMAIL_USE_TLS"] = "false"
+os.environ["EMAIL_PASSWORD"] = ""
+
+from aiosmtpd.controller import Controller
+
+from mail.emailQueue import queue_email, EMAIL_QUEUE_KEY
+from mail.emailService import send_email
+from mail.emailWorker import run_worker, EMAIL_WORKER_CONNECTIONS
+from session.sessionService import create_redis_connection
+
+EMAIL_COUNT = int(os.getenv("BENCHMARK_EMAIL_COUNT", "200"))
+SMTP_DELAY_SECONDS = int(os.getenv("BENCHMARK_SMTP_DELAY_MS", "20")) / 1000
+
+
+class SlowHandler:
+    """ Accepts every message after SMTP_DELAY_SECONDS. """
+
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(SMTP_DELAY_SECONDS)
+        self.received += 1
+        return "250 Message accepted for delivery"
+
+
+async def timed(coroutine) -> float:
+    start = time.perf_counter()
+    await coroutine
+    return time.perf_counter() - start
+
+
+def report(name: str, latencies: list[float], total: float) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<28} p50 {statistics.median(latencies) * 1000:8.1f} ms   "
+          f"p95 {p95 * 1000:8.1f} ms   total {total:6.2f} s")
+
+
+async def wait_for_received(handler: SlowHandler, count: int) -> None:
+    while handler.received < count:
+        await asyncio.sleep(0.005)
+
+
+async def drain(handler: SlowHandler, connections: int) -> float:
+    """ Queue EMAIL_COUNT emails, then time the worker sending all of them. """
+    for i in range(EMAIL_COUNT):
+        await queue_email(f"user{i}@example.com", "Verify your Gyma account", "<p>link</p>", "html")
+    handler.received = 0
+    stopping = asyncio.Event()
+    start = time.perf_counter()
+    worker = asyncio.create_task(run_worker("benchmark", connections, stopping, digest=False))
+    await wait_for_received(handler, EMAIL_COUNT)
+    elapsed = time.perf_counter() - start
+    stopping.set()
+    await worker
+    return elapsed
+
+
+async def main() -> None:
+    handler = SlowHandler()
+    controller = Controller(handler, hostname=os.environ["EMAIL_HOST"], port=int(os.environ["EMAIL_PORT"]))
+    controller.start()
+    redis_connection = await create_redis_connection()
+    await redis_connection.delete(EMAIL_QUEUE_KEY)
+    try:
+        print(f"{EMAIL_COUNT} concurrent requests, mail server takes {SMTP_DELAY_SECONDS * 1000:.0f} ms per message")
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(
+            timed(send_email(f"user{i}@example.com", "Verify your Gyma account", "<p>link</p>", "html"))
+            for i in range(EMAIL_COUNT)
+        ))
+        report("inline send_email", latencies, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(
+            timed(queue_email(f"user{i}@example.com", "Verify your Gyma account", "<p>link</p>", "html"))
+            for i in range(EMAIL_COUNT)
+        ))
+        report("queue_email", latencies, time.perf_counter() - start)
+        await redis_connection.delete(EMAIL_QUEUE_KEY)
+
+        for connections in sorted({1, EMAIL_WORKER_CONNECTIONS}):
+            elapsed = await drain(handler, connections)
+            print(f"worker, {connections} connection(s)       drained in {elapsed:6.2f} s  "
+                  f"({EMAIL_COUNT / elapsed:6.0f} emails/s)")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+""" Benchmark of profile url allocation for a common name.
+
+Seeds 10,000 persons named John Smith and compares probing one candidate per query with the single
+prefix query of generate_unique_profile_url. Uses BENCHMARK_DATABASE_URL, an in-memory SQLite database
+(requires aiosqlite) when not set.
+
+    python -m _benchmark.bench_profile_url
+"""
+import asyncio
+import os
+import time
+from datetime import date
+
+os.environ.setdefault("SESSION_EXPIRE_TIME_SECONDS", "3600")
+os.environ.setdefault("SESSION_EXPIRE_TIME_SECONDS_TRUST_DEVICE", "86400")
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from database import Base
+from model.Person import Person
+from model.User import User
+from service.personService import generate_unique_profile_url, check_profile_url_available
+
+DATABASE_URL = os.getenv("BENCHMARK_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+PERSON_COUNT = int(os.getenv("BENCHMARK_PERSON_COUNT", "10000"))
+ROUNDS = 5
+
+
+async def probe_profile_url(db: AsyncSession, first_name: str, last_name: str) -> str:
+    """ The previous allocation, one query per candidate. """
+    base_profile_url = f"{first_name.lower()}{last_name.lower()}"
+    profile_url = base_profile_url
+    count = 1
+    while not await check_profile_url_available(db, profile_url):
+        profile_url = f"{base_profile_url}{count}"
+        count += 1
+    return profile_url
+
+
+async def seed(engine) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"user_id": i, "email": f"john{i}@example.com", "password_hash": b"x", "salt": b"x"}
+            for i in range(1, PERSON_COUNT + 1)
+        ])
+        await conn.execute(insert(Person), [
+            {"person_id": i, "profile_url": "johnsmith" if i == 1 else f"johnsmith{i - 1}", "first_name": "John",
+             "last_name": "Smith", "date_of_birth": date(1990, 1, 1), "sex": "m", "gyma_share": "pub"}
+            for i in range(1, PERSON_COUNT + 1)
+        ])
+
+
+async def measure(engine, allocate) -> tuple[float, int, str]:
+    statements = 0
+
+    def count_statement(*args):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+    try:
+        async with AsyncSession(engine) as db:
+            started = time.perf_counter()
+            for _ in range(ROUNDS):
+                profile_url = await allocate(db, "John", "Smith")
+            elapsed = (time.perf_counter() - started) / ROUNDS
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+    return elapsed, statements // ROUNDS, profile_url
+
+
+async def main() -> None:
+    engine = create_async_engine(DATABASE_URL)
+    try:
+        await seed(engine)
+        print(f"Allocating a profile url for John Smith number {PERSON_COUNT + 1}")
+        for name, allocate in [("probe per candidate", probe_profile_url),
+                               ("single prefix query", generate_unique_profile_url)]:
+            elapsed, statements, profile_url = await measure(engine, allocate)
+            print(f"{name:>20}: {elapsed * 1000:9.2f} ms  {statements:6d} queries  -> {profile_url}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
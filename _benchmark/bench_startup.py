@@ -0,0 +1,117 @@
+""" Benchmark of the import time and cold start of an API worker.
+
+Every run is a fresh interpreter, like a worker started by uvicorn. The import of main.py is measured with
+python -X importtime, reporting the modules that take longest to import. The cold start is the time until the
+lifespan startup of the app has finished, against a migrated SQLite database and an in-process fakeredis.
+
+    python -m _benchmark.bench_startup
+    python -m _benchmark.bench_startup --runs 10 --top 25
+
+Requires aiosqlite and fakeredis.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+
+def child_environment(work_directory: str) -> dict:
+    environment = dict(os.environ)
+    environment.setdefault("SESSION_EXPIRE_TIME_SECONDS", "3600")
+    environment.setdefault("SESSION_EXPIRE_TIME_SECONDS_TRUST_DEVICE", "86400")
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, (str(ROOT), environment.get("PYTHONPATH"))))
+    environment["BENCHMARK_WORK_DIRECTORY"] = work_directory
+    return environment
+
+
+def measure_import(work_directory: str) -> tuple[float, list[tuple[float, str]]]:
+    """ Import time of main.py in seconds, and the cumulative import time of the modules it imports directly and
+    of theirs. """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=work_directory,
+                            env=child_environment(work_directory), capture_output=True, text=True, check=True)
+    total = 0.0
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        # nested imports are indented by two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if name.strip() == "main" and depth == 0:
+            total = int(cumulative) / 1e6
+        elif depth in (1, 2):
+            modules.append((int(cumulative) / 1e6, name.strip()))
+    return total, sorted(modules, reverse=True)
+
+
+def measure_cold_start(work_directory: str) -> dict:
+    """ Seconds from starting the interpreter until the app has started, measured by a child process. """
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-m", "_benchmark.bench_startup", "--child"], cwd=work_directory,
+                            env=child_environment(work_directory), capture_output=True, text=True, check=True)
+    measurement = json.loads(result.stdout.splitlines()[-1])
+    measurement["process_seconds"] = time.perf_counter() - started
+    return measurement
+
+
+def child() -> None:
+    """ Import main.py and run the startup of its lifespan, prints the times as JSON. """
+    from _benchmark.load_test import configure_environment, use_local_database, use_fake_redis
+
+    work_directory = Path(os.environ["BENCHMARK_WORK_DIRECTORY"])
+    configure_environment(work_directory, "fake")
+    use_local_database(f"sqlite+aiosqlite:///{work_directory}/startup.db")
+    use_fake_redis()
+
+    import_started = time.perf_counter()
+    import database
+    import main
+    from migration.migrate import migrate
+    import_seconds = time.perf_counter() - import_started
+
+    async def start_app() -> float:
+        # the schema is migrated before a deploy starts its workers
+        await migrate(database.engine)
+        started = time.perf_counter()
+        async with main.app.router.lifespan_context(main.app):
+            startup_seconds = time.perf_counter() - started
+        return startup_seconds
+
+    startup_seconds = asyncio.run(start_app())
+    print(json.dumps({"import_seconds": import_seconds, "startup_seconds": startup_seconds}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to list")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    with tempfile.TemporaryDirectory() as work_directory:
+        imports = [measure_import(work_directory) for _ in range(args.runs)]
+        cold_starts = [measure_cold_start(work_directory) for _ in range(args.runs)]
+
+    print(f"import main            median {statistics.median(total for total, _ in imports) * 1000:8.1f}ms")
+    for key, label in (("import_seconds", "import app modules"), ("startup_seconds", "lifespan startup"),
+                       ("process_seconds", "process until ready")):
+        print(f"{label:<22} median {statistics.median(start[key] for start in cold_starts) * 1000:8.1f}ms")
+
+    print("\nslowest imports of the last run, cumulative")
+    for seconds, name in imports[-1][1][:args.top]:
+        print(f"{seconds * 1000:8.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+""" End-to-end load test of the API.
+
+Runs the app of main.py against local stand-ins: a SQLite database in a temporary directory (or
+BENCHMARK_DATABASE_URL), an in-process fakeredis (or the Redis of REDIS_HOST/REDIS_PORT with --redis env) and an
+aiosmtpd sink that the email worker sends to. Virtual users drive the scenarios concurrently through an in-process
+ASGI transport, or over HTTP through uvicorn with --server uvicorn. Throughput and p50/p95/p99 latency are reported
+per endpoint and saved as JSON, --compare prints the change against an earlier result.
+
+    python -m _benchmark.load_test
+    python -m _benchmark.load_test --users 100 --iterations 20 --scenario login_storm --scenario feeds
+    python -m _benchmark.load_test --compare _benchmark/results/load_test_20240501-120000.json
+
+Requires httpx, aiosqlite and aiosmtpd, and fakeredis for the in-process Redis.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import tempfile
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+RESULTS_DIRECTORY = Path(__file__).parent / "results"
+SCENARIOS = ("login_storm", "feeds", "workout", "profiles", "uploads", "register")
+PASSWORD = "LoadTest1!"
+UNLIMITED = "1000000/1"
+
+
+@dataclass
+class VirtualUser:
+    user_id: int
+    email: str
+    profile_url: str
+    password: str = PASSWORD
+    headers: dict = field(default_factory=dict)
+    etags: dict = field(default_factory=dict)
+
+
+class Recorder:
+    """ Latency and status of every request, per endpoint. """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.elapsed = {}
+
+    async def request(self, client, endpoint: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        self.statuses[endpoint][response.status_code] += 1
+        return response
+
+    def results(self) -> dict:
+        results = {}
+        for endpoint, latencies in self.latencies.items():
+            latencies = sorted(latencies)
+            statuses = self.statuses[endpoint]
+            results[endpoint] = {
+                "requests": len(latencies),
+                "errors": sum(count for status, count in statuses.items() if status >= 400),
+                "statuses": {str(status): count for status, count in sorted(statuses.items())},
+                "throughput": len(latencies) / self.elapsed[endpoint.split(" ")[0]],
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+            }
+        return results
+
+
+def percentile(sorted_values: list[float], percent: int) -> float:
+    """ Nearest-rank percentile of sorted values. """
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[rank - 1]
+
+
+def configure_environment(work_directory: Path, redis: str) -> None:
+    """ Point the app at the local stand-ins, must run before the app modules are imported. """
+    os.chdir(work_directory)
+    os.environ.setdefault("SESSION_EXPIRE_TIME_SECONDS", "3600")
+    os.environ.setdefault("SESSION_EXPIRE_TIME_SECONDS_TRUST_DEVICE", "86400")
+    os.environ.setdefault("VERIFICATION_SECRET", "load-test")
+    os.environ.setdefault("WEBSITE_URL", "http://localhost")
+    os.environ["EMAIL_HOST"] = "127.0.0.1"
+    os.environ["EMAIL_PORT"] = str(free_port())
+    os.environ["EMAIL_USE_TLS"] = "false"
+    os.environ["EMAIL_PASSWORD"] = ""
+    for policy in ("LOGIN_IP", "LOGIN_EMAIL", "REGISTER_IP", "RESEND_VERIFICATION_IP",
+                   "RESEND_VERIFICATION_EMAIL", "PICTURE_USER"):
+        os.environ[f"RATE_LIMIT_{policy}"] = UNLIMITED
+    if redis == "env":
+        os.environ.setdefault("REDIS_HOST", "localhost")
+        os.environ.setdefault("REDIS_PORT", "6379")
+
+
+def use_local_database(database_url: str) -> None:
+    """ Replace the engine of database.py before main.py binds to it. """
+    import database
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from sqlalchemy.orm import sessionmaker
+
+    connect_args = {"timeout": 30} if database_url.startswith("sqlite") else {}
+    database.engine = create_async_engine(database_url, connect_args=connect_args)
+    database.AsyncSessionLocal = sessionmaker(bind=database.engine, class_=AsyncSession, autoflush=False)
+
+
+def use_fake_redis() -> None:
+    """ Cache an in-process fakeredis as the Redis connection of the app. """
+    import fakeredis
+    from session import sessionService
+
+    sessionService._redis_connection = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+async def seed(user_count: int, friends_per_user: int, gymas_per_user: int) -> list[VirtualUser]:
+    """ Verified users with persons, accepted friendships with their next neighbours and a gyma history. """
+    import bcrypt
+    import database
+    from model.Exercise import Exercise
+    from model.Friendship import Friendship
+    from model.Gyma import Gyma
+    from model.GymaExercise import GymaExercise
+    from model.Person import Person
+    from model.User import User
+
+    # one hash for everybody, bcrypt per user would dominate the setup
+    salt = bcrypt.gensalt()
+    password_hash = bcrypt.hashpw(PASSWORD.encode("utf-8"), salt)
+    now = datetime.now()
+
+    async with database.AsyncSessionLocal() as db:
+        users = [User(email=f"load{i}@example.com", salt=salt, password_hash=password_hash, email_verified=True)
+                 for i in range(user_count)]
+        db.add_all(users)
+        await db.flush()
+        db.add_all(Person(person_id=user.user_id, profile_url=f"loaduser{i}", first_name="Load",
+                          last_name=f"User{i}", date_of_birth=date(1990, 1, 1), sex="o", gyma_share="pub")
+                   for i, user in enumerate(users))
+        await db.flush()
+        # offsets below half the user count never pair the same two users twice
+        friend_offsets = range(1, min(friends_per_user, (user_count - 1) // 2) + 1)
+        db.add_all(Friendship(person_id=users[i].user_id, friend_id=users[(i + offset) % user_count].user_id,
+                              status="accepted", since=date.today())
+                   for i in range(user_count) for offset in friend_offsets)
+        for user in users:
+            for day in range(gymas_per_user):
+                arrival = now - timedelta(days=day + 1, hours=random.randint(0, 12))
+                gyma = Gyma(user_id=user.user_id, time_of_arrival=arrival, time_of_leaving=arrival + timedelta(hours=1))
+                exercise = Exercise(exercise_name="squat", exercise_type="gains", count=8, sets=3, weight=80,
+                                    created_at=arrival)
+                db.add_all([gyma, exercise])
+                await db.flush()
+                db.add(GymaExercise(gyma_id=gyma.gyma_id, exercise_id=exercise.exercise_id))
+        virtual_users = [VirtualUser(user.user_id, user.email, f"loaduser{i}") for i, user in enumerate(users)]
+        await db.commit()
+        return virtual_users
+
+
+async def seed_with_dataset(dataset_users: int, user_count: int) -> list[VirtualUser]:
+    """ Power-law dataset of _benchmark.seed_dataset, driven by user_count of its public users. """
+    import database
+    from _benchmark import seed_dataset
+
+    summary = await seed_dataset.seed_dataset(database.engine, dataset_users, sample_size=user_count)
+    return [VirtualUser(user["user_id"], user["email"], user["profile_url"], summary["password"])
+            for user in summary["sample_users"]]
+
+
+async def login(client, recorder: Recorder, user: VirtualUser, endpoint: str) -> None:
+    response = await recorder.request(client, endpoint, "POST", "/api/v1/auth/login",
+                                      json={"email": user.email, "password": user.password})
+    if response.status_code == 200:
+        user.headers = {"Authorization": response.json()["session_token"]}
+
+
+async def poll(client, recorder: Recorder, user: VirtualUser, endpoint: str, url: str) -> None:
+    """ Poll like a client would, sending the ETag of the previous response. """
+    headers = dict(user.headers)
+    if url in user.etags:
+        headers["If-None-Match"] = user.etags[url]
+    response = await recorder.request(client, endpoint, "GET", url, headers=headers)
+    if "etag" in response.headers:
+        user.etags[url] = response.headers["etag"]
+
+
+async def run_login_storm(client, recorder: Recorder, users: list[VirtualUser], iterations: int) -> None:
+    async def storm(user: VirtualUser):
+        for _ in range(iterations):
+            await login(client, recorder, user, "login_storm POST /api/v1/auth/login")
+    await asyncio.gather(*(storm(user) for user in users))
+
+
+async def run_feeds(client, recorder: Recorder, users: list[VirtualUser], iterations: int) -> None:
+    async def feeds(user: VirtualUser):
+        for _ in range(iterations):
+            await poll(client, recorder, user, "feeds GET /api/v1/pub/", "/api/v1/pub/")
+            await poll(client, recorder, user, "feeds GET /api/v1/mine/", "/api/v1/mine/")
+            await poll(client, recorder, user, "feeds GET /api/v1/gymbro/", "/api/v1/gymbro/")
+    await asyncio.gather(*(feeds(user) for user in users))
+
+
+async def run_workout(client, recorder: Recorder, users: list[VirtualUser], iterations: int) -> None:
+    exercise = {"exercise_name": "bench press", "exercise_type": "gains", "count": 10, "sets": 3, "weight": 60}
+
+    async def workout(user: VirtualUser):
+        for _ in range(iterations):
+            await recorder.request(client, "workout POST /api/v1/gyma/start", "POST", "/api/v1/gyma/start",
+                                   headers=user.headers)
+            for _ in range(3):
+                await recorder.request(client, "workout POST /api/v1/gyma/exercise", "POST",
+                                       "/api/v1/gyma/exercise", headers=user.headers, json=exercise)
+            await recorder.request(client, "workout PUT /api/v1/gyma/end", "PUT", "/api/v1/gyma/end",
+                                   headers=user.headers)
+    await asyncio.gather(*(workout(user) for user in users))
+
+
+async def run_profiles(client, recorder: Recorder, users: list[VirtualUser], iterations: int) -> None:
+    async def profiles(user: VirtualUser):
+        for _ in range(iterations):
+            other = random.choice(users)
+            await poll(client, recorder, user, "profiles GET /api/v1/profile/{profile_url}",
+                       f"/api/v1/profile/{other.profile_url}")
+    await asyncio.gather(*(profiles(user) for user in users))
+
+
+async def run_uploads(client, recorder: Recorder, users: list[VirtualUser], iterations: int) -> None:
+    from PIL import Image
+
+    picture = io.BytesIO()
+    Image.effect_noise((1200, 1200), 64).convert("RGB").save(picture, "PNG")
+
+    async def uploads(user: VirtualUser):
+        for _ in range(max(1, iterations // 5)):
+            await recorder.request(client, "uploads POST /api/v1/person/picture", "POST", "/api/v1/person/picture",
+                                   headers=user.headers,
+                                   files={"file": ("picture.png", picture.getvalue(), "image/png")})
+    await asyncio.gather(*(uploads(user) for user in users))
+
+
+async def run_register(client, recorder: Recorder, users: list[VirtualUser], iterations: int) -> None:
+    async def register(index: int):
+        for iteration in range(max(1, iterations // 5)):
+            await recorder.request(client, "register POST /api/v1/user/", "POST", "/api/v1/user/",
+                                   json={"email": f"new{index}-{iteration}@example.com", "password": PASSWORD,
+                                         "password2": PASSWORD})
+    await asyncio.gather(*(register(index) for index in range(len(users))))
+
+
+SCENARIO_RUNNERS = {
+    "login_storm": run_login_storm,
+    "feeds": run_feeds,
+    "workout": run_workout,
+    "profiles": run_profiles,
+    "uploads": run_uploads,
+    "register": run_register,
+}
+
+
+def print_results(results: dict, previous: dict | None = None) -> None:
+    print(f"{'endpoint':<52}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          + (f"{'p95 change':>12}" if previous else ""))
+    for endpoint, result in results.items():
+        line = (f"{endpoint:<52}{result['requests']:>9}{result['errors']:>8}{result['throughput']:>9.1f}"
+                f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}")
+        if previous and endpoint in previous:
+            line += f"{(result['p95_ms'] / previous[endpoint]['p95_ms'] - 1) * 100:>+11.0f}%"
+        print(line)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.handlers import Sink
+    import httpx
+
+    import database
+    import main
+    from mail.emailWorker import run_worker
+    from migration.migrate import migrate
+
+    smtp_sink = Controller(Sink(), hostname=os.environ["EMAIL_HOST"], port=int(os.environ["EMAIL_PORT"]))
+    smtp_sink.start()
+    stopping = asyncio.Event()
+    server = server_task = None
+    try:
+        await migrate(database.engine)
+        async with main.app.router.lifespan_context(main.app):
+            if args.dataset_users:
+                users = await seed_with_dataset(args.dataset_users, args.users)
+            else:
+                users = await seed(args.users, args.friends, args.gymas)
+            email_worker = asyncio.create_task(run_worker("load_test", 2, stopping, digest=False))
+
+            if args.server == "uvicorn":
+                import uvicorn
+                port = free_port()
+                server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, lifespan="off",
+                                                       log_level="warning"))
+                server_task = asyncio.create_task(server.serve())
+                while not server.started:
+                    await asyncio.sleep(0.01)
+                client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60,
+                                           limits=httpx.Limits(max_connections=args.users))
+            else:
+                client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://load-test",
+                                           timeout=60)
+
+            recorder = Recorder()
+            async with client:
+                await asyncio.gather(*(login(client, recorder, user, "setup") for user in users))
+                recorder.latencies.pop("setup", None)
+                for scenario in args.scenario or SCENARIOS:
+                    start = time.perf_counter()
+                    await SCENARIO_RUNNERS[scenario](client, recorder, users, args.iterations)
+                    recorder.elapsed[scenario] = time.perf_counter() - start
+
+            stopping.set()
+            await email_worker
+    finally:
+        if server is not None:
+            server.should_exit = True
+            await server_task
+        smtp_sink.stop()
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "endpoints": recorder.results(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end load test of the API.")
+    parser.add_argument("--users", type=int, default=50, help="concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=10, help="iterations of a scenario per user")
+    parser.add_argument("--friends", type=int, default=10, help="accepted friends per seeded user")
+    parser.add_argument("--gymas", type=int, default=20, help="gyma history per seeded user")
+    parser.add_argument("--dataset-users", type=int,
+                        help="seed this many users with _benchmark.seed_dataset instead of a uniform dataset")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="scenarios to run, default all")
+    parser.add_argument("--server", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--redis", choices=("fake", "env"), default="fake")
+    parser.add_argument("--output", type=Path, help="result file, default in _benchmark/results")
+    parser.add_argument("--compare", type=Path, help="earlier result file to compare with")
+    args = parser.parse_args()
+
+    output = (args.output or RESULTS_DIRECTORY / f"load_test_{datetime.now():%Y%m%d-%H%M%S}.json").resolve()
+    previous = json.loads(args.compare.read_text())["endpoints"] if args.compare else None
+
+    with tempfile.TemporaryDirectory() as work_directory:
+        configure_environment(Path(work_directory), args.redis)
+        use_local_database(os.getenv("BENCHMARK_DATABASE_URL", f"sqlite+aiosqlite:///{work_directory}/load_test.db"))
+        if args.redis == "fake":
+            use_fake_redis()
+        result = asyncio.run(run(args))
+
+    print_results(result["endpoints"], previous)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
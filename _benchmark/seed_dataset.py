@@ -0,0 +1,284 @@
+""" Synthetic dataset for performance tests and EXPLAIN regression checks.
+
+Generates users, persons with colliding names, a power-law friendship graph with a pending/accepted/blocked mix
+and years of gymas with varied exercises. Rows are written with batched multi-row inserts and explicit ids, so
+gymas and exercises are linked without reading anything back. Every user has the password PASSWORD and the email
+user<user_id>@example.com. The same --seed gives the same dataset.
+
+    python -m _benchmark.seed_dataset --users 100000 --years 3
+    python -m _benchmark.seed_dataset --users 1000 --summary dataset.json --explain
+
+Uses BENCHMARK_DATABASE_URL, the database of the environment (DB_USER, DB_HOST, ...) when not set.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+os.environ.setdefault("SESSION_EXPIRE_TIME_SECONDS", "3600")
+os.environ.setdefault("SESSION_EXPIRE_TIME_SECONDS_TRUST_DEVICE", "86400")
+
+import bcrypt
+from sqlalchemy import Table, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+
+from database import DATABASE_URL
+from migration.migrate import migrate
+from model.Exercise import Exercise
+from model.Friendship import Friendship
+from model.Gyma import Gyma
+from model.GymaExercise import GymaExercise
+from model.Person import Person
+from model.User import User
+
+PASSWORD = "Dataset1!"
+BATCH_SIZE = 5000
+PROFILE_URL_MAX_LENGTH = 32
+
+# few names with skewed popularity, so profile urls collide like they do for common names
+FIRST_NAMES = ["john", "emma", "noah", "sophie", "liam", "julia", "lucas", "anna", "daan", "sara", "sem", "eva",
+               "mohammed", "fatima", "jan", "maria", "thomas", "lisa", "kevin", "fleur"]
+LAST_NAMES = ["smith", "devries", "jansen", "bakker", "visser", "smit", "meijer", "mulder", "degroot", "bos",
+              "vos", "peters", "hendriks", "dekker", "brouwer", "dijkstra", "yilmaz", "elamrani", "nguyen", "garcia"]
+CITIES = ["Amsterdam", "Rotterdam", "Utrecht", "Eindhoven", "Groningen", None]
+
+FRIENDSHIP_STATUSES = (("accepted", 0.8), ("pending", 0.15), ("blocked", 0.05))
+GYMA_SHARES = (("pub", 0.7), ("gymbros", 0.25), ("solo", 0.05))
+# gymas per week of a person, most people train a little and a few train daily
+GYMAS_PER_WEEK = ((0.2, 0.3), (1, 0.3), (2, 0.2), (3, 0.1), (5, 0.07), (7, 0.03))
+EXERCISES = (
+    ("gains", ["squat", "bench press", "deadlift", "overhead press", "pull up", "row", "lunge", "curl"]),
+    ("cardio", ["running", "cycling", "rowing", "swimming", "stairs"]),
+    ("other", ["yoga", "stretching", "boxing", "climbing"]),
+)
+
+
+def weighted_choice(rng: random.Random, choices: tuple) -> object:
+    return rng.choices([value for value, _ in choices], weights=[weight for _, weight in choices])[0]
+
+
+def preferential_attachment_edges(rng: random.Random, node_count: int, edges_per_node: int) -> set[tuple[int, int]]:
+    """ Barabasi-Albert graph over nodes 0..node_count-1: every node links to edges_per_node earlier nodes picked
+    proportional to their degree, giving a power-law degree distribution. Edges are (lower, higher) pairs. """
+    edges = set()
+    endpoints = []  # every node once per edge end, sampling from it is sampling proportional to degree
+    for node in range(node_count):
+        targets = set()
+        wanted = min(edges_per_node, node)
+        while len(targets) < wanted:
+            targets.add(rng.choice(endpoints) if endpoints and rng.random() < 0.9 else rng.randrange(node))
+        for target in targets:
+            edges.add((target, node))
+            endpoints += (target, node)
+    return edges
+
+
+def profile_url_with_count(base_profile_url: str, count: int) -> str:
+    """ Profile url the way personService allocates it: base, base1, base2, ... within the maximum length. """
+    if count == 0:
+        return base_profile_url[:PROFILE_URL_MAX_LENGTH]
+    return f"{base_profile_url[:PROFILE_URL_MAX_LENGTH - len(str(count))]}{count}"
+
+
+def exercise_row(rng: random.Random, exercise_id: int, created_at: datetime) -> dict:
+    exercise_type, names = EXERCISES[rng.choices(range(len(EXERCISES)), weights=(0.6, 0.3, 0.1))[0]]
+    row = {"exercise_id": exercise_id, "exercise_name": rng.choice(names), "exercise_type": exercise_type,
+           "count": None, "sets": None, "weight": None, "minutes": None, "km": None, "level": None,
+           "description": None, "created_at": created_at}
+    if exercise_type == "gains":
+        row.update(count=rng.randint(5, 15), sets=rng.randint(2, 5), weight=round(rng.uniform(5, 140), 1))
+    elif exercise_type == "cardio":
+        row.update(minutes=rng.randint(10, 60), km=round(rng.uniform(1, 20), 1))
+    else:
+        row.update(minutes=rng.randint(15, 90), level=rng.randint(1, 10))
+    return row
+
+
+def batched(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+async def insert_rows(connection: AsyncConnection, table: Table, rows: Iterable[dict]) -> int:
+    """ Insert rows in batches of BATCH_SIZE, each batch is one executemany, which the drivers send as multi-row
+    INSERT statements. Returns the number of rows. """
+    count = 0
+    for batch in batched(rows, BATCH_SIZE):
+        await connection.execute(insert(table), batch)
+        count += len(batch)
+    return count
+
+
+async def next_id(connection: AsyncConnection, column) -> int:
+    return (await connection.scalar(select(func.max(column))) or 0) + 1
+
+
+async def seed_dataset(engine: AsyncEngine, user_count: int, years: float = 2, friends_per_user: int = 5,
+                       sample_size: int = 10, seed: int = 0) -> dict:
+    """ Generate the dataset into engine, creating missing tables. Returns counts, id ranges and a sample of
+    users with a public person, including the user with the most friendships. """
+    rng = random.Random(seed)
+    salt = bcrypt.gensalt()
+    password_hash = bcrypt.hashpw(PASSWORD.encode("utf-8"), salt)
+    now = datetime.now().replace(microsecond=0)
+    days = int(years * 365)
+    counts = {}
+    started = time.perf_counter()
+
+    await migrate(engine)
+    async with engine.begin() as connection:
+        if connection.dialect.name == "mysql":
+            await connection.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
+            await connection.execute(text("SET UNIQUE_CHECKS = 0"))
+
+        first_user_id = await next_id(connection, User.user_id)
+        taken_profile_urls = set(await connection.scalars(select(Person.profile_url)))
+        user_ids = range(first_user_id, first_user_id + user_count)
+
+        counts["user"] = await insert_rows(connection, User.__table__, (
+            {"user_id": user_id, "email": f"user{user_id}@example.com", "salt": salt,
+             "password_hash": password_hash, "account_type": "user", "email_verified": rng.random() < 0.95}
+            for user_id in user_ids
+        ))
+
+        # 90 percent of the users made a profile
+        person_ids = [user_id for user_id in user_ids if rng.random() < 0.9]
+        profile_url_counts = {}
+        persons = []
+        for person_id in person_ids:
+            first_name = rng.choices(FIRST_NAMES, weights=range(len(FIRST_NAMES), 0, -1))[0]
+            last_name = rng.choices(LAST_NAMES, weights=range(len(LAST_NAMES), 0, -1))[0]
+            base_profile_url = f"{first_name}{last_name}"
+            count = profile_url_counts.get(base_profile_url, 0)
+            while profile_url_with_count(base_profile_url, count) in taken_profile_urls:
+                count += 1
+            profile_url_counts[base_profile_url] = count + 1
+            profile_url = profile_url_with_count(base_profile_url, count)
+            taken_profile_urls.add(profile_url)
+            persons.append({
+                "person_id": person_id, "profile_url": profile_url, "first_name": first_name.capitalize(),
+                "last_name": last_name.capitalize(),
+                "date_of_birth": date(1960, 1, 1) + timedelta(days=rng.randrange(45 * 365)),
+                "sex": rng.choice("mfo"), "city": rng.choice(CITIES), "profile_text": None,
+                "gyma_share": weighted_choice(rng, GYMA_SHARES), "pf_path_m": None, "pf_path_l": None,
+            })
+        counts["person"] = await insert_rows(connection, Person.__table__, persons)
+
+        degrees = [0] * len(person_ids)
+        friendships = []
+        for lower, higher in preferential_attachment_edges(rng, len(person_ids), friends_per_user):
+            degrees[lower] += 1
+            degrees[higher] += 1
+            requester, receiver = (lower, higher) if rng.random() < 0.5 else (higher, lower)
+            friendships.append({
+                "person_id": person_ids[requester], "friend_id": person_ids[receiver],
+                "status": weighted_choice(rng, FRIENDSHIP_STATUSES),
+                "since": (now - timedelta(days=rng.randrange(days + 1))).date(),
+            })
+        counts["friendship"] = await insert_rows(connection, Friendship.__table__, friendships)
+
+        first_gyma_id = gyma_id = await next_id(connection, Gyma.gyma_id)
+        exercise_id = await next_id(connection, Exercise.exercise_id)
+        gymas, exercises, gyma_exercises = [], [], []
+        counts.update(gyma=0, exercise=0, gyma_exercise=0)
+        for person_id in person_ids:
+            gyma_count = int(weighted_choice(rng, GYMAS_PER_WEEK) * days / 7)
+            for day in sorted(rng.sample(range(1, days + 1), min(gyma_count, days))):
+                arrival = (now - timedelta(days=day)).replace(hour=rng.randint(6, 21), minute=rng.randrange(60),
+                                                                second=0)
+                gymas.append({"gyma_id": gyma_id, "user_id": person_id, "time_of_arrival": arrival,
+                              "time_of_leaving": arrival + timedelta(minutes=rng.randint(30, 150)),
+                              "location_id": None})
+                for _ in range(rng.randint(2, 6)):
+                    exercises.append(exercise_row(rng, exercise_id, arrival))
+                    gyma_exercises.append({"gyma_id": gyma_id, "exercise_id": exercise_id})
+                    exercise_id += 1
+                gyma_id += 1
+            # flush per batch to keep memory flat for millions of gymas
+            if len(gymas) >= BATCH_SIZE:
+                counts["gyma"] += await insert_rows(connection, Gyma.__table__, gymas)
+                counts["exercise"] += await insert_rows(connection, Exercise.__table__, exercises)
+                counts["gyma_exercise"] += await insert_rows(connection, GymaExercise.__table__, gyma_exercises)
+                gymas, exercises, gyma_exercises = [], [], []
+        counts["gyma"] += await insert_rows(connection, Gyma.__table__, gymas)
+        counts["exercise"] += await insert_rows(connection, Exercise.__table__, exercises)
+        counts["gyma_exercise"] += await insert_rows(connection, GymaExercise.__table__, gyma_exercises)
+
+        if connection.dialect.name == "mysql":
+            await connection.execute(text("SET UNIQUE_CHECKS = 1"))
+            await connection.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
+
+    public_persons = [index for index, person in enumerate(persons) if person["gyma_share"] == "pub"]
+    hub = max(range(len(person_ids)), key=degrees.__getitem__) if person_ids else None
+    sample = ([hub] if hub is not None else []) + [index for index in public_persons[:sample_size] if index != hub]
+    return {
+        "seed": seed,
+        "password": PASSWORD,
+        "counts": counts,
+        "user_ids": [first_user_id, first_user_id + user_count - 1],
+        "gyma_ids": [first_gyma_id, gyma_id - 1],
+        "max_friendships": degrees[hub] if hub is not None else 0,
+        "sample_users": [
+            {"user_id": person_ids[index], "email": f"user{person_ids[index]}@example.com",
+             "profile_url": persons[index]["profile_url"], "friendships": degrees[index]}
+            for index in sample[:sample_size]
+        ],
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+async def explain_queries(engine: AsyncEngine, user_id: int) -> None:
+    """ Print the query plans of the friend list and gymbro feed of user_id. """
+    from sqlalchemy import event
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from provider.gymbroProvider import get_gymbro_ids, get_last_ten_gyma_entries_of_user_and_friends
+    from service.friendshipService import get_friends_by_person_id
+
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    async with AsyncSession(engine) as db:
+        await get_friends_by_person_id(db, user_id)
+        await get_last_ten_gyma_entries_of_user_and_friends(db, user_id, await get_gymbro_ids(db, user_id))
+    event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    explain = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    async with engine.connect() as connection:
+        for statement, parameters in statements:
+            print(" ".join(statement.split()))
+            for row in await connection.exec_driver_sql(explain + statement, parameters):
+                print("   ", tuple(row))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset.")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--years", type=float, default=2, help="years of gyma history")
+    parser.add_argument("--friends", type=int, default=5, help="friendships made by every joining person")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--summary", type=Path, help="write the summary as JSON, for use as a fixture")
+    parser.add_argument("--explain", action="store_true", help="print query plans for the busiest user")
+    args = parser.parse_args()
+
+    engine = create_async_engine(os.getenv("BENCHMARK_DATABASE_URL", DATABASE_URL))
+    summary = await seed_dataset(engine, args.users, args.years, args.friends, seed=args.seed)
+    print(json.dumps(summary, indent=2, default=str))
+    if args.summary:
+        args.summary.write_text(json.dumps(summary, indent=2, default=str))
+    if args.explain and summary["sample_users"]:
+        await explain_queries(engine, summary["sample_users"][0]["user_id"])
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,44 @@
+import asyncio
+import unittest
+
+from provider.batchLoaderProvider import BatchLoader
+
+
+class BatchLoaderTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.batches = []
+
+        async def load_many(keys):
+            self.batches.append(keys)
+            return {key: key * 10 for key in keys if key != 3}
+
+        self.loader = BatchLoader(load_many)
+
+    async def test_lookups_of_one_iteration_are_loaded_together(self):
+        values = await asyncio.gather(*(self.loader.load(key) for key in (1, 2, 1, 3)))
+        self.assertEqual(values, [10, 20, 10, None])
+        self.assertEqual(self.batches, [[1, 2, 3]])
+
+    async def test_results_are_memoized_until_cleared(self):
+        self.assertEqual(await self.loader.load(1), 10)
+        self.assertEqual(await self.loader.load(1), 10)
+        self.assertEqual(self.batches, [[1]])
+        self.loader.clear()
+        await self.loader.load(1)
+        self.assertEqual(self.batches, [[1], [1]])
+
+    async def test_failed_lookup_is_retried(self):
+        async def fail_once(keys):
+            self.batches.append(keys)
+            if len(self.batches) == 1:
+                raise RuntimeError("connection lost")
+            return {key: key for key in keys}
+
+        loader = BatchLoader(fail_once)
+        with self.assertRaises(RuntimeError):
+            await loader.load(1)
+        self.assertEqual(await loader.load(1), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import patch, AsyncMock
 import asyncio
+from mail import emailService
 from mail.emailService import create_email_connection, send_email
 
 
@@ -12,11 +13,15 @@ class MyTestCase(unittest.TestCase):
 
     def tearDown(self):
         self.loop.close()
+        # create_email_connection caches the connection it opened
+        emailService._email_connection = None
 
     def run_async(self, coro):
         # Helper method to run the coroutine in the event loop
         return self.loop.run_until_complete(coro)
 
+    @patch.dict('os.environ', {"EMAIL_HOST": "smtp.gyma.app", "EMAIL_PORT": "465", "EMAIL_USERNAME": "noreply@gyma.app",
+                               "EMAIL_PASSWORD": "secret", "EMAIL_USE_TLS": "true"})
     @patch('aiosmtplib.SMTP', autospec=True)
     def test_create_email_connection(self, mock_smtp):
         # Set up the mock
@@ -30,9 +35,9 @@ class MyTestCase(unittest.TestCase):
 
         # Assertions
         self.assertIsNotNone(result)
+        mock_smtp.assert_called_once_with(hostname="smtp.gyma.app", port=465, use_tls=True)
         smtp_instance.connect.assert_awaited_once()
-        smtp_instance.starttls.assert_awaited_once()
-        smtp_instance.login.assert_awaited_once()
+        smtp_instance.login.assert_awaited_once_with("noreply@gyma.app", "secret")
 
     @patch('mail.emailService.create_email_connection', new_callable=AsyncMock)
     @patch('aiosmtplib.SMTP.send_message', new_callable=AsyncMock)
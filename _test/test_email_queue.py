@@ -0,0 +1,90 @@
+import json
+import os
+import time
+import unittest
+from unittest.mock import patch, AsyncMock
+
+os.environ.setdefault("SESSION_EXPIRE_TIME_SECONDS", "3600")
+os.environ.setdefault("SESSION_EXPIRE_TIME_SECONDS_TRUST_DEVICE", "2592000")
+
+from mail.emailQueue import fail_email, requeue_due_emails, renew_worker_lease, requeue_emails_of_dead_workers, \
+    EMAIL_QUEUE_KEY, EMAIL_PROCESSING_KEY_PREFIX, EMAIL_RETRY_KEY, EMAIL_DEAD_LETTER_KEY, EMAIL_MAX_ATTEMPTS, \
+    EMAIL_WORKER_LEASE_KEY_PREFIX
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+def queued_email(attempts: int = 0) -> str:
+    return json.dumps({"id": "1", "recipient": "a@b.nl", "subject": "s", "content": "c", "content_type": "plain",
+                       "attempts": attempts})
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class EmailQueueTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        patcher = patch("mail.emailQueue.create_redis_connection", AsyncMock(return_value=self.redis))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.redis.flushall()
+        await self.redis.aclose()
+
+    async def test_failed_email_is_retried_with_backoff(self):
+        raw_email = queued_email()
+        await self.redis.lpush(EMAIL_PROCESSING_KEY_PREFIX + "w", raw_email)
+
+        self.assertTrue(await fail_email("w", raw_email, "timeout"))
+
+        self.assertEqual(await self.redis.llen(EMAIL_PROCESSING_KEY_PREFIX + "w"), 0)
+        [(raw_retry, due_at)] = await self.redis.zrange(EMAIL_RETRY_KEY, 0, -1, withscores=True)
+        self.assertEqual(json.loads(raw_retry)["attempts"], 1)
+        self.assertEqual(json.loads(raw_retry)["error"], "timeout")
+        self.assertGreater(due_at, time.time())
+
+    async def test_email_is_dead_lettered_after_max_attempts(self):
+        raw_email = queued_email(attempts=EMAIL_MAX_ATTEMPTS - 1)
+        await self.redis.lpush(EMAIL_PROCESSING_KEY_PREFIX + "w", raw_email)
+
+        await fail_email("w", raw_email, "timeout")
+
+        self.assertEqual(await self.redis.zcard(EMAIL_RETRY_KEY), 0)
+        [raw_dead] = await self.redis.lrange(EMAIL_DEAD_LETTER_KEY, 0, -1)
+        self.assertEqual(json.loads(raw_dead)["attempts"], EMAIL_MAX_ATTEMPTS)
+
+    async def test_permanent_failure_is_dead_lettered_at_once(self):
+        raw_email = queued_email()
+        await self.redis.lpush(EMAIL_PROCESSING_KEY_PREFIX + "w", raw_email)
+
+        await fail_email("w", raw_email, "recipient refused", permanent=True)
+
+        self.assertEqual(await self.redis.llen(EMAIL_DEAD_LETTER_KEY), 1)
+        self.assertEqual(await self.redis.zcard(EMAIL_RETRY_KEY), 0)
+
+    async def test_only_due_retries_are_requeued(self):
+        await self.redis.zadd(EMAIL_RETRY_KEY, {"due": time.time() - 1, "later": time.time() + 60})
+
+        self.assertEqual(await requeue_due_emails(), 1)
+
+        self.assertEqual(await self.redis.lrange(EMAIL_QUEUE_KEY, 0, -1), ["due"])
+        self.assertEqual(await self.redis.zrange(EMAIL_RETRY_KEY, 0, -1), ["later"])
+
+    async def test_emails_of_dead_workers_are_requeued(self):
+        await renew_worker_lease("alive")
+        await renew_worker_lease("dead")
+        await self.redis.lpush(EMAIL_PROCESSING_KEY_PREFIX + "alive", "a")
+        await self.redis.lpush(EMAIL_PROCESSING_KEY_PREFIX + "dead", "b")
+        await self.redis.delete(EMAIL_WORKER_LEASE_KEY_PREFIX + "dead")
+
+        self.assertEqual(await requeue_emails_of_dead_workers(), 1)
+
+        self.assertEqual(await self.redis.lrange(EMAIL_QUEUE_KEY, 0, -1), ["b"])
+        self.assertEqual(await self.redis.lrange(EMAIL_PROCESSING_KEY_PREFIX + "alive", 0, -1), ["a"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from unittest.mock import patch
+
+from mail.emailService import build_friend_request_digest, build_verification_email
+from mail.emailTemplates import compile_template, render_template
+
+
+class EmailTemplatesTestCase(unittest.TestCase):
+    def test_compile_template(self):
+        parts = compile_template("Hi $first_name, ${count} new $$")
+
+        self.assertEqual(parts, [("Hi ", "first_name"), (", ", "count"), (" new $", None), ("", None)])
+
+    def test_values_are_escaped(self):
+        content = render_template("friend_request_digest_item.html", profile_link="/profile/bob",
+                                  first_name="<b>Bob</b>", last_name="Ray")
+
+        self.assertIn("&lt;b&gt;Bob&lt;/b&gt; Ray", content)
+
+    @patch.dict('os.environ', {"WEBSITE_URL": "https://gyma.app"})
+    def test_verification_email(self):
+        subject, content = build_verification_email("code")
+
+        self.assertEqual(subject, "Verify your Gyma account")
+        self.assertEqual(content.count("https://gyma.app/verify/code"), 2)
+
+    @patch.dict('os.environ', {"WEBSITE_URL": "https://gyma.app"})
+    def test_friend_request_digest(self):
+        _, content = build_friend_request_digest("Ann", [("bobray", "Bob", "Ray"), ("dankim", "Dan", "Kim")])
+
+        self.assertIn("Bob and 1 others want to be your gymbro.", content)
+        self.assertIn('<li><a href="https://gyma.app/profile/dankim"', content)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from provider.etagProvider import make_weak_etag, etag_matches, not_modified
+
+
+class ETagTestCase(unittest.TestCase):
+    def test_etag_is_weak_and_stable(self):
+        etag = make_weak_etag("pub", 1, None)
+
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertEqual(etag, make_weak_etag("pub", 1, None))
+        self.assertNotEqual(etag, make_weak_etag("pub", 2, None))
+
+    def test_etag_matches(self):
+        etag = make_weak_etag("profile", 7, 3, None)
+
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(etag.removeprefix("W/"), etag))
+        self.assertTrue(etag_matches(f'W/"other", {etag}', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches(None, etag))
+        self.assertFalse(etag_matches('W/"other"', etag))
+
+    def test_not_modified(self):
+        response = not_modified('W/"abc"')
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], 'W/"abc"')
+        self.assertEqual(response.body, b"")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from migration.migrate import migrate
+from model.Gyma import Gyma
+from provider.feedProvider import build_compact_feed
+from provider.watermarkProvider import Watermark, encode_watermark, decode_watermark, latest_watermark, \
+    page_after_watermark
+
+
+def make_gyma(gyma_id: int, user_id: int, exercise_names: list[str]):
+    exercises = [
+        SimpleNamespace(exercise=SimpleNamespace(
+            exercise_name=name, exercise_type="gains", count=10, sets=3, weight=50.0,
+            minutes=None, km=None, level=None, description=None,
+        ))
+        for name in exercise_names
+    ]
+    return SimpleNamespace(gyma_id=gyma_id, user_id=user_id, time_of_arrival=datetime(2024, 5, 1, 10),
+                           time_of_leaving=datetime(2024, 5, 1, 11), exercises=exercises)
+
+
+def make_person(profile_url: str):
+    return SimpleNamespace(profile_url=profile_url, first_name="John", last_name="Smith", sex="m", pf_path_m=None)
+
+
+class CompactFeedTestCase(unittest.TestCase):
+    def test_persons_are_sent_once(self):
+        gymas = [make_gyma(1, 7, ["squat"]), make_gyma(2, 7, []), make_gyma(3, 8, ["bench", "row"])]
+        persons = {7: make_person("johnsmith"), 8: make_person("johnsmith1")}
+
+        feed = build_compact_feed(gymas, persons)
+
+        self.assertEqual(sorted(feed.persons), ["johnsmith", "johnsmith1"])
+        self.assertEqual([gyma.person for gyma in feed.gymas], ["johnsmith", "johnsmith", "johnsmith1"])
+
+    def test_exercises_are_columnar(self):
+        feed = build_compact_feed([make_gyma(3, 8, ["bench", "row"])], {8: make_person("johnsmith")})
+
+        columns = feed.gymas[0].exercises
+        self.assertEqual(columns.exercise_name, ["bench", "row"])
+        self.assertEqual(columns.sets, [3, 3])
+        self.assertEqual(columns.km, [None, None])
+
+    def test_gyma_without_person(self):
+        feed = build_compact_feed([make_gyma(1, 9, [])], {9: None})
+
+        self.assertEqual(feed.persons, {})
+        self.assertIsNone(feed.gymas[0].person)
+
+
+class WatermarkTestCase(unittest.TestCase):
+    def test_encode_decode(self):
+        watermark = Watermark(datetime(2024, 5, 1, 11, 30, 5), 42)
+
+        self.assertEqual(decode_watermark(encode_watermark(watermark)), watermark)
+
+    def test_decode_invalid(self):
+        self.assertIsNone(decode_watermark("not-a-watermark"))
+
+    def test_latest_watermark_breaks_ties_on_gyma_id(self):
+        gymas = [make_gyma(3, 7, []), make_gyma(5, 7, []), make_gyma(4, 7, [])]
+
+        self.assertEqual(latest_watermark(gymas), Watermark(datetime(2024, 5, 1, 11), 5))
+
+    def test_latest_watermark_keeps_client_watermark(self):
+        client_watermark = Watermark(datetime(2024, 6, 1), 1)
+
+        self.assertEqual(latest_watermark([], client_watermark), client_watermark)
+        self.assertEqual(latest_watermark([make_gyma(9, 7, [])], client_watermark), client_watermark)
+
+
+class WatermarkPagingTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        await migrate(self.engine)
+        async with AsyncSession(self.engine) as db:
+            left = datetime(2024, 5, 1, 11)
+            # pairs finish at the same time, the watermark breaks the tie on gyma_id
+            db.add_all(Gyma(gyma_id=gyma_id, user_id=1, time_of_arrival=left - timedelta(hours=1),
+                            time_of_leaving=left + timedelta(minutes=gyma_id // 2)) for gyma_id in range(1, 26))
+            await db.commit()
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def page(self, watermark):
+        async with AsyncSession(self.engine) as db:
+            result = await db.execute(page_after_watermark(select(Gyma), 10, watermark))
+            return list(result.scalars().all())
+
+    async def test_without_watermark_the_latest_page_is_returned(self):
+        self.assertEqual([gyma.gyma_id for gyma in await self.page(None)], list(range(25, 15, -1)))
+
+    async def test_paging_after_watermark_returns_every_gyma_once(self):
+        watermark = Watermark(datetime(2024, 5, 1, 11, 1), 3)
+        received = []
+        while page := await self.page(watermark):
+            received.extend(gyma.gyma_id for gyma in page)
+            watermark = latest_watermark(page, watermark)
+
+        self.assertEqual(received, list(range(4, 26)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import asyncio
+import unittest
+
+from database import gather_queries
+
+
+class GatherQueriesTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_queries_run_concurrently_on_their_own_sessions(self):
+        running, most_running, sessions = 0, 0, []
+
+        def query(result):
+            async def run(session):
+                nonlocal running, most_running
+                sessions.append(session)
+                running += 1
+                most_running = max(most_running, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+                return result
+            return run
+
+        results = await gather_queries(*(query(number) for number in range(5)), limit=2)
+        self.assertEqual(results, [0, 1, 2, 3, 4])
+        self.assertEqual(most_running, 2)
+        self.assertEqual(len(set(map(id, sessions))), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+from provider.localCacheProvider import LocalCache
+
+
+class LocalCacheTestCase(unittest.TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LocalCache(max_size=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(len(cache), 2)
+
+    def test_entries_expire(self):
+        cache = LocalCache(max_size=10, ttl_seconds=60)
+        cache.set("a", 1, now=100.0)
+        self.assertEqual(cache.get("a", now=159.0), 1)
+        self.assertIsNone(cache.get("a", now=160.0))
+        self.assertEqual(len(cache), 0)
+
+    def test_value_loaded_during_invalidation_is_not_stored(self):
+        cache = LocalCache(max_size=10, ttl_seconds=60)
+        generation = cache.generation
+        cache.invalidate("a")
+        self.assertFalse(cache.set("a", "stale", generation))
+        self.assertIsNone(cache.get("a"))
+        self.assertTrue(cache.set("a", "fresh", cache.generation))
+        cache.clear()
+        self.assertIsNone(cache.get("a"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import random
+import unittest
+
+from dto.locationDTO import LocationDTO
+from provider.geoProvider import LocationGrid, add_to_grid, nearest_in_grid, haversine_km
+
+
+def make_location(location_id: int, latitude: float, longitude: float) -> LocationDTO:
+    return LocationDTO(location_id=location_id, country="Netherlands", city="Utrecht",
+                       latitude=latitude, longitude=longitude)
+
+
+class LocationGridTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.locations = [make_location(i, rng.uniform(50.5, 53.5), rng.uniform(3.5, 7.0)) for i in range(500)]
+        self.grid = LocationGrid()
+        for location in self.locations:
+            add_to_grid(self.grid, location)
+
+    def brute_force(self, latitude, longitude, limit):
+        distances = sorted(
+            (haversine_km(latitude, longitude, location.latitude, location.longitude), location.location_id)
+            for location in self.locations
+        )
+        return [location_id for _, location_id in distances[:limit]]
+
+    def test_nearest_matches_brute_force(self):
+        for latitude, longitude in [(52.09, 5.12), (50.0, 3.0), (53.4, 6.9), (60.0, 20.0)]:
+            nearest = nearest_in_grid(self.grid, latitude, longitude, 5)
+
+            self.assertEqual([location.location_id for _, location in nearest],
+                             self.brute_force(latitude, longitude, 5))
+
+    def test_far_and_polar_coordinates(self):
+        # far outside the bounds of the grid, and near the poles where the ring distance bound shrinks to 0
+        for latitude, longitude in [(0.0, -60.0), (30.0, 5.0), (89.9, 5.0), (-89.0, 170.0)]:
+            nearest = nearest_in_grid(self.grid, latitude, longitude, 5)
+
+            self.assertEqual([location.location_id for _, location in nearest],
+                             self.brute_force(latitude, longitude, 5))
+
+    def test_ring_cells_are_the_perimeter_within_bounds(self):
+        grid = LocationGrid()
+        add_to_grid(grid, make_location(1, 0.05, 0.05))
+        add_to_grid(grid, make_location(2, 0.45, 0.45))
+
+        self.assertEqual(set(grid.ring_cells(0, 0, 0)), {(0, 0)})
+        self.assertEqual(set(grid.ring_cells(2, 2, 1)),
+                         {(1, 1), (1, 2), (1, 3), (2, 1), (2, 3), (3, 1), (3, 2), (3, 3)})
+        self.assertEqual(set(grid.ring_cells(0, 0, 2)), {(2, 0), (2, 1), (2, 2), (0, 2), (1, 2)})
+        self.assertEqual(grid.ring_size(0, 0, 2), 5)
+        self.assertEqual(list(grid.ring_cells(100, 100, 3)), [])
+
+    def test_max_distance(self):
+        nearest = nearest_in_grid(self.grid, 52.09, 5.12, 50, max_distance_km=10)
+
+        self.assertTrue(all(distance <= 10 for distance, _ in nearest))
+        self.assertEqual(len(nearest), len([d for d in self.brute_force(52.09, 5.12, 500)
+                                            if haversine_km(52.09, 5.12, self.locations[d].latitude,
+                                                            self.locations[d].longitude) <= 10]))
+
+    def test_empty_grid(self):
+        self.assertEqual(nearest_in_grid(LocationGrid(), 52.09, 5.12, 5), [])
+
+    def test_haversine(self):
+        # Utrecht to Amsterdam is about 35 km
+        self.assertAlmostEqual(haversine_km(52.0907, 5.1214, 52.3676, 4.9041), 34.4, delta=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import json
+import logging
+import unittest
+
+from monitoring.loggingService import JsonFormatter, SamplingFilter, redact_secrets
+
+
+class LoggingTestCase(unittest.TestCase):
+    def test_redact_secrets(self):
+        self.assertEqual(redact_secrets("Authorization: c2VjcmV0"), "Authorization: [REDACTED]")
+        self.assertEqual(redact_secrets('{"session_token": "abc", "user": 1}'),
+                         '{"session_token": "[REDACTED]", "user": 1}')
+        self.assertEqual(redact_secrets("password=hunter2 ok"), "password=[REDACTED] ok")
+        self.assertEqual(redact_secrets("Loaded 3 email templates"), "Loaded 3 email templates")
+
+    def test_json_formatter(self):
+        record = logging.LogRecord("gyma", logging.INFO, __file__, 1, "token=%s", ("abc",), None)
+
+        log = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual(log["level"], "INFO")
+        self.assertEqual(log["message"], "token=[REDACTED]")
+
+    def test_sampling_keeps_warnings(self):
+        sampling_filter = SamplingFilter(0)
+        info = logging.LogRecord("gyma", logging.INFO, __file__, 1, "info", None, None)
+        warning = logging.LogRecord("gyma", logging.WARNING, __file__, 1, "warning", None, None)
+
+        self.assertFalse(sampling_filter.filter(info))
+        self.assertTrue(sampling_filter.filter(warning))
+
+
+if __name__ == '__main__':
+    unittest.main()
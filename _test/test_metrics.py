@@ -0,0 +1,53 @@
+import unittest
+
+from monitoring.metricsService import Counter, Histogram, render_metrics, statement_operation, with_label
+
+
+class MetricsTestCase(unittest.TestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("test_histogram_seconds", "Test histogram.", ("route",), buckets=(0.1, 1.0))
+
+        histogram.observe(0.05, ("/a",))
+        histogram.observe(0.5, ("/a",))
+        histogram.observe(5, ("/a",))
+        samples = histogram.samples()
+
+        self.assertIn('test_histogram_seconds_bucket{route="/a",le="0.1"} 1', samples)
+        self.assertIn('test_histogram_seconds_bucket{route="/a",le="1.0"} 2', samples)
+        self.assertIn('test_histogram_seconds_bucket{route="/a",le="+Inf"} 3', samples)
+        self.assertIn('test_histogram_seconds_count{route="/a"} 3', samples)
+
+    def test_render_escapes_labels(self):
+        counter = Counter("test_counter_total", "Test counter.", ("path",))
+
+        counter.inc(('say "hi"',))
+        rendered = render_metrics()
+
+        self.assertIn("# TYPE test_counter_total counter", rendered)
+        self.assertIn('test_counter_total{path="say \\"hi\\""} 1', rendered)
+
+    def test_render_labels_samples_of_workers(self):
+        Counter("test_workers_total", "Test counter of workers.", ("route",))
+        samples_of_workers = {
+            "host:1": {"test_workers_total": ['test_workers_total{route="/a"} 2']},
+            "host:2": {"test_workers_total": ['test_workers_total{route="/a"} 3']},
+        }
+
+        rendered = render_metrics(samples_of_workers)
+
+        self.assertIn('test_workers_total{worker="host:1",route="/a"} 2', rendered)
+        self.assertIn('test_workers_total{worker="host:2",route="/a"} 3', rendered)
+        self.assertEqual(rendered.count("# TYPE test_workers_total counter"), 1)
+
+    def test_with_label(self):
+        self.assertEqual(with_label("requests_total 4", 'worker="a"'), 'requests_total{worker="a"} 4')
+        self.assertEqual(with_label('requests_total{path="a b"} 4', 'worker="a"'),
+                         'requests_total{worker="a",path="a b"} 4')
+
+    def test_statement_operation(self):
+        self.assertEqual(statement_operation("  select * from person"), "SELECT")
+        self.assertEqual(statement_operation("INSERT INTO gyma VALUES (1)"), "INSERT")
+
+
+if __name__ == '__main__':
+    unittest.main()
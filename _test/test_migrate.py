@@ -0,0 +1,54 @@
+import unittest
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from migration.migrate import MIGRATIONS, migrate
+from service.userVerificationService import hash_verification_code
+
+# the tables as they were created before the migrations
+LEGACY_SCHEMA = [
+    "CREATE TABLE user (user_id INTEGER PRIMARY KEY, email VARCHAR(255) NOT NULL, password_hash BLOB NOT NULL, "
+    "salt BLOB NOT NULL, account_type VARCHAR(5) NOT NULL, email_verified BOOLEAN NOT NULL)",
+    "CREATE TABLE location (location_id INTEGER PRIMARY KEY, gym_name VARCHAR(64) NOT NULL, "
+    "country VARCHAR(64), city VARCHAR(64) NOT NULL, address VARCHAR(64), zip_code VARCHAR(10))",
+    "CREATE TABLE gyma (gyma_id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES user (user_id), "
+    "time_of_arrival DATETIME NOT NULL, time_of_leaving DATETIME)",
+    "CREATE TABLE user_verification (user_id INTEGER PRIMARY KEY REFERENCES user (user_id), "
+    "verification_code VARCHAR(64) NOT NULL)",
+    "INSERT INTO user_verification (user_id, verification_code) VALUES (1, 'abc123')",
+]
+
+
+class MigrateTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def test_legacy_schema_is_migrated(self):
+        async with self.engine.begin() as connection:
+            for statement in LEGACY_SCHEMA:
+                await connection.execute(text(statement))
+
+        applied = await migrate(self.engine)
+        self.assertEqual([migration.version for migration in applied], [migration.version for migration in MIGRATIONS])
+
+        async with self.engine.connect() as connection:
+            gyma_columns = await connection.run_sync(lambda sync: [c["name"] for c in inspect(sync).get_columns("gyma")])
+            gyma_indexes = await connection.run_sync(lambda sync: [i["name"] for i in inspect(sync).get_indexes("gyma")])
+            verification_code_hash = (await connection.execute(text(
+                "SELECT verification_code_hash FROM user_verification"))).scalar_one()
+
+        self.assertIn("location_id", gyma_columns)
+        self.assertIn("ix_gyma_user_id_time_of_leaving", gyma_indexes)
+        self.assertEqual(verification_code_hash, hash_verification_code("abc123"))
+
+    async def test_migrations_are_applied_once(self):
+        self.assertEqual(len(await migrate(self.engine)), len(MIGRATIONS))
+        self.assertEqual(await migrate(self.engine), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
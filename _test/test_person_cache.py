@@ -0,0 +1,44 @@
+import os
+import unittest
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+
+os.environ.setdefault("SESSION_EXPIRE_TIME_SECONDS", "3600")
+os.environ.setdefault("SESSION_EXPIRE_TIME_SECONDS_TRUST_DEVICE", "2592000")
+
+from provider.personCacheProvider import get_person_snapshots, stop_person_cache_invalidation
+
+
+def stored_person(profile_url: str) -> SimpleNamespace:
+    return SimpleNamespace(person_id=1, profile_url=profile_url, first_name="John", last_name="Smith",
+                           date_of_birth=date(1990, 1, 1), sex="m", city=None, profile_text=None, gyma_share="pub",
+                           pf_path_m=None, pf_path_l=None)
+
+
+@patch("provider.personCacheProvider.create_redis_connection", AsyncMock(return_value=None))
+class PersonCacheTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        # clears L1
+        await stop_person_cache_invalidation()
+
+    async def test_profile_urls_match_case_insensitively(self):
+        load_persons = AsyncMock(return_value=[stored_person("johnsmith")])
+
+        snapshots = await get_person_snapshots(["JohnSmith", "johnsmith"], load_persons)
+
+        self.assertEqual(snapshots["JohnSmith"].person_id, 1)
+        self.assertEqual(snapshots["johnsmith"].person_id, 1)
+        self.assertEqual(await get_person_snapshots(["JOHNSMITH"], load_persons), {"JOHNSMITH": snapshots["johnsmith"]})
+        load_persons.assert_awaited_once()
+
+    async def test_person_found_by_id_and_profile_url_in_one_load(self):
+        load_persons = AsyncMock(return_value=[stored_person("johnsmith")])
+
+        snapshots = await get_person_snapshots([1, "johnsmith", "nobody"], load_persons)
+
+        self.assertEqual(set(snapshots), {1, "johnsmith"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import unittest
+from datetime import date
+
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+os.environ.setdefault("SESSION_EXPIRE_TIME_SECONDS", "3600")
+os.environ.setdefault("SESSION_EXPIRE_TIME_SECONDS_TRUST_DEVICE", "2592000")
+
+from migration.migrate import migrate
+from model.Person import Person
+from service.personService import next_free_profile_url, generate_unique_profile_url, PROFILE_URL_MAX_LENGTH
+
+
+class NextFreeProfileUrlTestCase(unittest.TestCase):
+    def test_free_base_is_used(self):
+        self.assertEqual(next_free_profile_url("johnsmith", {"johnsmith1"}), "johnsmith")
+
+    def test_first_gap_is_used(self):
+        taken_profile_urls = {"johnsmith", "johnsmith1", "johnsmith3"}
+
+        self.assertEqual(next_free_profile_url("johnsmith", taken_profile_urls), "johnsmith2")
+
+    def test_long_base_is_shortened_for_a_multi_digit_count(self):
+        base_profile_url = "x" * 30
+        taken_profile_urls = {base_profile_url, *(f"{base_profile_url}{count}" for count in range(1, 100))}
+
+        profile_url = next_free_profile_url(base_profile_url, taken_profile_urls)
+
+        self.assertEqual(profile_url, "x" * 29 + "100")
+        self.assertEqual(len(profile_url), PROFILE_URL_MAX_LENGTH)
+
+
+class GenerateUniqueProfileUrlTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        await migrate(self.engine)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def add_persons(self, *profile_urls: str) -> None:
+        async with AsyncSession(self.engine) as db:
+            db.add_all(Person(person_id=person_id, profile_url=profile_url, first_name="John", last_name="Smith",
+                              date_of_birth=date(1990, 1, 1), sex="m")
+                       for person_id, profile_url in enumerate(profile_urls, start=1))
+            await db.commit()
+
+    async def generate(self, first_name: str, last_name: str) -> str:
+        async with AsyncSession(self.engine) as db:
+            return await generate_unique_profile_url(db, first_name, last_name)
+
+    async def test_taken_base_with_gaps(self):
+        await self.add_persons("johnsmith", "johnsmith1", "johnsmith2", "johnsmith4")
+
+        self.assertEqual(await self.generate("John", "Smith"), "johnsmith3")
+
+    async def test_long_name_with_multi_digit_count(self):
+        first_name, last_name = "Maximiliane", "Vandenberghe-Oostermeijer"
+        base_profile_url = f"{first_name}{last_name}".lower()[:30]
+        await self.add_persons(base_profile_url, *(f"{base_profile_url[:PROFILE_URL_MAX_LENGTH - len(str(count))]}"
+                                                   f"{count}" for count in range(1, 100)))
+
+        profile_url = await self.generate(first_name, last_name)
+
+        self.assertEqual(profile_url, base_profile_url[:29] + "100")
+
+    async def test_like_wildcards_in_names_are_literal(self):
+        await self.add_persons("a_b%c", "axbyc1", "a\\bc")
+
+        self.assertEqual(await self.generate("A_b", "%c"), "a_b%c1")
+        self.assertEqual(await self.generate("A\\b", "c"), "a\\bc1")
+        self.assertEqual(await self.generate("Ax", "byc"), "axbyc")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import pstats
+import tempfile
+import unittest
+
+from monitoring.profilingService import start_profiler, stop_profiler, profile_file_name, write_profile
+
+
+class ProfilingTestCase(unittest.TestCase):
+    def test_profile_is_written_as_pstats(self):
+        profiler = start_profiler()
+        self.assertIsNotNone(profiler)
+        self.assertIsNone(start_profiler())
+        sorted(range(1000), reverse=True)
+        stop_profiler(profiler)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = write_profile(profiler, profile_file_name("GET", "/api/v1/profile/abc", 1.5), directory)
+
+            self.assertTrue(path.endswith("-GET-api_v1_profile_abc-1500ms.prof"))
+            stats = pstats.Stats(path)
+            self.assertTrue(any(function[2] == "<built-in method builtins.sorted>" for function in stats.stats))
+
+
+if __name__ == '__main__':
+    unittest.main()
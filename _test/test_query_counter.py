@@ -0,0 +1,55 @@
+import unittest
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from monitoring.queryCounter import assert_max_queries, QueryCounterMiddleware
+from monitoring.statementMonitor import monitor_engine
+
+
+class QueryCounterTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        monitor_engine(self.engine)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def test_assert_max_queries(self):
+        async with self.engine.connect() as connection:
+            with assert_max_queries(2) as stats:
+                await connection.execute(text("SELECT 1"))
+                await connection.execute(text("SELECT 1"))
+            self.assertEqual(stats.shapes["SELECT 1"], 2)
+
+            with self.assertRaises(AssertionError):
+                with assert_max_queries(1):
+                    await connection.execute(text("SELECT 1"))
+                    await connection.execute(text("SELECT 2"))
+
+    async def test_middleware_reports_queries_and_repeated_shapes(self):
+        async def app(scope, receive, send):
+            async with self.engine.connect() as connection:
+                for person_id in range(3):
+                    await connection.execute(text("SELECT :person_id"), {"person_id": person_id})
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        middleware = QueryCounterMiddleware(app, debug=True, threshold=2)
+        scope = {"type": "http", "method": "GET", "path": "/api/v1/gymbros/gymas"}
+        with self.assertLogs(level="WARNING") as logs:
+            await middleware(scope, None, send)
+
+        headers = dict(messages[0]["headers"])
+        self.assertEqual(headers[b"x-db-queries"], b"3")
+        self.assertIn(b"x-db-time", headers)
+        self.assertIn("ran the same statement 3 times", logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from provider.tokenBucketProvider import RateLimitPolicy, take_token, take_local_token
+
+
+class TokenBucketTestCase(unittest.TestCase):
+    def test_bucket_empties_and_refills(self):
+        policy = RateLimitPolicy(capacity=2, period_seconds=10)
+
+        tokens, retry_after = take_token(2, 0, 0, policy)
+        self.assertEqual((tokens, retry_after), (1, 0))
+        tokens, retry_after = take_token(tokens, 0, 0, policy)
+        self.assertEqual((tokens, retry_after), (0, 0))
+
+        tokens, retry_after = take_token(tokens, 0, 0, policy)
+        self.assertEqual(tokens, 0)
+        self.assertAlmostEqual(retry_after, 5)
+
+        tokens, retry_after = take_token(tokens, 0, 5, policy)
+        self.assertEqual(retry_after, 0)
+
+    def test_refill_is_capped(self):
+        policy = RateLimitPolicy(capacity=3, period_seconds=60)
+
+        tokens, _ = take_token(0, 0, 3600, policy)
+
+        self.assertEqual(tokens, 2)
+
+    def test_local_buckets_are_per_key(self):
+        policy = RateLimitPolicy(capacity=1, period_seconds=60)
+
+        self.assertEqual(take_local_token("test:a", policy, now=100), 0)
+        self.assertGreater(take_local_token("test:a", policy, now=100), 0)
+        self.assertEqual(take_local_token("test:b", policy, now=100), 0)
+        self.assertEqual(take_local_token("test:a", policy, now=160), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
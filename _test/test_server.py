@@ -0,0 +1,65 @@
+import unittest
+from unittest import mock
+
+import server
+from server import WorkerSupervisor, restart_delay
+
+
+class FakeProcess:
+    pid = 1
+    exitcode = 1
+
+    def is_alive(self) -> bool:
+        return False
+
+    def join(self, timeout: float | None = None) -> None:
+        pass
+
+
+class WorkerSupervisorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.supervisor = WorkerSupervisor(workers=1)
+        self.supervisor.processes = [FakeProcess()]
+        self.supervisor.started_at = [0.0]
+        self.supervisor.fast_failures = [0]
+        self.supervisor.restart_at = [0.0]
+        self.supervisor.start_worker = mock.Mock(side_effect=lambda sockets: FakeProcess())
+
+    def test_restart_delay_doubles_up_to_the_maximum(self):
+        self.assertEqual(restart_delay(0), 0.0)
+        self.assertEqual(restart_delay(1), 1.0)
+        self.assertEqual(restart_delay(3), 4.0)
+        self.assertEqual(restart_delay(100), server.WORKER_MAX_RESTART_DELAY_SECONDS)
+
+    def test_worker_failing_fast_is_restarted_after_a_delay(self):
+        with mock.patch("server.time.monotonic", return_value=1.0):
+            self.supervisor.check_worker(0, [])
+        self.assertEqual(self.supervisor.fast_failures, [1])
+        self.supervisor.start_worker.assert_not_called()
+
+        with mock.patch("server.time.monotonic", return_value=2.0):
+            self.supervisor.check_worker(0, [])
+        self.supervisor.start_worker.assert_called_once()
+
+    def test_worker_exiting_after_running_a_while_is_restarted_at_once(self):
+        self.supervisor.fast_failures = [2]
+
+        with mock.patch("server.time.monotonic", return_value=server.WORKER_FAST_FAILURE_SECONDS + 1):
+            self.supervisor.check_worker(0, [])
+
+        self.assertEqual(self.supervisor.fast_failures, [0])
+        self.supervisor.start_worker.assert_called_once()
+
+    def test_supervisor_gives_up_after_repeated_fast_failures(self):
+        self.supervisor.fast_failures = [server.SERVER_MAX_FAST_FAILURES - 1]
+
+        with mock.patch("server.time.monotonic", return_value=1.0):
+            self.supervisor.check_worker(0, [])
+
+        self.assertTrue(self.supervisor.failed)
+        self.assertTrue(self.supervisor.should_exit.is_set())
+        self.supervisor.start_worker.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from monitoring.tracingService import FileSpanExporter, OtlpSpanExporter, TracingMiddleware, setup_tracing, \
+    shutdown_tracing, span, traced
+
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    """ Stand-in for an OpenTelemetry collector, keeps the posted spans. """
+    spans = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        for resource_spans in body["resourceSpans"]:
+            for scope_spans in resource_spans["scopeSpans"]:
+                CollectorHandler.spans.extend(scope_spans["spans"])
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@traced
+async def get_person():
+    with span("SELECT", kind=3):
+        return "person"
+
+
+async def app(scope, receive, send):
+    await get_person()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def send(message):
+    pass
+
+
+class TracingTestCase(unittest.IsolatedAsyncioTestCase):
+    def tearDown(self):
+        shutdown_tracing()
+
+    async def test_spans_are_exported_to_collector(self):
+        server = HTTPServer(("127.0.0.1", 0), CollectorHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        setup_tracing(OtlpSpanExporter(f"http://127.0.0.1:{server.server_port}"))
+
+        traceparent = b"00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+        scope = {"type": "http", "method": "GET", "path": "/api/v1/profile/abc", "headers": [(b"traceparent", traceparent)]}
+        await TracingMiddleware(app)(scope, None, send)
+        shutdown_tracing()
+        server.shutdown()
+
+        spans = {exported["name"]: exported for exported in CollectorHandler.spans}
+        self.assertEqual(set(spans), {"GET /api/v1/profile/abc", "test_tracing.get_person", "SELECT"})
+        root = spans["GET /api/v1/profile/abc"]
+        self.assertEqual(root["traceId"], "0af7651916cd43dd8448eb211c80319c")
+        self.assertEqual(root["parentSpanId"], "b7ad6b7169203331")
+        self.assertEqual(spans["test_tracing.get_person"]["parentSpanId"], root["spanId"])
+        self.assertEqual(spans["SELECT"]["parentSpanId"], spans["test_tracing.get_person"]["spanId"])
+
+    async def test_no_spans_outside_of_trace(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces.jsonl")
+            setup_tracing(FileSpanExporter(path))
+
+            await get_person()
+            shutdown_tracing()
+
+            self.assertFalse(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from unittest.mock import patch
+
+from provider.authProvider import create_verification_token, verify_verification_token
+
+
+@patch('provider.authProvider.VERIFICATION_SECRET', "test-secret")
+class VerificationTokenTestCase(unittest.TestCase):
+    def test_round_trip(self):
+        token = create_verification_token(42)
+
+        self.assertEqual(verify_verification_token(token), 42)
+
+    def test_expired(self):
+        token = create_verification_token(42, expire_seconds=-1)
+
+        self.assertIsNone(verify_verification_token(token))
+
+    def test_tampered(self):
+        user_id, expires_at, signature = create_verification_token(42).split(".")
+
+        self.assertIsNone(verify_verification_token(f"43.{expires_at}.{signature}"))
+        self.assertIsNone(verify_verification_token(f"{user_id}.{int(expires_at) + 1}.{signature}"))
+
+    def test_other_secret(self):
+        token = create_verification_token(42)
+
+        with patch('provider.authProvider.VERIFICATION_SECRET', "other-secret"):
+            self.assertIsNone(verify_verification_token(token))
+
+    def test_stored_code_is_not_a_token(self):
+        self.assertIsNone(verify_verification_token("aB3" * 21 + "x"))
+
+
+if __name__ == '__main__':
+    unittest.main()
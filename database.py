@@ -2,22 +2,31 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
+import asyncio
 import os
-from dotenv import load_dotenv
+from typing import Any, Awaitable, Callable
+import environment  # noqa: F401
 import logging
 
-load_dotenv()
+from monitoring.statementMonitor import monitor_engine
+
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME", "gyma_db")
 DB_DRIVER = os.getenv("DB_DRIVER", "aiomysql")
+# per worker process, SERVER_WORKERS * (DB_POOL_SIZE + DB_MAX_OVERFLOW) has to stay below max_connections of MySQL
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# connections one gather_queries call holds at once, on top of the session of the request
+DB_CONCURRENT_QUERIES_PER_REQUEST = int(os.getenv("DB_CONCURRENT_QUERIES_PER_REQUEST", "3"))
 
 DATABASE_URL = f"mysql+{DB_DRIVER}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+engine = create_async_engine(DATABASE_URL, echo=False, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+monitor_engine(engine)
 
 
 AsyncSessionLocal = sessionmaker(
@@ -36,3 +45,18 @@ async def get_db():
             yield session
         finally:
             await session.close()
+
+
+async def gather_queries(*queries: Callable[[AsyncSession], Awaitable[Any]],
+                         limit: int = DB_CONCURRENT_QUERIES_PER_REQUEST) -> list:
+    """ Run independent read queries concurrently, each on its own short-lived session and pooled connection, and
+    return their results in order. At most limit queries hold a connection at once, so one request cannot take the
+    whole pool. Objects returned by the queries are detached, only their loaded attributes can be used. """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run_query(query: Callable[[AsyncSession], Awaitable[Any]]) -> Any:
+        async with semaphore:
+            async with AsyncSessionLocal() as session:
+                return await query(session)
+
+    return list(await asyncio.gather(*(run_query(query) for query in queries)))
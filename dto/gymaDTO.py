@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Dict
 
 from pydantic import BaseModel, Field
 
@@ -14,3 +14,29 @@ class GymaDTO(BaseModel):
     time_of_leaving: Optional[datetime] = None
     exercises: List[ExerciseDTO] = []
 
+
+class ExerciseColumnsDTO(BaseModel):
+    """ Exercises of a gyma in columnar layout, index i of every column belongs to the same exercise. """
+    exercise_name: List[str] = []
+    exercise_type: List[str] = []
+    count: List[Optional[int]] = []
+    sets: List[Optional[int]] = []
+    weight: List[Optional[float]] = []
+    minutes: List[Optional[int]] = []
+    km: List[Optional[float]] = []
+    level: List[Optional[int]] = []
+    description: List[Optional[str]] = []
+
+
+class CompactGymaDTO(BaseModel):
+    gyma_id: int = Field(..., description="Used for excluding gyma to send, when client has them in localstorage")
+    person: Optional[str] = Field(default=None, description="profile_url, key of the person in CompactFeedDTO.persons")
+    time_of_arrival: datetime
+    time_of_leaving: Optional[datetime] = None
+    exercises: ExerciseColumnsDTO = ExerciseColumnsDTO()
+
+
+class CompactFeedDTO(BaseModel):
+    """ Feed with every person sent once, gymas reference them by profile_url. """
+    persons: Dict[str, PersonSimpleDTO] = {}
+    gymas: List[CompactGymaDTO] = []
@@ -0,0 +1,15 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from dto.personDTO import PersonSimpleDTO
+
+
+class GymaEventDTO(BaseModel):
+    """ Pushed to the gymbros of person when person starts or ends a gyma. """
+    event: str = Field(..., description="start_gyma or end_gyma")
+    gyma_id: int
+    person: PersonSimpleDTO
+    time_of_arrival: datetime
+    time_of_leaving: Optional[datetime] = None
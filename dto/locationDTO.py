@@ -0,0 +1,25 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class LocationDTO(BaseModel, frozen=True):
+    location_id: int
+    gym_name: Optional[str] = None
+    country: str
+    city: str
+    address: Optional[str] = None
+    zip_code: Optional[str] = None
+    # only set for the locations with coordinates, the nearby search only returns those
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+class NearbyLocationDTO(BaseModel):
+    location: LocationDTO
+    distance_km: float
+
+
+class BusyLocationDTO(BaseModel):
+    location: LocationDTO
+    training_now: int
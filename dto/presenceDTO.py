@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+from dto.personDTO import PersonSimpleDTO
+
+
+class PresenceDTO(BaseModel):
+    """ A gymbro training right now. """
+    person: PersonSimpleDTO
+    since: datetime
+
+
+class TrainingNowDTO(BaseModel):
+    training_now: int
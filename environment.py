@@ -0,0 +1,4 @@
+from dotenv import load_dotenv
+
+# Imported by every module reading settings at import time, so .env is read once per process, before the first one
+load_dotenv()
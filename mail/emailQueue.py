@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+
+from redis.exceptions import RedisError
+
+from mail.emailService import send_email, build_verification_email
+from session.sessionService import create_redis_connection
+
+EMAIL_QUEUE_KEY = "email_queue"  # LPUSH by requests, BRPOPLPUSH by workers
+EMAIL_PROCESSING_KEY_PREFIX = "email_processing:"  # per worker, emails being sent
+EMAIL_WORKERS_KEY = "email_workers"  # SET of the names of the workers that may have a processing list
+EMAIL_WORKER_LEASE_KEY_PREFIX = "email_worker_lease:"  # per worker, expires when the worker stops renewing it
+EMAIL_WORKER_LEASE_SECONDS = int(os.getenv("EMAIL_WORKER_LEASE_SECONDS", "30"))
+EMAIL_RETRY_KEY = "email_retry"  # ZSET scored by the time an email is due again
+EMAIL_DEAD_LETTER_KEY = "email_dead_letter"
+EMAIL_DEAD_LETTER_MAX_SIZE = 10000
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BASE_SECONDS = int(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+EMAIL_RETRY_MAX_SECONDS = 60 * 60
+EMAIL_QUEUE_ERROR_BACKOFF_SECONDS = 1
+
+# move a retry to the queue when it is still in the retry set, returns 1 when it was moved
+REQUEUE_RETRY_SCRIPT = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 1 then
+    redis.call('LPUSH', KEYS[2], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+
+def retry_delay_seconds(attempts: int) -> int:
+    """ Exponential backoff after a failed attempt, capped at an hour. """
+    return min(EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), EMAIL_RETRY_MAX_SECONDS)
+
+
+async def push_email(recipient: str, subject: str, content: str, content_type: str = "plain") -> bool:
+    """ Append an email to the outbound queue, sent by the email worker. """
+    email = {
+        "id": str(uuid.uuid4()),
+        "recipient": recipient,
+        "subject": subject,
+        "content": content,
+        "content_type": content_type,
+        "attempts": 0,
+    }
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            return False
+        await redis_connection.lpush(EMAIL_QUEUE_KEY, json.dumps(email))
+        return True
+    except RedisError as e:
+        logging.error(f"Error queueing email: {e}")
+        return False
+    except Exception as e:
+        logging.error(f"Other Exception while push_email: {e}")
+        return False
+
+
+async def queue_email(recipient: str, subject: str, content: str, content_type: str = "plain") -> bool:
+    """ Queue an email, sent directly over the cached connection when the queue is not available. """
+    if await push_email(recipient, subject, content, content_type):
+        return True
+    logging.warning("Email queue not available, sending email directly")
+    return await send_email(recipient, subject, content, content_type)
+
+
+async def queue_verification_email(verification_code: str, recipient: str) -> bool:
+    """ Queue a verification code/ link to recipient, for email verification after registering. """
+    subject, content = build_verification_email(verification_code)
+    return await queue_email(recipient, subject, content, "html")
+
+
+async def take_email(worker_name: str, timeout: int) -> str | None:
+    """ Move the oldest queued email to the processing list of worker_name, waiting at most timeout seconds.
+    The email stays there until it is acknowledged, retried or dead-lettered. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is not None:
+            return await redis_connection.brpoplpush(EMAIL_QUEUE_KEY, EMAIL_PROCESSING_KEY_PREFIX + worker_name,
+                                                     timeout)
+    except RedisError as e:
+        logging.error(f"Error taking email from queue: {e}")
+    except Exception as e:
+        logging.error(f"Other Exception while take_email: {e}")
+    # do not spin while Redis is unavailable
+    await asyncio.sleep(EMAIL_QUEUE_ERROR_BACKOFF_SECONDS)
+    return None
+
+
+async def ack_email(worker_name: str, raw_email: str) -> bool:
+    """ Remove a sent email from the processing list of worker_name. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            return False
+        await redis_connection.lrem(EMAIL_PROCESSING_KEY_PREFIX + worker_name, 1, raw_email)
+        return True
+    except RedisError as e:
+        logging.error(f"Error acknowledging email: {e}")
+        return False
+    except Exception as e:
+        logging.error(f"Other Exception while ack_email: {e}")
+        return False
+
+
+async def fail_email(worker_name: str, raw_email: str, error: str, permanent: bool = False) -> bool:
+    """ Schedule a failed email for a retry with backoff, or move it to the dead letter list after
+    EMAIL_MAX_ATTEMPTS or a permanent failure. """
+    email = json.loads(raw_email)
+    email["attempts"] += 1
+    email["error"] = error
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            return False
+        async with redis_connection.pipeline(transaction=True) as pipe:
+            pipe.lrem(EMAIL_PROCESSING_KEY_PREFIX + worker_name, 1, raw_email)
+            if permanent or email["attempts"] >= EMAIL_MAX_ATTEMPTS:
+                logging.error(f"Email {email['id']} dead-lettered after {email['attempts']} attempts: {error}")
+                pipe.lpush(EMAIL_DEAD_LETTER_KEY, json.dumps(email))
+                pipe.ltrim(EMAIL_DEAD_LETTER_KEY, 0, EMAIL_DEAD_LETTER_MAX_SIZE - 1)
+            else:
+                due_at = time.time() + retry_delay_seconds(email["attempts"])
+                pipe.zadd(EMAIL_RETRY_KEY, {json.dumps(email): due_at})
+            await pipe.execute()
+        return True
+    except RedisError as e:
+        logging.error(f"Error scheduling email retry: {e}")
+        return False
+    except Exception as e:
+        logging.error(f"Other Exception while fail_email: {e}")
+        return False
+
+
+async def requeue_due_emails() -> int:
+    """ Move retries that are due back to the queue, returns how many were moved. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            return 0
+        moved = 0
+        for raw_email in await redis_connection.zrangebyscore(EMAIL_RETRY_KEY, "-inf", time.time()):
+            # removed and queued in one step, only the worker that removes the retry queues it
+            moved += await redis_connection.eval(REQUEUE_RETRY_SCRIPT, 2, EMAIL_RETRY_KEY, EMAIL_QUEUE_KEY, raw_email)
+        return moved
+    except RedisError as e:
+        logging.error(f"Error requeueing email retries: {e}")
+        return 0
+    except Exception as e:
+        logging.error(f"Other Exception while requeue_due_emails: {e}")
+        return 0
+
+
+async def renew_worker_lease(worker_name: str) -> bool:
+    """ Register worker_name and extend its lease, the emails it is sending are its own until the lease expires. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            return False
+        async with redis_connection.pipeline(transaction=True) as pipe:
+            pipe.sadd(EMAIL_WORKERS_KEY, worker_name)
+            pipe.set(EMAIL_WORKER_LEASE_KEY_PREFIX + worker_name, "1", ex=EMAIL_WORKER_LEASE_SECONDS)
+            await pipe.execute()
+        return True
+    except RedisError as e:
+        logging.error(f"Error renewing email worker lease: {e}")
+        return False
+    except Exception as e:
+        logging.error(f"Other Exception while renew_worker_lease: {e}")
+        return False
+
+
+async def release_worker_lease(worker_name: str) -> int:
+    """ Move the emails left in the processing list of a stopping worker back to the queue and drop its lease,
+    returns how many emails were moved. """
+    moved = await requeue_processing_emails(worker_name)
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            return moved
+        async with redis_connection.pipeline(transaction=True) as pipe:
+            pipe.delete(EMAIL_WORKER_LEASE_KEY_PREFIX + worker_name)
+            pipe.srem(EMAIL_WORKERS_KEY, worker_name)
+            await pipe.execute()
+    except RedisError as e:
+        logging.error(f"Error releasing email worker lease: {e}")
+    except Exception as e:
+        logging.error(f"Other Exception while release_worker_lease: {e}")
+    return moved
+
+
+async def requeue_emails_of_dead_workers() -> int:
+    """ Move the emails in the processing lists of workers whose lease expired, because they crashed or were
+    killed, back to the queue. Returns how many were moved. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            return 0
+        moved = 0
+        for worker_name in await redis_connection.smembers(EMAIL_WORKERS_KEY):
+            if await redis_connection.exists(EMAIL_WORKER_LEASE_KEY_PREFIX + worker_name):
+                continue
+            moved += await requeue_processing_emails(worker_name)
+            # a worker that only lost its lease for a moment registers itself again on its next renewal
+            await redis_connection.srem(EMAIL_WORKERS_KEY, worker_name)
+        return moved
+    except RedisError as e:
+        logging.error(f"Error requeueing emails of dead workers: {e}")
+        return 0
+    except Exception as e:
+        logging.error(f"Other Exception while requeue_emails_of_dead_workers: {e}")
+        return 0
+
+
+async def requeue_processing_emails(worker_name: str) -> int:
+    """ Move emails left in the processing list of worker_name, by a stopped or dead worker, back to the queue. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            return 0
+        moved = 0
+        while await redis_connection.rpoplpush(EMAIL_PROCESSING_KEY_PREFIX + worker_name, EMAIL_QUEUE_KEY):
+            moved += 1
+        return moved
+    except RedisError as e:
+        logging.error(f"Error requeueing processing emails: {e}")
+        return 0
+    except Exception as e:
+        logging.error(f"Other Exception while requeue_processing_emails: {e}")
+        return 0
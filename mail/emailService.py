@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 import uuid
@@ -6,38 +7,49 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
 from aiosmtplib import SMTPException, SMTP
-from dotenv import load_dotenv
+import environment  # noqa: F401
 import aiosmtplib
 
-load_dotenv()
+from mail.emailTemplates import render_template
+from monitoring.metricsService import SMTP_SEND_SECONDS
+from monitoring.tracingService import span, KIND_CLIENT
+
 _email_connection = None  # Cached mail server connection object
+_email_connection_lock = asyncio.Lock()  # The cached connection can only send one message at a time
 
 
-async def create_email_connection():
-    """
-    Create and return an asynchronous mail server connection object.
-    This function will attempt to create a connection using the SMTP credentials
-    provided in environment variables and cache it globally.
-    """
-    global _email_connection
+async def open_email_connection() -> SMTP | None:
+    """ Open a new mail server connection and log in with the SMTP credentials of the environment, not cached. """
     email_host = os.getenv("EMAIL_HOST")
     email_port = int(os.getenv("EMAIL_PORT"))
     email_username = os.getenv("EMAIL_USERNAME")
     email_password = os.getenv("EMAIL_PASSWORD")
-    use_tls = os.getenv("EMAIL_USE_TLS", True)
+    use_tls = os.getenv("EMAIL_USE_TLS", "true").lower() not in ("false", "0", "")
 
     try:
         smtp_client = aiosmtplib.SMTP(
             hostname=email_host, port=email_port, use_tls=use_tls
         )
         await smtp_client.connect()
-        await smtp_client.login(email_username, email_password)
-        _email_connection = smtp_client
-        logging.info("SMTP connection established and cached.")
+        if email_password:
+            await smtp_client.login(email_username, email_password)
+        return smtp_client
 
     except SMTPException as e:
         logging.error(f"Failed to create mail connection: {e}")
-        _email_connection = None
+        return None
+
+
+async def create_email_connection():
+    """
+    Create and return an asynchronous mail server connection object.
+    This function will attempt to create a connection using the SMTP credentials
+    provided in environment variables and cache it globally.
+    """
+    global _email_connection
+    _email_connection = await open_email_connection()
+    if _email_connection is not None:
+        logging.info("SMTP connection established and cached.")
 
     return _email_connection
 
@@ -57,32 +69,51 @@ async def get_email_connection():
     return _email_connection
 
 
-async def send_email(recipient: str, subject: str, content: str, content_type: str = "plain") -> bool:
-    """ Sending a mail to recipient. Content_types can be 'plain' or 'html'. """
-    smtp_client = None
+async def close_cached_email_connection() -> None:
+    """ Quit the cached mail server connection, called when the app shuts down. """
+    global _email_connection
+    if _email_connection is None:
+        return
     try:
-        smtp_client = await get_email_connection()
-        if smtp_client is None:
-            logging.error("Unable to send mail: Email connection is not available.")
-            return False
+        if _email_connection.is_connected:
+            await _email_connection.quit()
+    except SMTPException as e:
+        logging.error(f"Failed to close mail connection: {e}")
+    _email_connection = None
+
 
-        sender_email = os.getenv("EMAIL_USERNAME")
-        sender_name = os.getenv("EMAIL_NAME")
-        sender = f"{sender_name} <{sender_email}>"
+def build_message(recipient: str, subject: str, content: str, content_type: str = "plain") -> MIMEMultipart:
+    """ Build a mail message from the configured sender to recipient. Content_types can be 'plain' or 'html'. """
+    sender_email = os.getenv("EMAIL_USERNAME")
+    sender_name = os.getenv("EMAIL_NAME")
+    sender = f"{sender_name} <{sender_email}>"
 
-        domain = os.getenv("EMAIL_DOMAIN")
+    domain = os.getenv("EMAIL_DOMAIN")
 
-        message = MIMEMultipart('alternative')
-        message['From'] = sender
-        message['To'] = recipient
-        message['Subject'] = Header(subject, 'utf-8')
+    message = MIMEMultipart('alternative')
+    message['From'] = sender
+    message['To'] = recipient
+    message['Subject'] = Header(subject, 'utf-8')
 
-        message_id = f"<{uuid.uuid4()}@{domain}>"
-        message['Message-ID'] = message_id
+    message_id = f"<{uuid.uuid4()}@{domain}>"
+    message['Message-ID'] = message_id
 
-        message.attach(MIMEText(content, content_type, 'utf-8'))
+    message.attach(MIMEText(content, content_type, 'utf-8'))
+    return message
 
-        await smtp_client.send_message(message)
+
+async def send_email(recipient: str, subject: str, content: str, content_type: str = "plain") -> bool:
+    """ Sending a mail to recipient. Content_types can be 'plain' or 'html'. """
+    try:
+        message = build_message(recipient, subject, content, content_type)
+        async with _email_connection_lock:
+            smtp_client = await get_email_connection()
+            if smtp_client is None:
+                logging.error("Unable to send mail: Email connection is not available.")
+                return False
+
+            with SMTP_SEND_SECONDS.time(), span("smtp send", KIND_CLIENT):
+                await smtp_client.send_message(message)
         logging.info(f"Email successfully sent to {recipient}")
         return True
 
@@ -91,32 +122,29 @@ async def send_email(recipient: str, subject: str, content: str, content_type: s
         return False
 
 
-async def send_verification_email(verification_code: str, recipient: str) -> bool:
-    """ Sending a verification code/ link to recipient, for email verification after registering. """
-    logging.info(f"Sending verification code/ link to {recipient}")
+def build_verification_email(verification_code: str) -> tuple[str, str]:
+    """ Subject and html content of the verification code/ link email, for email verification after registering. """
     verification_url = os.getenv("WEBSITE_URL")
 
     subject = "Verify your Gyma account"
     link = f"{verification_url}/verify/{verification_code}"
-    content = f"""
-    <html>
-        <body>
-            <h1 style="color: #4e496f;">Verify Your Gyma Account</h1>
-            <p>Thank you for registering at Gyma. 
-                Please confirm your email address by clicking on the button below:</p>
-            <table cellspacing="0" cellpadding="0"> <tr>
-                <td align="center" width="200" height="40" bgcolor="#4e496f" style="display: block;">
-                    <a href="{link}" style="font-size: 16px; font-family: Helvetica, Arial, sans-serif; color: #ffffff;
-                    text-decoration: none; line-height:40px; width:100%; display:inline-block">
-                    <span style="color: #ffffff;">Verify Email</span></a>
-                </td>
-            </tr> </table>
-            <p>If you did not request this verification, please ignore this email.</p>
-            <br>
-            <p>If you cannot click the button, please copy and paste the URL below into your browser:</p>
-            <p>{link}</p>
-        </body>
-    </html>
-    """
+    return subject, render_template("verification_email.html", link=link)
+
 
-    return await send_email(recipient, subject, content, "html")
+def build_friend_request_digest(first_name: str, requesters: list[tuple[str, str, str]]) -> tuple[str, str]:
+    """ Subject and html content of the digest of new friend requests, requesters as
+    (profile_url, first_name, last_name). """
+    website_url = os.getenv("WEBSITE_URL")
+
+    if len(requesters) == 1:
+        summary = f"{requesters[0][1]} wants to be your gymbro."
+    else:
+        summary = f"{requesters[0][1]} and {len(requesters) - 1} others want to be your gymbro."
+    items = "".join(
+        render_template("friend_request_digest_item.html", profile_link=f"{website_url}/profile/{profile_url}",
+                        first_name=requester_first_name, last_name=requester_last_name)
+        for profile_url, requester_first_name, requester_last_name in requesters
+    )
+    content = render_template("friend_request_digest.html", trusted={"requesters": items},
+                              first_name=first_name, summary=summary, link=website_url)
+    return "New gymbro requests on Gyma", content
@@ -0,0 +1,44 @@
+import html
+import logging
+from pathlib import Path
+from string import Template
+
+TEMPLATE_DIRECTORY = Path(__file__).parent / "templates"
+
+_templates: dict[str, list[tuple[str, str | None]]] = {}  # template name to its compiled parts
+
+
+def compile_template(source: str) -> list[tuple[str, str | None]]:
+    """ Split template source once into (literal, placeholder) parts, placeholders use string.Template syntax. """
+    parts = []
+    position = 0
+    for match in Template.pattern.finditer(source):
+        literal = source[position:match.start()]
+        if match.group("escaped") is not None:
+            parts.append((literal + "$", None))
+        elif match.group("named") or match.group("braced"):
+            parts.append((literal, match.group("named") or match.group("braced")))
+        else:
+            raise ValueError(f"Invalid placeholder in template at position {match.start()}")
+        position = match.end()
+    parts.append((source[position:], None))
+    return parts
+
+
+def load_templates(directory: Path = TEMPLATE_DIRECTORY) -> int:
+    """ Read and compile all templates of directory once, returns how many were loaded. """
+    for path in directory.glob("*.html"):
+        _templates[path.name] = compile_template(path.read_text(encoding="utf-8"))
+    logging.info(f"Loaded {len(_templates)} email templates")
+    return len(_templates)
+
+
+def render_template(name: str, trusted: dict[str, str] | None = None, **values) -> str:
+    """ Render a compiled template. Values are html escaped, trusted values such as already rendered
+    templates are not. """
+    if not _templates:
+        load_templates()
+    values = {key: html.escape(str(value)) for key, value in values.items()}
+    if trusted:
+        values.update(trusted)
+    return "".join(literal + (values[placeholder] if placeholder else "") for literal, placeholder in _templates[name])
@@ -0,0 +1,158 @@
+""" Email worker, sends the queued emails over a small pool of persistent SMTP connections.
+
+Run one or more processes per host:
+
+    python -m mail.emailWorker
+
+Every process has its own processing list, named after the host, pid and a random suffix, and holds a lease on it
+that it renews while it runs. The emails in the processing list of a worker whose lease expired are moved back to
+the queue by the other workers.
+"""
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import uuid
+
+from aiosmtplib import SMTP, SMTPException, SMTPRecipientsRefused
+
+from database import AsyncSessionLocal
+from mail.emailQueue import take_email, ack_email, fail_email, requeue_due_emails, renew_worker_lease, \
+    release_worker_lease, requeue_emails_of_dead_workers, EMAIL_WORKER_LEASE_SECONDS
+from mail.emailService import open_email_connection, build_message
+from mail.emailTemplates import load_templates
+from mail.friendRequestDigest import claim_digest_window, send_friend_request_digests, \
+    FRIEND_REQUEST_DIGEST_INTERVAL_SECONDS
+from monitoring.loggingService import setup_logging
+from monitoring.metricsPublisher import start_metrics_publishing, stop_metrics_publishing
+from monitoring.metricsService import SMTP_SEND_SECONDS
+from monitoring.tracingService import span, KIND_CLIENT
+
+# unique per process, so two workers on one host never take each other's processing list for their own
+EMAIL_WORKER_NAME = f"{os.getenv('EMAIL_WORKER_NAME', socket.gethostname())}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+EMAIL_WORKER_CONNECTIONS = int(os.getenv("EMAIL_WORKER_CONNECTIONS", "4"))
+EMAIL_WORKER_TAKE_TIMEOUT_SECONDS = 5
+EMAIL_WORKER_RETRY_POLL_SECONDS = 5
+
+
+async def close_email_connection(smtp_client: SMTP | None) -> None:
+    """ Quit the connection, ignoring a connection that is already gone. """
+    if smtp_client is None or not smtp_client.is_connected:
+        return
+    try:
+        await smtp_client.quit()
+    except SMTPException:
+        smtp_client.close()
+
+
+async def send_queued_email(smtp_client: SMTP, raw_email: str) -> None:
+    """ Send a queued email over smtp_client. """
+    email = json.loads(raw_email)
+    message = build_message(email["recipient"], email["subject"], email["content"], email["content_type"])
+    with SMTP_SEND_SECONDS.time(), span("smtp send", KIND_CLIENT):
+        await smtp_client.send_message(message)
+
+
+async def run_sender(worker_name: str, stopping: asyncio.Event) -> None:
+    """ Take emails from the queue and send them over one persistent connection, reconnecting after errors. """
+    smtp_client = None
+    try:
+        while not stopping.is_set():
+            raw_email = await take_email(worker_name, EMAIL_WORKER_TAKE_TIMEOUT_SECONDS)
+            if raw_email is None:
+                continue
+
+            try:
+                if smtp_client is None or not smtp_client.is_connected:
+                    smtp_client = await open_email_connection()
+                    if smtp_client is None:
+                        raise SMTPException("Email connection is not available")
+                await send_queued_email(smtp_client, raw_email)
+                await ack_email(worker_name, raw_email)
+            except SMTPRecipientsRefused as e:
+                await fail_email(worker_name, raw_email, str(e), permanent=True)
+            except Exception as e:
+                logging.error(f"Failed to send queued email: {e}")
+                await fail_email(worker_name, raw_email, str(e))
+                await close_email_connection(smtp_client)
+                smtp_client = None
+    finally:
+        await close_email_connection(smtp_client)
+
+
+async def run_lease(worker_name: str, stopping: asyncio.Event) -> None:
+    """ Renew the lease of worker_name a few times per lease period. """
+    while not stopping.is_set():
+        await renew_worker_lease(worker_name)
+        try:
+            await asyncio.wait_for(stopping.wait(), EMAIL_WORKER_LEASE_SECONDS / 3)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_retries(stopping: asyncio.Event) -> None:
+    """ Move retries that are due and emails of dead workers back to the queue. """
+    while not stopping.is_set():
+        moved = await requeue_due_emails()
+        if moved:
+            logging.info(f"Requeued {moved} email retries")
+        reclaimed = await requeue_emails_of_dead_workers()
+        if reclaimed:
+            logging.warning(f"Requeued {reclaimed} emails left in processing by dead workers")
+        try:
+            await asyncio.wait_for(stopping.wait(), EMAIL_WORKER_RETRY_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_friend_request_digest(worker_name: str, stopping: asyncio.Event) -> None:
+    """ Queue the friend request digests once per window, the senders pick them up from the queue. """
+    while not stopping.is_set():
+        if await claim_digest_window(worker_name):
+            async with AsyncSessionLocal() as db:
+                await send_friend_request_digests(db)
+        try:
+            await asyncio.wait_for(stopping.wait(), FRIEND_REQUEST_DIGEST_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_worker(worker_name: str = EMAIL_WORKER_NAME, connections: int = EMAIL_WORKER_CONNECTIONS,
+                     stopping: asyncio.Event | None = None, digest: bool = True) -> None:
+    """ Run the sender pool, lease renewal, retry loop and friend request digest until stopping is set. Emails taken
+    but not sent when the worker stops are queued again. """
+    stopping = stopping or asyncio.Event()
+    load_templates()
+    await renew_worker_lease(worker_name)
+
+    logging.info(f"Email worker {worker_name} started with {connections} connections")
+    tasks = [run_lease(worker_name, stopping), run_retries(stopping),
+             *(run_sender(worker_name, stopping) for _ in range(connections))]
+    if digest:
+        tasks.append(run_friend_request_digest(worker_name, stopping))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        requeued = await release_worker_lease(worker_name)
+        if requeued:
+            logging.warning(f"Requeued {requeued} emails left in processing by worker {worker_name}")
+    logging.info(f"Email worker {worker_name} stopped")
+
+
+async def main() -> None:
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for stop_signal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(stop_signal, stopping.set)
+    start_metrics_publishing()
+    try:
+        await run_worker(stopping=stopping)
+    finally:
+        await stop_metrics_publishing()
+
+
+if __name__ == "__main__":
+    setup_logging()
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+import logging
+import os
+
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mail.emailQueue import queue_email
+from mail.emailService import build_friend_request_digest
+from service.friendshipService import get_pending_friend_requests_after, get_last_friendship_id
+from session.sessionService import create_redis_connection
+
+FRIEND_REQUEST_DIGEST_INTERVAL_SECONDS = int(os.getenv("FRIEND_REQUEST_DIGEST_INTERVAL_SECONDS", str(60 * 60)))
+FRIEND_REQUEST_DIGEST_BATCH_SIZE = 1000
+FRIEND_REQUEST_DIGEST_LAST_ID_KEY = "friend_request_digest_last_id"  # highest friendship id in a digest
+FRIEND_REQUEST_DIGEST_LOCK_KEY = "friend_request_digest_lock"
+
+
+async def claim_digest_window(worker_name: str) -> bool:
+    """ Claim the current digest window, so only one worker sends the digest of a window. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            return False
+        return bool(await redis_connection.set(FRIEND_REQUEST_DIGEST_LOCK_KEY, worker_name, nx=True,
+                                               ex=max(FRIEND_REQUEST_DIGEST_INTERVAL_SECONDS - 1, 1)))
+    except RedisError as e:
+        logging.error(f"Error claiming friend request digest window: {e}")
+        return False
+    except Exception as e:
+        logging.error(f"Other Exception while claim_digest_window: {e}")
+        return False
+
+
+async def send_friend_request_digests(db: AsyncSession) -> int | None:
+    """ Queue one email per recipient of the pending friend requests made since the previous digest,
+    returns the number of queued emails or None on failure. The first run only sets the starting point. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            return None
+
+        last_friendship_id = await redis_connection.get(FRIEND_REQUEST_DIGEST_LAST_ID_KEY)
+        if last_friendship_id is None:
+            await redis_connection.set(FRIEND_REQUEST_DIGEST_LAST_ID_KEY, await get_last_friendship_id(db))
+            return 0
+        last_friendship_id = int(last_friendship_id)
+
+        requests_by_recipient: dict[str, tuple[str, list[tuple[str, str, str]]]] = {}
+        while True:
+            friend_requests = await get_pending_friend_requests_after(db, last_friendship_id,
+                                                                      FRIEND_REQUEST_DIGEST_BATCH_SIZE)
+            for friendship_id, recipient_email, recipient_first_name, requester in friend_requests:
+                requesters = requests_by_recipient.setdefault(recipient_email, (recipient_first_name, []))[1]
+                requesters.append((requester.profile_url, requester.first_name, requester.last_name))
+            if friend_requests:
+                last_friendship_id = friend_requests[-1][0]
+            if len(friend_requests) < FRIEND_REQUEST_DIGEST_BATCH_SIZE:
+                break
+
+        queued = 0
+        for recipient_email, (recipient_first_name, requesters) in requests_by_recipient.items():
+            subject, content = build_friend_request_digest(recipient_first_name, requesters)
+            if await queue_email(recipient_email, subject, content, "html"):
+                queued += 1
+
+        # set after queueing, a failure in between sends a digest twice rather than not at all
+        await redis_connection.set(FRIEND_REQUEST_DIGEST_LAST_ID_KEY, last_friendship_id)
+        logging.info(f"Queued {queued} friend request digests")
+        return queued
+    except RedisError as e:
+        logging.error(f"Error sending friend request digests: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"Other Exception while send_friend_request_digests: {e}")
+        return None
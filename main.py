@@ -1,41 +1,83 @@
 import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-from database import AsyncSessionLocal, engine, Base
-from router import userRouter, gymaRouter, authRouter, mineRouter, pubRouter, personRouter, profileRouter, gymbroRouter
+from database import AsyncSessionLocal, engine
+from mail.emailService import close_cached_email_connection
+from mail.emailTemplates import load_templates
+from monitoring.loggingService import setup_logging
+from monitoring.metricsMiddleware import MetricsMiddleware
+from monitoring.metricsPublisher import start_metrics_publishing, stop_metrics_publishing
+from monitoring.profilingMiddleware import ProfilingMiddleware
+from monitoring.queryCounter import QueryCounterMiddleware, QUERIES_HEADER, QUERY_TIME_HEADER
+from monitoring.tracingService import setup_tracing, TracingMiddleware
+from provider.etagProvider import ETAG_HEADER
+from provider.imageProvider import ensure_storage_paths, LARGE_IMAGE_PATH, MEDIUM_IMAGE_PATH
+from provider.liveProvider import close_live
+from provider.locationProvider import refresh_location_index, start_location_index_refresh, \
+    stop_location_index_refresh
+from provider.personCacheProvider import start_person_cache_invalidation, stop_person_cache_invalidation
+from provider.searchProvider import start_search_index_build, stop_search_index_build
+from provider.watermarkProvider import WATERMARK_HEADER, MORE_HEADER
+from session.sessionService import create_redis_connection, close_redis_connection
+from router import userRouter, gymaRouter, authRouter, mineRouter, pubRouter, personRouter, profileRouter, gymbroRouter, \
+    locationRouter, searchRouter, metricsRouter
 from _test import testRouter
 
 
-logging.basicConfig(level=logging.DEBUG)
+setup_logging()
+setup_tracing()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """ Set up the connection pools and caches of a worker once, and close them on shutdown. The schema is managed
+    by python -m migration.migrate, not on startup. """
+    ensure_storage_paths()
+    load_templates()
+    await create_redis_connection()
+    try:
+        async with engine.connect() as connection:
+            await connection.execute(text('SELECT 1'))
+        logging.info("Successfully connected to the database.")
+    except SQLAlchemyError as e:
+        logging.error(f"Failed to connect to the database: {e}")
+    async with AsyncSessionLocal() as session:
+        await refresh_location_index(session)
+    start_location_index_refresh()
+    start_person_cache_invalidation()
+    start_search_index_build()
+    start_metrics_publishing()
+
+    yield
+
+    await stop_location_index_refresh()
+    await stop_metrics_publishing()
+    await stop_search_index_build()
+    await stop_person_cache_invalidation()
+    await close_live()
+    await close_cached_email_connection()
+    await close_redis_connection()
+    await engine.dispose()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[WATERMARK_HEADER, MORE_HEADER, ETAG_HEADER, QUERIES_HEADER, QUERY_TIME_HEADER],
 )
-
-
-@app.on_event("startup")
-async def test_database_connection():
-    async with AsyncSessionLocal() as session:
-        try:
-            await session.execute(text('SELECT 1'))
-            await session.commit()
-            logging.info("Successfully connected to the database.")
-        except SQLAlchemyError as e:
-            logging.error(f"Failed to connect to the database: {e}")
-
-
-@app.on_event("startup")
-async def setup_database():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(QueryCounterMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 
 
 app.include_router(authRouter.router)
@@ -47,9 +89,12 @@ app.include_router(testRouter.router)
 app.include_router(personRouter.router)
 app.include_router(profileRouter.router)
 app.include_router(gymbroRouter.router)
+app.include_router(locationRouter.router)
+app.include_router(searchRouter.router)
+app.include_router(metricsRouter.router)
 
-app.mount("/images/large", StaticFiles(directory="images/large"), name="large_images")
-app.mount("/images/medium", StaticFiles(directory="images/medium"), name="medium_images")
+app.mount("/images/large", StaticFiles(directory=LARGE_IMAGE_PATH, check_dir=False), name="large_images")
+app.mount("/images/medium", StaticFiles(directory=MEDIUM_IMAGE_PATH, check_dir=False), name="medium_images")
 
 
 @app.get("/")
@@ -0,0 +1,157 @@
+""" Versioned schema migrations, run once per deploy instead of create_all on every worker start.
+
+    python -m migration.migrate            apply the pending migrations
+    python -m migration.migrate --status   list the migrations and whether they are applied
+
+A fresh database gets the current schema from the models in the baseline migration. The later migrations bring
+databases created before them up to date, every step checks the schema first so it is a no-op where the baseline
+already created it.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Callable, NamedTuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import environment  # noqa: F401
+from database import engine, Base
+from model import Country, Exercise, Friendship, Gyma, GymaExercise, Location, Person, User, \
+    UserVerification  # noqa: F401, registers the tables of the baseline
+from monitoring.loggingService import setup_logging
+
+SCHEMA_VERSION_TABLE = "schema_version"
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def column_exists(connection: Connection, table: str, column: str) -> bool:
+    return any(existing["name"] == column for existing in inspect(connection).get_columns(table))
+
+
+def index_exists(connection: Connection, table: str, index: str) -> bool:
+    return any(existing["name"] == index for existing in inspect(connection).get_indexes(table))
+
+
+def create_baseline(connection: Connection) -> None:
+    Base.metadata.create_all(connection)
+
+
+def add_gyma_time_of_leaving_indexes(connection: Connection) -> None:
+    if not index_exists(connection, "gyma", "ix_gyma_time_of_leaving"):
+        connection.execute(text("CREATE INDEX ix_gyma_time_of_leaving ON gyma (time_of_leaving)"))
+    if not index_exists(connection, "gyma", "ix_gyma_user_id_time_of_leaving"):
+        connection.execute(text("CREATE INDEX ix_gyma_user_id_time_of_leaving ON gyma (user_id, time_of_leaving)"))
+
+
+def add_location_coordinates(connection: Connection) -> None:
+    for column in ("latitude", "longitude"):
+        if not column_exists(connection, "location", column):
+            connection.execute(text(f"ALTER TABLE location ADD COLUMN {column} FLOAT NULL"))
+
+
+def add_gyma_location(connection: Connection) -> None:
+    if column_exists(connection, "gyma", "location_id"):
+        return
+    if connection.dialect.name == "mysql":
+        connection.execute(text("ALTER TABLE gyma ADD COLUMN location_id INTEGER NULL, "
+                                "ADD CONSTRAINT fk_gyma_location_id FOREIGN KEY (location_id) "
+                                "REFERENCES location (location_id)"))
+    else:
+        connection.execute(text("ALTER TABLE gyma ADD COLUMN location_id INTEGER NULL "
+                                "REFERENCES location (location_id)"))
+
+
+def hash_verification_codes(connection: Connection) -> None:
+    if not column_exists(connection, "user_verification", "verification_code_hash"):
+        connection.execute(text("ALTER TABLE user_verification ADD COLUMN verification_code_hash CHAR(64) NULL"))
+    if not index_exists(connection, "user_verification", "ix_user_verification_verification_code_hash"):
+        connection.execute(text("CREATE UNIQUE INDEX ix_user_verification_verification_code_hash "
+                                "ON user_verification (verification_code_hash)"))
+
+    if connection.dialect.name == "mysql":
+        connection.execute(text("ALTER TABLE user_verification MODIFY verification_code VARCHAR(64) NULL"))
+        connection.execute(text("UPDATE user_verification SET verification_code_hash = SHA2(verification_code, 256), "
+                                "verification_code = NULL WHERE verification_code IS NOT NULL"))
+    else:
+        # other databases only run locally, the plain codes stay as SQLite cannot drop their NOT NULL in place
+        from service.userVerificationService import hash_verification_code
+
+        rows = connection.execute(text("SELECT user_id, verification_code FROM user_verification "
+                                       "WHERE verification_code_hash IS NULL AND verification_code IS NOT NULL")).all()
+        for user_id, verification_code in rows:
+            connection.execute(text("UPDATE user_verification SET verification_code_hash = :code_hash "
+                                    "WHERE user_id = :user_id"),
+                               {"code_hash": hash_verification_code(verification_code), "user_id": user_id})
+
+
+MIGRATIONS = [
+    Migration(1, "baseline schema", create_baseline),
+    Migration(2, "gyma time_of_leaving indexes", add_gyma_time_of_leaving_indexes),
+    Migration(3, "location coordinates", add_location_coordinates),
+    Migration(4, "gyma location", add_gyma_location),
+    Migration(5, "hashed verification codes", hash_verification_codes),
+]
+
+
+def get_applied_versions(connection: Connection) -> set[int]:
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} (version INTEGER PRIMARY KEY, "
+                            f"description VARCHAR(255) NOT NULL, applied_at DATETIME NOT NULL)"))
+    return set(connection.execute(text(f"SELECT version FROM {SCHEMA_VERSION_TABLE}")).scalars())
+
+
+def apply_migrations(connection: Connection, migrations: list[Migration] = MIGRATIONS) -> list[Migration]:
+    """ Apply the migrations that are not applied yet in order of version, returns the applied ones. """
+    applied_versions = get_applied_versions(connection)
+    applied = []
+    for migration in sorted(migrations, key=lambda pending: pending.version):
+        if migration.version in applied_versions:
+            continue
+        logging.info(f"Applying migration {migration.version}: {migration.description}")
+        migration.upgrade(connection)
+        connection.execute(text(f"INSERT INTO {SCHEMA_VERSION_TABLE} (version, description, applied_at) "
+                                f"VALUES (:version, :description, :applied_at)"),
+                           {"version": migration.version, "description": migration.description,
+                            "applied_at": datetime.utcnow()})
+        applied.append(migration)
+    return applied
+
+
+async def migrate(migration_engine: AsyncEngine = engine) -> list[Migration]:
+    """ Apply the pending migrations, MySQL commits the DDL of each step as it runs. """
+    async with migration_engine.begin() as connection:
+        return await connection.run_sync(apply_migrations)
+
+
+async def get_status(migration_engine: AsyncEngine = engine) -> list[tuple[Migration, bool]]:
+    async with migration_engine.begin() as connection:
+        applied_versions = await connection.run_sync(get_applied_versions)
+    return [(migration, migration.version in applied_versions) for migration in MIGRATIONS]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="list the migrations instead of applying them")
+    args = parser.parse_args()
+
+    try:
+        if args.status:
+            for migration, applied in await get_status():
+                print(f"{migration.version:>4}  {'applied' if applied else 'pending':<8} {migration.description}")
+        else:
+            applied = await migrate()
+            print(f"Applied {len(applied)} migrations" if applied else "Schema is up to date")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    setup_logging()
+    asyncio.run(main())
@@ -1,8 +1,10 @@
+import enum
+
 from database import Base
-from sqlalchemy import Column, VARCHAR, Enum, EnumType
+from sqlalchemy import Column, VARCHAR, Enum
 
 
-class Continent(Enum):
+class Continent(enum.Enum):
     africa = "Africa"
     antarctica = "Antarctica"
     asia = "Asia"
@@ -17,4 +19,4 @@ class Country(Base):
     __tablename__ = 'country'
 
     country_name = Column("country_name", VARCHAR(64), primary_key=True)
-    continent = Column(EnumType(Continent))
+    continent = Column(Enum(Continent))
@@ -1,6 +1,7 @@
 from database import Base
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
+from model.Location import Location
 
 
 class Gyma(Base):
@@ -10,6 +11,9 @@ class Gyma(Base):
     gyma_id = Column("gyma_id", Integer, primary_key=True, autoincrement=True, nullable=False, index=True)
     user_id = Column(Integer, ForeignKey("user.user_id"), nullable=False)
     time_of_arrival = Column("time_of_arrival", DateTime, nullable=False)
-    time_of_leaving = Column("time_of_leaving", DateTime, nullable=True)
+    time_of_leaving = Column("time_of_leaving", DateTime, nullable=True, index=True)
+    location_id = Column(Integer, ForeignKey("location.location_id"), nullable=True)
 
     exercises = relationship("GymaExercise", back_populates="gyma", lazy='selectin')
+
+    __table_args__ = (Index('ix_gyma_user_id_time_of_leaving', 'user_id', 'time_of_leaving'),)
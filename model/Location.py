@@ -1,5 +1,6 @@
 from database import Base
-from sqlalchemy import Column, Integer, VARCHAR, ForeignKey
+from sqlalchemy import Column, Integer, VARCHAR, ForeignKey, Float
+from model.Country import Country
 
 
 class Location(Base):
@@ -12,3 +13,5 @@ class Location(Base):
     city = Column("city", VARCHAR(64), nullable=False)
     address = Column("address", VARCHAR(64), nullable=True)
     zip_code = Column("zip_code", VARCHAR(10), nullable=True)
+    latitude = Column("latitude", Float, nullable=True)
+    longitude = Column("longitude", Float, nullable=True)
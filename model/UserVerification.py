@@ -1,10 +1,12 @@
 from database import Base
-from sqlalchemy import Column, VARCHAR, Integer, ForeignKey
+from sqlalchemy import Column, VARCHAR, Integer, ForeignKey, CHAR
 
 
 class UserVerification(Base):
-    """ Email verification codes with accompanying user_id. """
+    """ Email verification codes with accompanying user_id, from before verification links were signed tokens.
+    Codes are looked up by their sha256 hash. """
     __tablename__ = 'user_verification'
 
     user_id = Column(Integer, ForeignKey('user.user_id'), primary_key=True, nullable=False, index=True)
-    verification_code = Column(VARCHAR(length=64), nullable=False)
+    verification_code = Column(VARCHAR(length=64), nullable=True)
+    verification_code_hash = Column(CHAR(length=64), nullable=True, unique=True, index=True)
@@ -0,0 +1,110 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import environment  # noqa: F401
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # json, or text for reading logs in a terminal
+# share of the info and debug records that is kept, warnings and errors are always kept
+LOG_INFO_SAMPLE_RATE = float(os.getenv("LOG_INFO_SAMPLE_RATE", "1.0"))
+
+SECRET_PATTERN = re.compile(
+    r"(authorization|session_token|auth_token|password\w*|secret|token)(\"?'?\s*[:=]\s*\"?'?)([^\s\"',}]+)",
+    re.IGNORECASE
+)
+
+_log_listener: QueueListener | None = None
+
+
+class SamplingFilter(logging.Filter):
+    """ Keep only sample_rate of the records below warning, before they are queued. """
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.sample_rate >= 1 or random.random() < self.sample_rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """ Put records on the queue as they are. Unlike QueueHandler only the message is merged, formatting is left to
+    the listener thread. """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # merge now, the arguments may change after the call returns
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """ One JSON object per record, with secrets redacted. """
+
+    def format(self, record: logging.LogRecord) -> str:
+        log = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact_secrets(record.getMessage()),
+        }
+        if record.exc_info:
+            log["exception"] = redact_secrets(self.formatException(record.exc_info))
+        return json.dumps(log, ensure_ascii=False)
+
+
+class RedactingFormatter(logging.Formatter):
+    """ The default text format, with secrets redacted. """
+
+    def format(self, record: logging.LogRecord) -> str:
+        return redact_secrets(super().format(record))
+
+
+def redact_secrets(message: str) -> str:
+    """ Replace the value of authorization headers, tokens and passwords in message. """
+    return SECRET_PATTERN.sub(r"\1\2[REDACTED]", message)
+
+
+def setup_logging(level: str = LOG_LEVEL, log_format: str = LOG_FORMAT,
+                  sample_rate: float = LOG_INFO_SAMPLE_RATE) -> None:
+    """ Route all logging through a queue, the records are formatted and written by a listener thread so logging
+    never blocks the event loop on I/O. """
+    global _log_listener
+    if _log_listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if log_format == "text":
+        stream_handler.setFormatter(RedactingFormatter("%(levelname)s:%(name)s:%(message)s"))
+    else:
+        stream_handler.setFormatter(JsonFormatter())
+
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(queue_handler)
+    root_logger.setLevel(level)
+
+    _log_listener = QueueListener(log_queue, stream_handler)
+    _log_listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """ Write the records still on the queue and stop the listener thread. """
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+
+from redis.exceptions import RedisError
+
+from monitoring.metricsService import metric_samples
+from session.sessionService import create_redis_connection
+
+METRICS_KEY_PREFIX = "metrics:worker:"
+METRICS_PUBLISH_INTERVAL_SECONDS = float(os.getenv("METRICS_PUBLISH_INTERVAL_SECONDS", "5"))
+# the samples of a worker that stopped publishing, because it exited or was killed, are dropped after this long
+METRICS_STALE_SECONDS = METRICS_PUBLISH_INTERVAL_SECONDS * 3
+
+# a recycled worker gets a new pid, so its counters start a new series instead of going back to zero
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_publish_task: asyncio.Task | None = None
+
+
+async def publish_metrics() -> bool:
+    """ Store the samples of this process in Redis, where the metrics endpoint of any worker reads them. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            logging.error("Redis connection failed")
+            return False
+        await redis_connection.set(f"{METRICS_KEY_PREFIX}{WORKER_ID}", json.dumps(metric_samples()),
+                                   ex=max(1, round(METRICS_STALE_SECONDS)))
+        return True
+    except RedisError as e:
+        logging.error(f"Error publishing metrics to Redis: {e}")
+        return False
+    except Exception as e:
+        logging.error(f"Other Exception while publish_metrics: {e}")
+        return False
+
+
+async def get_samples_of_workers() -> dict[str, dict[str, list[str]]] | None:
+    """ Samples published by every live worker by worker id, None when Redis cannot be read. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            logging.error("Redis connection failed")
+            return None
+        keys = [key async for key in redis_connection.scan_iter(match=f"{METRICS_KEY_PREFIX}*", count=100)]
+        if not keys:
+            return {}
+        raw_samples = await redis_connection.mget(keys)
+        return {key.removeprefix(METRICS_KEY_PREFIX): json.loads(raw) for key, raw in zip(keys, raw_samples)
+                if raw is not None}
+    except RedisError as e:
+        logging.error(f"Error getting metrics of workers from Redis: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"Other Exception while get_samples_of_workers: {e}")
+        return None
+
+
+async def _publish_periodically() -> None:
+    while True:
+        await publish_metrics()
+        await asyncio.sleep(METRICS_PUBLISH_INTERVAL_SECONDS)
+
+
+def start_metrics_publishing() -> None:
+    """ Publish the samples of this process every METRICS_PUBLISH_INTERVAL_SECONDS, called when a worker starts. """
+    global _publish_task
+    if _publish_task is None or _publish_task.done():
+        _publish_task = asyncio.create_task(_publish_periodically())
+
+
+async def stop_metrics_publishing() -> None:
+    """ Stop publishing and remove the samples of this process, called when a worker shuts down. """
+    global _publish_task
+    if _publish_task is not None:
+        _publish_task.cancel()
+        try:
+            await _publish_task
+        except asyncio.CancelledError:
+            pass
+        _publish_task = None
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is not None:
+            await redis_connection.delete(f"{METRICS_KEY_PREFIX}{WORKER_ID}")
+    except RedisError as e:
+        logging.error(f"Error removing metrics from Redis: {e}")
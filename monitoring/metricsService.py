@@ -0,0 +1,207 @@
+import time
+from bisect import bisect_left
+from typing import Callable
+
+# seconds, from a Redis round trip to a slow bcrypt or SMTP send
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics: list["Metric"] = []
+
+
+class Metric:
+    """ Base of the metrics, values are kept per tuple of label values. """
+    type = ""
+
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        _metrics.append(self)
+
+    def format_labels(self, label_values: tuple, extra: str = "") -> str:
+        """ Label set of a sample, extra is an already formatted label such as the bucket bound. """
+        labels = [f'{name}="{escape_label_value(str(value))}"' for name, value in zip(self.label_names, label_values)]
+        if extra:
+            labels.append(extra)
+        return "{" + ",".join(labels) + "}" if labels else ""
+
+    def samples(self) -> list[str]:
+        """ Sample lines of the metric in the text exposition format. """
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """ Value that only goes up. """
+    type = "counter"
+
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = ()):
+        super().__init__(name, description, label_names)
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, label_values: tuple = (), amount: float = 1) -> None:
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{self.format_labels(labels)} {value}" for labels, value in self.values.items()]
+
+
+class Gauge(Counter):
+    """ Value that goes up and down, or is read from collect when the metrics are rendered. """
+    type = "gauge"
+
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = (),
+                 collect: Callable[[], dict[tuple, float]] | None = None):
+        super().__init__(name, description, label_names)
+        self.collect = collect
+
+    def dec(self, label_values: tuple = (), amount: float = 1) -> None:
+        self.values[label_values] = self.values.get(label_values, 0) - amount
+
+    def set(self, value: float, label_values: tuple = ()) -> None:
+        self.values[label_values] = value
+
+    def samples(self) -> list[str]:
+        if self.collect is not None:
+            self.values = self.collect()
+        return super().samples()
+
+
+class Histogram(Metric):
+    """ Count of observations per bucket, with their sum. Observing is a bisect and two additions. """
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, description, label_names)
+        self.buckets = buckets
+        self.values: dict[tuple, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, label_values: tuple = ()) -> None:
+        counts_and_sum = self.values.get(label_values)
+        if counts_and_sum is None:
+            counts_and_sum = self.values[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts_and_sum[0][bisect_left(self.buckets, value)] += 1
+        counts_and_sum[1][0] += value
+
+    def time(self, label_values: tuple = ()) -> "Timer":
+        """ Context manager observing the duration of its block. """
+        return Timer(self, label_values)
+
+    def samples(self) -> list[str]:
+        samples = []
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for upper_bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                bucket_label = f'le="{upper_bound}"'
+                samples.append(f"{self.name}_bucket{self.format_labels(labels, bucket_label)} {cumulative}")
+            samples.append(f"{self.name}_sum{self.format_labels(labels)} {total[0]}")
+            samples.append(f"{self.name}_count{self.format_labels(labels)} {cumulative}")
+        return samples
+
+
+class Timer:
+    """ Observe the duration of a with block in a histogram. """
+    __slots__ = ("histogram", "label_values", "start")
+
+    def __init__(self, histogram: Histogram, label_values: tuple):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, self.label_values)
+
+
+def escape_label_value(value: str) -> str:
+    """ Escape backslash, newline and double quote in a label value. """
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def metric_samples() -> dict[str, list[str]]:
+    """ Sample lines of every metric of this process by metric name, the snapshot a worker publishes. """
+    return {metric.name: metric.samples() for metric in _metrics}
+
+
+def with_label(sample: str, label: str) -> str:
+    """ Sample line with an already formatted label added to its label set. """
+    name_end = next((index for index, char in enumerate(sample) if char in "{ "), len(sample))
+    if sample[name_end:name_end + 1] == "{":
+        return f"{sample[:name_end + 1]}{label},{sample[name_end + 1:]}"
+    return f"{sample[:name_end]}{{{label}}}{sample[name_end:]}"
+
+
+def render_metrics(samples_of_workers: dict[str, dict[str, list[str]]] | None = None) -> str:
+    """ All metrics in the Prometheus text exposition format. Without samples_of_workers the samples of this
+    process, otherwise the samples published by every worker, each labelled with the worker they came from. """
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        if samples_of_workers is None:
+            lines.extend(metric.samples())
+            continue
+        for worker, samples_of_metrics in samples_of_workers.items():
+            worker_label = f'worker="{escape_label_value(worker)}"'
+            lines.extend(with_label(sample, worker_label) for sample in samples_of_metrics.get(metric.name, ()))
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Request latency per route template.",
+                                 ("method", "route"))
+HTTP_RESPONSES = Counter("http_responses_total", "Responses per route template and status code.",
+                         ("method", "route", "status"))
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled.")
+DB_STATEMENT_SECONDS = Histogram("db_statement_duration_seconds", "SQL statement latency per operation.",
+                                 ("operation",))
+REDIS_COMMAND_SECONDS = Histogram("redis_command_duration_seconds", "Redis command latency per command.",
+                                  ("command",))
+SMTP_SEND_SECONDS = Histogram("smtp_send_duration_seconds", "Latency of sending one email over an open connection.")
+IMAGE_PROCESSING_SECONDS = Histogram("image_processing_duration_seconds", "Time to resize and store a picture.")
+
+
+def instrument_pool(engine) -> None:
+    """ Expose the connection pool of engine. """
+    pool = engine.sync_engine.pool
+    if hasattr(pool, "checkedout"):
+        Gauge("db_pool_connections", "Connections of the SQLAlchemy pool per state.", ("state",),
+              collect=lambda: {("checked_out",): pool.checkedout(), ("checked_in",): pool.checkedin(),
+                               ("overflow",): pool.overflow(), ("size",): pool.size()})
+
+
+def statement_operation(statement: str) -> str:
+    """ First keyword of a statement, SELECT, INSERT, ... """
+    return statement.split(None, 1)[0].upper() if statement else ""
+
+
+def instrument_redis(redis_connection) -> None:
+    """ Time every command and pipeline of redis_connection. """
+    execute_command = redis_connection.execute_command
+    pipeline = redis_connection.pipeline
+
+    async def timed_execute_command(*args, **options):
+        start = time.perf_counter()
+        try:
+            return await execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_SECONDS.observe(time.perf_counter() - start, (str(args[0]).upper(),))
+
+    def timed_pipeline(*args, **kwargs):
+        redis_pipeline = pipeline(*args, **kwargs)
+        execute = redis_pipeline.execute
+
+        async def timed_execute(*execute_args, **execute_kwargs):
+            start = time.perf_counter()
+            try:
+                return await execute(*execute_args, **execute_kwargs)
+            finally:
+                REDIS_COMMAND_SECONDS.observe(time.perf_counter() - start, ("PIPELINE",))
+
+        redis_pipeline.execute = timed_execute
+        return redis_pipeline
+
+    redis_connection.execute_command = timed_execute_command
+    redis_connection.pipeline = timed_pipeline
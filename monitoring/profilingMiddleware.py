@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import random
+import time
+
+from database import AsyncSessionLocal
+from monitoring.profilingService import PROFILING_ENABLED, PROFILE_SLOW_REQUEST_SECONDS, \
+    PROFILE_SLOW_REQUEST_SAMPLE_RATE, start_profiler, stop_profiler, profile_file_name, write_profile
+from provider.authProvider import decode_str
+from service.userService import get_user_by_user_id
+from session.sessionService import get_user_id_from_session_data
+
+PROFILE_HEADER = b"x-profile"
+
+
+async def is_admin_session(authorization: str) -> bool:
+    """ Whether the session of the encoded authorization belongs to an admin account. """
+    try:
+        user_id = await get_user_id_from_session_data(decode_str(authorization))
+        if user_id is None:
+            return False
+        async with AsyncSessionLocal() as db:
+            user = await get_user_by_user_id(db, user_id)
+            return user is not None and user.account_type == "admin"
+    except Exception as e:
+        logging.error(f"Other Exception while is_admin_session: {e}")
+        return False
+
+
+class ProfilingMiddleware:
+    """ cProfile a single request when PROFILING_ENABLED is set and an admin sends the X-Profile header, or a sample
+    of the requests when PROFILE_SLOW_REQUEST_SECONDS is set, keeping only the slow ones. The pstats files are written
+    to PROFILE_DIRECTORY. """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (PROFILING_ENABLED or PROFILE_SLOW_REQUEST_SECONDS):
+            await self.app(scope, receive, send)
+            return
+
+        requested = False
+        if PROFILING_ENABLED:
+            headers = dict(scope["headers"])
+            if headers.get(PROFILE_HEADER) and headers.get(b"authorization"):
+                requested = await is_admin_session(headers[b"authorization"].decode("latin-1"))
+        sampled = bool(PROFILE_SLOW_REQUEST_SECONDS) and random.random() < PROFILE_SLOW_REQUEST_SAMPLE_RATE
+
+        profiler = start_profiler() if requested or sampled else None
+        if profiler is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            stop_profiler(profiler)
+            seconds = time.perf_counter() - start
+            if requested or seconds >= PROFILE_SLOW_REQUEST_SECONDS:
+                file_name = profile_file_name(scope["method"], scope["path"], seconds)
+                path = await asyncio.to_thread(write_profile, profiler, file_name)
+                logging.info(f"Profiled {scope['method']} {scope['path']} in {seconds * 1000:.0f}ms to {path}")
@@ -0,0 +1,46 @@
+import cProfile
+import os
+import re
+import time
+
+import environment  # noqa: F401
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("true", "1")
+PROFILE_DIRECTORY = os.getenv("PROFILE_DIRECTORY", "profiles")
+# slow request mode, profile this share of the requests and keep the profiles of those slower than the threshold
+PROFILE_SLOW_REQUEST_SECONDS = float(os.getenv("PROFILE_SLOW_REQUEST_SECONDS", "0"))
+PROFILE_SLOW_REQUEST_SAMPLE_RATE = float(os.getenv("PROFILE_SLOW_REQUEST_SAMPLE_RATE", "0.01"))
+
+_active_profiler: cProfile.Profile | None = None
+
+
+def start_profiler() -> cProfile.Profile | None:
+    """ Start profiling the current thread, None when another request is being profiled already. A profiler sees
+    the whole thread, so the trace also holds the requests running concurrently on the event loop. """
+    global _active_profiler
+    if _active_profiler is not None:
+        return None
+    _active_profiler = cProfile.Profile()
+    _active_profiler.enable()
+    return _active_profiler
+
+
+def stop_profiler(profiler: cProfile.Profile) -> None:
+    """ Stop profiler started by start_profiler. """
+    global _active_profiler
+    profiler.disable()
+    _active_profiler = None
+
+
+def profile_file_name(method: str, path: str, seconds: float) -> str:
+    """ File name of a profile, readable with pstats, snakeviz or speedscope. """
+    path_name = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{method}-{path_name[:80]}-{int(seconds * 1000)}ms.prof"
+
+
+def write_profile(profiler: cProfile.Profile, file_name: str, directory: str = PROFILE_DIRECTORY) -> str:
+    """ Write the pstats of profiler to directory, returns the path. Blocking, run it in a thread. """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, file_name)
+    profiler.dump_stats(path)
+    return path
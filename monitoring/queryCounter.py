@@ -0,0 +1,108 @@
+import logging
+import os
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import environment  # noqa: F401
+
+DEBUG = os.getenv("DEBUG", "false").lower() in ("true", "1")
+# a statement shape run more often than this in one request is most likely an N+1 loop
+QUERY_REPEAT_WARNING_THRESHOLD = int(os.getenv("QUERY_REPEAT_WARNING_THRESHOLD", "10"))
+
+QUERIES_HEADER = "X-DB-Queries"
+QUERY_TIME_HEADER = "X-DB-Time"
+
+
+class QueryStats:
+    """ Statements run and time spent in the database, per statement shape. """
+    __slots__ = ("count", "seconds", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter[str] = Counter()
+
+    def add(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement] += 1
+
+    def repeated_shapes(self, threshold: int = QUERY_REPEAT_WARNING_THRESHOLD) -> list[tuple[str, int]]:
+        """ Statement shapes run more than threshold times, most repeated first. """
+        return [(statement, count) for statement, count in self.shapes.most_common() if count > threshold]
+
+
+_request_query_stats: ContextVar[QueryStats | None] = ContextVar("request_query_stats", default=None)
+_collectors: list[QueryStats] = []  # stats of count_queries blocks, they see the statements of every request
+
+
+def add_statement(statement: str, seconds: float) -> None:
+    """ Add a statement that ran to the stats of the current request and of open count_queries blocks, called by
+    the statement hook of the engine. """
+    # the statement has its parameters bound, so its text is the shape of the query
+    request_stats = _request_query_stats.get()
+    if request_stats is not None:
+        request_stats.add(statement, seconds)
+    for stats in _collectors:
+        stats.add(statement, seconds)
+
+
+@contextmanager
+def count_queries():
+    """ Count the statements run during the with block, by any request. """
+    stats = QueryStats()
+    _collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _collectors.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int):
+    """ Fail a test when the with block runs more than max_queries statements.
+
+        with assert_max_queries(2):
+            client.post("/api/v1/auth/login", json=credentials)
+    """
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        statements = "\n".join(f"{count}x {statement}" for statement, count in stats.shapes.most_common())
+        raise AssertionError(f"Expected at most {max_queries} queries, ran {stats.count}:\n{statements}")
+
+
+class QueryCounterMiddleware:
+    """ Count the statements of each request, warn about repeated statement shapes, and in debug mode report the
+    count and time in the X-DB-Queries and X-DB-Time headers. """
+
+    def __init__(self, app, debug: bool = DEBUG, threshold: int = QUERY_REPEAT_WARNING_THRESHOLD):
+        self.app = app
+        self.debug = debug
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _request_query_stats.set(stats)
+
+        async def send_with_headers(message):
+            if self.debug and message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (QUERIES_HEADER.lower().encode(), str(stats.count).encode()),
+                    (QUERY_TIME_HEADER.lower().encode(), f"{stats.seconds * 1000:.2f}ms".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _request_query_stats.reset(token)
+            for statement, count in stats.repeated_shapes(self.threshold):
+                logging.warning(f"{scope['method']} {scope['path']} ran the same statement {count} times, "
+                                f"likely an N+1 query: {' '.join(statement.split())[:500]}")
@@ -0,0 +1,35 @@
+import time
+
+from monitoring.metricsService import DB_STATEMENT_SECONDS, instrument_pool, statement_operation
+from monitoring.queryCounter import add_statement
+from monitoring.tracingService import start_child_span, KIND_CLIENT
+
+
+def monitor_engine(engine) -> None:
+    """ Time every statement of engine once, and feed the duration to the statement latency histogram, the query
+    stats of the request and a span of the trace of the request. """
+    from sqlalchemy import event
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        # kept on the execution context, a failed statement never reaches after_cursor_execute
+        context.statement_start = time.perf_counter()
+        context.statement_span = start_child_span(statement_operation(statement) or "SQL", KIND_CLIENT,
+                                                  {"db.statement": statement[:2000]})
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - context.statement_start
+        DB_STATEMENT_SECONDS.observe(seconds, (statement_operation(statement),))
+        add_statement(statement, seconds)
+        if context.statement_span is not None:
+            context.statement_span.end()
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(exception_context):
+        statement_span = getattr(exception_context.execution_context, "statement_span", None)
+        if statement_span is not None:
+            statement_span.error = repr(exception_context.original_exception)
+            statement_span.end()
+
+    instrument_pool(engine)
@@ -0,0 +1,315 @@
+import atexit
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import environment  # noqa: F401
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "").lower()  # file or otlp, tracing is off when unset
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+TRACE_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "gymaapi")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_EXPORT_INTERVAL_SECONDS = float(os.getenv("TRACE_EXPORT_INTERVAL_SECONDS", "5"))
+TRACE_EXPORT_BATCH_SIZE = 512
+TRACE_MAX_QUEUE_SIZE = 20000
+
+# span kinds of OTLP
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+_span_processor: "BatchSpanProcessor | None" = None
+
+
+class Span:
+    """ One timed operation of a trace, spans without a parent are the root of a request. """
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, kind: int = KIND_INTERNAL,
+                 attributes: dict | None = None):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self.error: str | None = None
+
+    def end(self) -> None:
+        """ Finish the span and hand it to the exporter. """
+        self.end_ns = time.time_ns()
+        if _span_processor is not None:
+            _span_processor.on_end(self)
+
+    def to_dict(self) -> dict:
+        """ Span as written by the file exporter. """
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id, "name": self.name,
+            "kind": self.kind, "start_ns": self.start_ns, "end_ns": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6, "attributes": self.attributes, "error": self.error,
+        }
+
+    def to_otlp(self) -> dict:
+        """ Span in the OTLP JSON encoding. """
+        otlp_span = {
+            "traceId": self.trace_id, "spanId": self.span_id, "name": self.name, "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns), "endTimeUnixNano": str(self.end_ns),
+            "attributes": [otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            otlp_span["parentSpanId"] = self.parent_id
+        return otlp_span
+
+
+def otlp_attribute(key: str, value) -> dict:
+    """ Attribute in the OTLP JSON encoding. """
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def start_root_span(name: str, traceparent: str | None = None, attributes: dict | None = None) -> Span | None:
+    """ Start the span of a request, continuing the trace of a W3C traceparent header. None when the request is not
+    sampled. The caller sets it as current span and ends it. """
+    if _span_processor is None:
+        return None
+    if traceparent:
+        try:
+            _, trace_id, parent_id, flags = traceparent.split("-")
+            if int(flags, 16) & 1:
+                return Span(name, trace_id, parent_id, KIND_SERVER, attributes)
+            return None
+        except ValueError:
+            pass
+    if random.random() >= TRACE_SAMPLE_RATE:
+        return None
+    return Span(name, f"{random.getrandbits(128):032x}", None, KIND_SERVER, attributes)
+
+
+def start_child_span(name: str, kind: int = KIND_INTERNAL, attributes: dict | None = None) -> Span | None:
+    """ Start a span under the current span without making it current, None outside of a trace. """
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """ Trace the with block as a child of the current span, a no-op outside of a trace. """
+    child_span = start_child_span(name, kind, attributes)
+    if child_span is None:
+        yield None
+        return
+    token = _current_span.set(child_span)
+    try:
+        yield child_span
+    except BaseException as e:
+        child_span.error = repr(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        child_span.end()
+
+
+def traced(func):
+    """ Trace every call of func as a span named after its module and name. """
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return await func(*args, **kwargs)
+            with span(name):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _current_span.get() is None:
+            return func(*args, **kwargs)
+        with span(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def trace_redis(redis_connection) -> None:
+    """ Trace every command and pipeline of redis_connection. """
+    execute_command = redis_connection.execute_command
+    pipeline = redis_connection.pipeline
+
+    async def traced_execute_command(*args, **options):
+        if _current_span.get() is None:
+            return await execute_command(*args, **options)
+        with span(f"redis {str(args[0]).upper()}", KIND_CLIENT, **{"db.system": "redis"}):
+            return await execute_command(*args, **options)
+
+    def traced_pipeline(*args, **kwargs):
+        redis_pipeline = pipeline(*args, **kwargs)
+        execute = redis_pipeline.execute
+
+        async def traced_execute(*execute_args, **execute_kwargs):
+            with span("redis PIPELINE", KIND_CLIENT, **{"db.system": "redis"}):
+                return await execute(*execute_args, **execute_kwargs)
+
+        redis_pipeline.execute = traced_execute
+        return redis_pipeline
+
+    redis_connection.execute_command = traced_execute_command
+    redis_connection.pipeline = traced_pipeline
+
+
+class FileSpanExporter:
+    """ Append finished spans to a JSON lines file. """
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+
+    def export(self, spans: list[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as trace_file:
+            trace_file.writelines(json.dumps(finished_span.to_dict()) + "\n" for finished_span in spans)
+
+
+class OtlpSpanExporter:
+    """ Post finished spans to an OpenTelemetry collector, OTLP over HTTP with the JSON encoding. """
+
+    def __init__(self, endpoint: str = TRACE_OTLP_ENDPOINT, service_name: str = TRACE_SERVICE_NAME):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+
+    def export(self, spans: list[Span]) -> None:
+        body = {"resourceSpans": [{
+            "resource": {"attributes": [otlp_attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": "gymaapi"}, "spans": [finished_span.to_otlp() for finished_span in spans]}],
+        }]}
+        request = urllib.request.Request(self.url, data=json.dumps(body).encode(),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
+
+
+class BatchSpanProcessor:
+    """ Queue finished spans and export them in batches from a thread, so exporting never blocks the event loop.
+    Spans are dropped when the queue is full. """
+
+    def __init__(self, exporter, interval_seconds: float = TRACE_EXPORT_INTERVAL_SECONDS):
+        self.exporter = exporter
+        self.interval_seconds = interval_seconds
+        self.queue: queue.Queue[Span] = queue.Queue(TRACE_MAX_QUEUE_SIZE)
+        self.dropped = 0
+        self.export_lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="span-exporter", daemon=True)
+        self.thread.start()
+
+    def on_end(self, finished_span: Span) -> None:
+        try:
+            self.queue.put_nowait(finished_span)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self) -> None:
+        while not self.stopping.wait(self.interval_seconds):
+            self.flush()
+
+    def flush(self) -> None:
+        """ Export the queued spans. """
+        with self.export_lock:
+            while not self.queue.empty():
+                spans = []
+                while len(spans) < TRACE_EXPORT_BATCH_SIZE and not self.queue.empty():
+                    spans.append(self.queue.get_nowait())
+                try:
+                    self.exporter.export(spans)
+                except Exception as e:
+                    logging.error(f"Other Exception while exporting {len(spans)} spans: {e}")
+
+    def shutdown(self) -> None:
+        """ Stop the export thread and export the spans still queued. """
+        self.stopping.set()
+        self.thread.join()
+        self.flush()
+
+
+def setup_tracing(exporter=None) -> None:
+    """ Start exporting spans to exporter, or to the exporter chosen by TRACE_EXPORTER. """
+    global _span_processor
+    if exporter is None:
+        if TRACE_EXPORTER == "file":
+            exporter = FileSpanExporter()
+        elif TRACE_EXPORTER == "otlp":
+            exporter = OtlpSpanExporter()
+        else:
+            return
+    if _span_processor is not None:
+        _span_processor.shutdown()
+    else:
+        atexit.register(shutdown_tracing)
+    _span_processor = BatchSpanProcessor(exporter)
+
+
+def shutdown_tracing() -> None:
+    """ Export the spans still queued and stop exporting. """
+    global _span_processor
+    if _span_processor is not None:
+        _span_processor.shutdown()
+        _span_processor = None
+
+
+class TracingMiddleware:
+    """ Start the root span of each sampled request and make it the current span, so the spans of the routers,
+    services, SQL statements and Redis commands of the request become its children. """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _span_processor is None:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = dict(scope["headers"]).get(b"traceparent")
+        root_span = start_root_span(f"{scope['method']} {scope['path']}",
+                                    traceparent.decode("latin-1") if traceparent else None,
+                                    {"http.method": scope["method"], "http.target": scope["path"]})
+        if root_span is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                root_span.attributes["http.status_code"] = message["status"]
+            await send(message)
+
+        token = _current_span.set(root_span)
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException as e:
+            root_span.error = repr(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                root_span.name = f"{scope['method']} {route.path}"
+                root_span.attributes["http.route"] = route.path
+            root_span.end()
@@ -1,10 +1,18 @@
 import base64
+import binascii
+import hashlib
+import hmac
 import logging
+import os
+import time
 
 from fastapi import Header, HTTPException
 from model.User import User
 import bcrypt
 
+VERIFICATION_SECRET = os.getenv("VERIFICATION_SECRET")
+VERIFICATION_TOKEN_EXPIRE_SECONDS = int(os.getenv("VERIFICATION_TOKEN_EXPIRE_SECONDS", str(7 * 24 * 60 * 60)))
+
 
 def check_user_credentials(user: User, password: str) -> int | None:
     """ Checking email and password credentials against database. Returns user obj or None. """
@@ -25,10 +33,7 @@ def get_auth_key(authorization: str = Header(default=None)) -> str:
         raise HTTPException(status_code=401, detail="Authentication credentials were not provided.")
 
     try:
-        logging.info(f"Authorization header received: {authorization}")
-        decoded_key = decode_str(authorization)
-        logging.info(f"Decoded key: {decoded_key}")
-        return decoded_key
+        return decode_str(authorization)
     except Exception as e:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials.")
 
@@ -36,10 +41,7 @@ def get_auth_key(authorization: str = Header(default=None)) -> str:
 def get_auth_key_or_none(authorization: str = Header(default=None)) -> str | None:
     """ Get decoded Authentication token from headers as a string, without raising exception. """
     try:
-        logging.info(f"Authorization header received: {authorization}")
-        decoded_key = decode_str(authorization)
-        logging.info(f"Decoded key: {decoded_key}")
-        return decoded_key
+        return decode_str(authorization)
     except Exception as e:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials.")
 
@@ -56,3 +58,36 @@ def decode_str(encoded_str: str) -> str:
     decoded_bytes = base64.b64decode(encoded_str.encode('utf-8'))
     decoded_str = decoded_bytes.decode('utf-8')
     return decoded_str
+
+
+def create_verification_token(user_id: int, expire_seconds: int = VERIFICATION_TOKEN_EXPIRE_SECONDS) -> str | None:
+    """ Create a signed email verification token carrying user_id and expiry, verifiable without a database lookup. """
+    if not VERIFICATION_SECRET:
+        logging.error("VERIFICATION_SECRET is not set, unable to create verification token")
+        return None
+
+    payload = f"{user_id}.{int(time.time()) + expire_seconds}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_verification_token(token: str) -> int | None:
+    """ Get user_id from a verification token, None if it is not signed by us or expired. """
+    if not VERIFICATION_SECRET or token.count(".") != 2:
+        return None
+
+    payload, signature = token.rsplit(".", 1)
+    try:
+        if not hmac.compare_digest(signature, _sign(payload)):
+            return None
+        user_id, expires_at = payload.split(".")
+        if int(expires_at) < time.time():
+            return None
+        return int(user_id)
+    except (ValueError, binascii.Error):
+        return None
+
+
+def _sign(payload: str) -> str:
+    """ Url safe HMAC-SHA256 signature of payload. """
+    digest = hmac.new(VERIFICATION_SECRET.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode('utf-8').rstrip("=")
@@ -0,0 +1,78 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+BATCH_LOADERS_INFO_KEY = "batch_loaders"
+BATCH_LOADER_LOCK_INFO_KEY = "batch_loader_lock"
+
+
+class BatchLoader:
+    """ Collect the keys requested in one iteration of the event loop and load them with a single call of
+    load_many, which returns the value of every key it found. Keys it did not find resolve to None. Results are
+    memoized, a key is loaded at most once by a loader. Loaders sharing lock never run load_many at the same
+    time. """
+
+    def __init__(self, load_many: Callable[[list[Hashable]], Awaitable[dict[Hashable, Any]]],
+                 lock: asyncio.Lock | None = None):
+        self.load_many = load_many
+        self.lock = lock or asyncio.Lock()
+        self._results: dict[Hashable, asyncio.Future] = {}
+        self._pending: list[Hashable] = []
+        self._batches: set[asyncio.Task] = set()
+
+    async def load(self, key: Hashable) -> Any | None:
+        result = self._results.get(key)
+        if result is None:
+            result = asyncio.get_running_loop().create_future()
+            self._results[key] = result
+            if not self._pending:
+                # the other lookups started in this iteration of the loop run before the batch is dispatched
+                asyncio.get_running_loop().call_soon(self._dispatch)
+            self._pending.append(key)
+        return await asyncio.shield(result)
+
+    def _dispatch(self) -> None:
+        keys, self._pending = self._pending, []
+        batch = asyncio.get_running_loop().create_task(self._load_batch(keys))
+        self._batches.add(batch)
+        batch.add_done_callback(self._batches.discard)
+
+    async def _load_batch(self, keys: list[Hashable]) -> None:
+        try:
+            async with self.lock:
+                values = await self.load_many(keys)
+        except Exception as e:
+            for key in keys:
+                # a failed lookup is retried by the next load of its key
+                self._results.pop(key).set_exception(e)
+            return
+        for key in keys:
+            self._results[key].set_result(values.get(key))
+
+    def clear(self) -> None:
+        """ Forget the memoized results, lookups in progress still complete. """
+        self._results = {key: result for key, result in self._results.items() if not result.done()}
+
+
+def get_batch_loader(db: AsyncSession, name: str,
+                     load_many: Callable[[list[Hashable]], Awaitable[dict[Hashable, Any]]]) -> BatchLoader:
+    """ Loader of name for the session of a request, load_many is only used when the loader is created. Every
+    request gets its own session from get_db, so results are shared by the services of one request only. The
+    loaders of a session take turns, a session cannot run two queries at once. """
+    batch_loaders = db.info.setdefault(BATCH_LOADERS_INFO_KEY, {})
+    batch_loader = batch_loaders.get(name)
+    if batch_loader is None:
+        lock = db.info.setdefault(BATCH_LOADER_LOCK_INFO_KEY, asyncio.Lock())
+        batch_loader = batch_loaders[name] = BatchLoader(load_many, lock)
+    return batch_loader
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def clear_batch_loaders(session: Session) -> None:
+    """ Results loaded before a commit or rollback may have changed, load them again. """
+    for batch_loader in session.info.get(BATCH_LOADERS_INFO_KEY, {}).values():
+        batch_loader.clear()
@@ -0,0 +1,27 @@
+import hashlib
+
+from fastapi import Response
+
+ETAG_HEADER = "ETag"
+
+
+def make_weak_etag(*parts) -> str:
+    """ Make a weak ETag from cheap version values, e.g. latest watermark, person versions and query params. """
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """ Weak comparison of If-None-Match header against the current ETag. """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque_tag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque_tag for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    """ Empty 304 response, the client can use its cached response. """
+    return Response(status_code=304, headers={ETAG_HEADER: etag})
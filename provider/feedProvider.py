@@ -0,0 +1,45 @@
+from typing import List
+
+from dto.gymaDTO import CompactFeedDTO, CompactGymaDTO, ExerciseColumnsDTO
+from dto.personDTO import PersonSimpleDTO
+from model.Gyma import Gyma
+from model.Person import Person
+
+EXERCISE_COLUMNS = list(ExerciseColumnsDTO.model_fields)
+
+
+def build_exercise_columns(gyma: Gyma) -> ExerciseColumnsDTO:
+    """ Put the exercises of a gyma in columnar layout, so the field names are only sent once. """
+    columns = {column: [] for column in EXERCISE_COLUMNS}
+    for gyma_exercise in gyma.exercises:
+        for column in EXERCISE_COLUMNS:
+            columns[column].append(getattr(gyma_exercise.exercise, column))
+    return ExerciseColumnsDTO(**columns)
+
+
+def build_compact_feed(gymas: List[Gyma], persons_by_user_id: dict[int, Person]) -> CompactFeedDTO:
+    """ Build a CompactFeedDTO, every person is sent once in the persons map keyed by profile_url,
+    gymas of a person without a profile get no person reference. """
+    persons: dict[str, PersonSimpleDTO] = {}
+    compact_gymas: List[CompactGymaDTO] = []
+
+    for gyma in gymas:
+        person = persons_by_user_id.get(gyma.user_id)
+        if person is not None and person.profile_url not in persons:
+            persons[person.profile_url] = PersonSimpleDTO(
+                profile_url=person.profile_url,
+                first_name=person.first_name,
+                last_name=person.last_name,
+                sex=person.sex,
+                pf_path_m=person.pf_path_m,
+            )
+
+        compact_gymas.append(CompactGymaDTO(
+            gyma_id=gyma.gyma_id,
+            person=person.profile_url if person is not None else None,
+            time_of_arrival=gyma.time_of_arrival,
+            time_of_leaving=gyma.time_of_leaving,
+            exercises=build_exercise_columns(gyma),
+        ))
+
+    return CompactFeedDTO(persons=persons, gymas=compact_gymas)
@@ -0,0 +1,130 @@
+import heapq
+import math
+import os
+from typing import Iterable, Iterator
+
+from dto.locationDTO import LocationDTO
+
+GRID_CELL_DEGREES = float(os.getenv("LOCATION_GRID_CELL_DEGREES", "0.1"))
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def grid_cell(latitude: float, longitude: float) -> tuple[int, int]:
+    """ Grid cell of a coordinate, cells are GRID_CELL_DEGREES by GRID_CELL_DEGREES. """
+    return math.floor(latitude / GRID_CELL_DEGREES), math.floor(longitude / GRID_CELL_DEGREES)
+
+
+def haversine_km(latitude_a: float, longitude_a: float, latitude_b: float, longitude_b: float) -> float:
+    """ Great-circle distance in km between two coordinates. """
+    phi_a, phi_b = math.radians(latitude_a), math.radians(latitude_b)
+    d_phi = phi_b - phi_a
+    d_lambda = math.radians(longitude_b - longitude_a)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi_a) * math.cos(phi_b) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class LocationGrid:
+    """ Locations by grid cell, with the bounds of the cells that hold a location. """
+
+    def __init__(self):
+        self.cells: dict[tuple[int, int], list[LocationDTO]] = {}
+        self.min_row = self.max_row = self.min_column = self.max_column = 0
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def add(self, location: LocationDTO) -> None:
+        """ Add location to the grid cell of its coordinates. """
+        row, column = grid_cell(location.latitude, location.longitude)
+        if not self.cells:
+            self.min_row = self.max_row = row
+            self.min_column = self.max_column = column
+        self.min_row, self.max_row = min(self.min_row, row), max(self.max_row, row)
+        self.min_column, self.max_column = min(self.min_column, column), max(self.max_column, column)
+        self.cells.setdefault((row, column), []).append(location)
+
+    def ring_bounds(self, center_row: int, center_column: int, ring: int) -> tuple[int, int, int, int]:
+        """ First and last column of the top and bottom row, first and last row of the left and right column of
+        the ring, within the bounds. """
+        first_column = max(center_column - ring, self.min_column)
+        last_column = min(center_column + ring, self.max_column)
+        first_row = max(center_row - ring + 1, self.min_row)
+        last_row = min(center_row + ring - 1, self.max_row)
+        return first_column, last_column, first_row, last_row
+
+    def ring_size(self, center_row: int, center_column: int, ring: int) -> int:
+        """ Number of cells ring_cells visits. """
+        first_column, last_column, first_row, last_row = self.ring_bounds(center_row, center_column, ring)
+        rows = [row for row in {center_row - ring, center_row + ring} if self.min_row <= row <= self.max_row]
+        columns = [column for column in {center_column - ring, center_column + ring}
+                   if self.min_column <= column <= self.max_column] if ring else []
+        return len(rows) * max(0, last_column - first_column + 1) + len(columns) * max(0, last_row - first_row + 1)
+
+    def ring_cells(self, center_row: int, center_column: int, ring: int) -> Iterator[tuple[int, int]]:
+        """ Cells on the perimeter of the square of cells ring steps around the center, within the bounds. """
+        first_column, last_column, first_row, last_row = self.ring_bounds(center_row, center_column, ring)
+        for row in {center_row - ring, center_row + ring}:
+            if self.min_row <= row <= self.max_row:
+                for column in range(first_column, last_column + 1):
+                    yield row, column
+        for column in {center_column - ring, center_column + ring} if ring else ():
+            if self.min_column <= column <= self.max_column:
+                for row in range(first_row, last_row + 1):
+                    yield row, column
+
+
+def add_to_grid(grid: LocationGrid, location: LocationDTO) -> None:
+    """ Add location to the grid cell of its coordinates. """
+    grid.add(location)
+
+
+def nearest_in_grid(grid: LocationGrid, latitude: float, longitude: float,
+                    limit: int, max_distance_km: float | None = None) -> list[tuple[float, LocationDTO]]:
+    """ Find the nearest locations by searching rings of grid cells around the cell of the coordinate,
+    stops as soon as no unvisited ring can hold a location closer than the furthest one found. Only the cells
+    within the bounds of the grid are visited. Once the rings hold more cells than the grid, the remaining
+    occupied cells are searched directly, so a search never visits much more than twice the occupied cells. """
+    if not grid or limit <= 0:
+        return []
+
+    center_row, center_column = grid_cell(latitude, longitude)
+    nearest: list[tuple[float, int, LocationDTO]] = []  # max heap on distance, as negative distance
+
+    def search_cells(cells: Iterable[tuple[int, int]]) -> None:
+        for cell in cells:
+            for location in grid.cells.get(cell, ()):
+                distance = haversine_km(latitude, longitude, location.latitude, location.longitude)
+                if max_distance_km is not None and distance > max_distance_km:
+                    continue
+                entry = (-distance, location.location_id, location)
+                if len(nearest) < limit:
+                    heapq.heappush(nearest, entry)
+                elif distance < -nearest[0][0]:
+                    heapq.heapreplace(nearest, entry)
+
+    # the rings before the first one that reaches the bounds are empty
+    first_ring = max(0, grid.min_row - center_row, center_row - grid.max_row,
+                     grid.min_column - center_column, center_column - grid.max_column)
+    last_ring = max(center_row - grid.min_row, grid.max_row - center_row,
+                    center_column - grid.min_column, grid.max_column - center_column)
+    cells_to_visit = len(grid)
+
+    for ring in range(first_ring, last_ring + 1):
+        ring_size = grid.ring_size(center_row, center_column, ring)
+        if ring_size > cells_to_visit:
+            search_cells(cell for cell in grid.cells
+                         if max(abs(cell[0] - center_row), abs(cell[1] - center_column)) >= ring)
+            break
+        cells_to_visit -= ring_size
+        search_cells(grid.ring_cells(center_row, center_column, ring))
+
+        # every location in the next ring is at least this far away, longitude degrees shrink towards the poles
+        furthest_latitude = min(abs(latitude) + (ring + 1) * GRID_CELL_DEGREES, 90.0)
+        ring_distance_km = ring * GRID_CELL_DEGREES * KM_PER_DEGREE * math.cos(math.radians(furthest_latitude))
+        if max_distance_km is not None and ring_distance_km > max_distance_km:
+            break
+        if len(nearest) == limit and ring_distance_km >= -nearest[0][0]:
+            break
+
+    return [(-distance, location) for distance, _, location in sorted(nearest, reverse=True)]
@@ -1,6 +1,6 @@
 import logging
 from typing import List
-from sqlalchemy import select, desc, or_
+from sqlalchemy import select, or_
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
@@ -9,23 +9,31 @@ from model.Friendship import Friendship
 
 from model.Gyma import Gyma
 from model.GymaExercise import GymaExercise
+from provider.watermarkProvider import Watermark, page_after_watermark, gyma_exists_after_watermark, get_feed_watermark
 
+GYMBRO_FEED_SIZE = 10
 
-async def get_last_ten_gyma_entries_of_user_and_friends(db: AsyncSession,
-                                                        user_id: int, gyma_keys: str = None) -> List[Gyma] | None:
-    """ Get last ten gyma entries of user and user's friends by time_of_leaving,
-    include associated exercises. """
 
-    try:
-        gyma_keys_to_exclude = gyma_keys.split(",") if gyma_keys else []
+async def get_gymbro_ids(db: AsyncSession, user_id: int) -> List[int]:
+    """ Get the person ids of the friends whose gymas are shown in the gymbro feed of user. """
+    friends_query = (
+        select(Friendship.friend_id)
+        .where(Friendship.person_id == user_id)
+    )
+
+    friends_result = await db.execute(friends_query)
+    return [row[0] for row in friends_result.fetchall()]
 
-        friends_query = (
-            select(Friendship.friend_id)
-            .where(Friendship.person_id == user_id)
-        )
 
-        friends_result = await db.execute(friends_query)
-        friend_ids = [row[0] for row in friends_result.fetchall()]
+async def get_last_ten_gyma_entries_of_user_and_friends(db: AsyncSession, user_id: int, friend_ids: List[int],
+                                                        gyma_keys: str = None,
+                                                        watermark: Watermark | None = None) -> List[Gyma] | None:
+    """ Get last ten gyma entries of user and user's friends, with friend_ids from get_gymbro_ids, by
+    time_of_leaving, include associated exercises. With a watermark the first gymas finished after it are returned,
+    oldest first. """
+
+    try:
+        gyma_keys_to_exclude = gyma_keys.split(",") if gyma_keys else []
 
         if not friend_ids:
             return []
@@ -41,9 +49,8 @@ async def get_last_ten_gyma_entries_of_user_and_friends(db: AsyncSession,
             )
             .where(~Gyma.gyma_id.in_(gyma_keys_to_exclude))
             .where(Gyma.time_of_leaving.isnot(None))
-            .order_by(desc(Gyma.time_of_leaving))
-            .limit(10)
         )
+        query = page_after_watermark(query, GYMBRO_FEED_SIZE, watermark)
 
         result = await db.execute(query)
         ten_latest_gyma = result.scalars().unique().all()
@@ -55,3 +62,24 @@ async def get_last_ten_gyma_entries_of_user_and_friends(db: AsyncSession,
     except Exception as e:
         logging.error(f"Error fetching gyma entries: {e}")
         return []
+
+
+async def has_gyma_entry_of_user_and_friends_after(db: AsyncSession, user_id: int, friend_ids: List[int],
+                                                   watermark: Watermark) -> bool:
+    """ Check if the user or user's friends finished a gyma after the watermark, without fetching it. """
+    if not friend_ids:
+        return False
+
+    return await gyma_exists_after_watermark(
+        db, watermark, or_(Gyma.user_id == user_id, Gyma.user_id.in_(friend_ids))
+    )
+
+
+async def get_latest_gyma_watermark_of_user_and_friends(db: AsyncSession, user_id: int,
+                                                        friend_ids: List[int]) -> Watermark | None:
+    """ Watermark of the latest finished gyma of the user and user's friends,
+    changes whenever a new gyma enters the gymbro feed. """
+    if not friend_ids:
+        return None
+
+    return await get_feed_watermark(db, or_(Gyma.user_id == user_id, Gyma.user_id.in_(friend_ids)))
@@ -4,41 +4,52 @@ import random
 import string
 from io import BytesIO
 from shutil import move
-from typing import Optional
-
-from PIL import Image
+from typing import Optional, TYPE_CHECKING
 
 from dto.imageDTO import ImageDTO
+from monitoring.metricsService import IMAGE_PROCESSING_SECONDS
+from monitoring.tracingService import traced
+
+if TYPE_CHECKING:
+    from PIL import Image  # imported on first use, it adds about 20ms to every worker start otherwise
 
 LARGE_IMAGE_PATH = os.getenv("LARGE_IMAGE_PATH", "images/large")
 MEDIUM_IMAGE_PATH = os.getenv("MEDIUM_IMAGE_PATH", "images/medium")
 ARCHIVE_PATH = os.getenv("ARCHIVE_PATH", "images/archive")
 
-# Ensure storage paths exist
-os.makedirs(LARGE_IMAGE_PATH, exist_ok=True)
-os.makedirs(MEDIUM_IMAGE_PATH, exist_ok=True)
-os.makedirs(ARCHIVE_PATH, exist_ok=True)
+
+def ensure_storage_paths() -> None:
+    """ Create the image storage paths, called once when the app starts. """
+    os.makedirs(LARGE_IMAGE_PATH, exist_ok=True)
+    os.makedirs(MEDIUM_IMAGE_PATH, exist_ok=True)
+    os.makedirs(ARCHIVE_PATH, exist_ok=True)
 
 
+@traced
 def process_image(image_dto: ImageDTO) -> dict[str, str] | None:
     """ Function to process uploaded image file to be fit for use on gyma, returns pf_paths. """
+    from PIL import Image
+
     try:
-        file_to_image = Image.open(image_dto.file.file)
-
-        # Create large image (1000x1000, max 150kb)
-        large_image = resize_and_crop_image(file_to_image, (1000, 1000), 150)
-        pf_path_l = store_image(large_image, generate_random_filename('l', LARGE_IMAGE_PATH), LARGE_IMAGE_PATH)
-        # Create medium image (200x200, max 50kb)
-        medium_image = resize_and_crop_image(file_to_image, (200, 200), 50)
-        pf_path_m = store_image(medium_image, generate_random_filename('m', MEDIUM_IMAGE_PATH), MEDIUM_IMAGE_PATH)
+        with IMAGE_PROCESSING_SECONDS.time():
+            file_to_image = Image.open(image_dto.file.file)
+
+            # Create large image (1000x1000, max 150kb)
+            large_image = resize_and_crop_image(file_to_image, (1000, 1000), 150)
+            pf_path_l = store_image(large_image, generate_random_filename('l', LARGE_IMAGE_PATH), LARGE_IMAGE_PATH)
+            # Create medium image (200x200, max 50kb)
+            medium_image = resize_and_crop_image(file_to_image, (200, 200), 50)
+            pf_path_m = store_image(medium_image, generate_random_filename('m', MEDIUM_IMAGE_PATH), MEDIUM_IMAGE_PATH)
         return {'pf_path_l': pf_path_l, 'pf_path_m': pf_path_m}
     except Exception as e:
         logging.error(f"Error processing image: {e}")
         return None
 
 
-def resize_and_crop_image(image: Image, resolution: tuple[int, int], file_size_kb: int) -> Image:
+def resize_and_crop_image(image: "Image.Image", resolution: tuple[int, int], file_size_kb: int) -> "Image.Image":
     """ Function to resize and crop image to given resolution and file size. """
+    from PIL import Image
+
     try:
         image = image.convert('RGB')
 
@@ -75,7 +86,7 @@ def resize_and_crop_image(image: Image, resolution: tuple[int, int], file_size_k
         raise
 
 
-def store_image(image: Image, file_name: str, location: str) -> str:
+def store_image(image: "Image.Image", file_name: str, location: str) -> str:
     """ Function to save image to storage. """
     try:
         file_path = os.path.join(location, file_name)
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import os
+
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dto.liveEventDTO import GymaEventDTO
+from dto.personDTO import PersonSimpleDTO
+from model.Gyma import Gyma
+from service.friendshipService import get_accepted_friend_ids
+from service.personService import get_person_by_user_id
+from session.sessionService import create_redis_connection
+
+LIVE_CHANNEL_PREFIX = "gymbro_live:"
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "16"))
+
+# One pubsub connection per worker, every user with an open live connection on this worker is subscribed once
+_pubsub = None
+_reader_task: asyncio.Task | None = None
+_listeners: dict[int, set[asyncio.Queue]] = {}
+
+
+async def publish_gyma_event(db: AsyncSession, user_id: int, event: str, gyma: Gyma) -> None:
+    """ Publish start_gyma or end_gyma event of user to the live channel of every accepted friend. """
+    try:
+        person = await get_person_by_user_id(db, user_id)
+        if person is None or person.gyma_share == "solo":
+            return
+
+        friend_ids = await get_accepted_friend_ids(db, user_id)
+        if not friend_ids:
+            return
+
+        event_json = GymaEventDTO(
+            event=event,
+            gyma_id=gyma.gyma_id,
+            person=PersonSimpleDTO(
+                profile_url=person.profile_url,
+                first_name=person.first_name,
+                last_name=person.last_name,
+                sex=person.sex,
+                pf_path_m=person.pf_path_m,
+            ),
+            time_of_arrival=gyma.time_of_arrival,
+            time_of_leaving=gyma.time_of_leaving,
+        ).model_dump_json()
+
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            logging.error("Redis connection failed")
+            return
+
+        async with redis_connection.pipeline(transaction=False) as pipe:
+            for friend_id in friend_ids:
+                pipe.publish(f"{LIVE_CHANNEL_PREFIX}{friend_id}", event_json)
+            await pipe.execute()
+    except RedisError as e:
+        logging.error(f"Error publishing gyma event in Redis: {e}")
+    except Exception as e:
+        logging.error(f"Other Exception while publish_gyma_event: {e}")
+
+
+async def subscribe_live(user_id: int) -> asyncio.Queue | None:
+    """ Register a live connection of user, returns the queue receiving the event json of user's gymbros. """
+    global _pubsub, _reader_task
+    queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+
+    listeners = _listeners.get(user_id)
+    if listeners is not None:
+        listeners.add(queue)
+        return queue
+
+    try:
+        if _pubsub is None:
+            redis_connection = await create_redis_connection()
+            if redis_connection is None:
+                logging.error("Redis connection failed")
+                return None
+            _pubsub = redis_connection.pubsub(ignore_subscribe_messages=True)
+
+        _listeners[user_id] = {queue}
+        await _pubsub.subscribe(f"{LIVE_CHANNEL_PREFIX}{user_id}")
+
+        if _reader_task is None or _reader_task.done():
+            _reader_task = asyncio.create_task(_read_live_events())
+        return queue
+    except RedisError as e:
+        logging.error(f"Error subscribing to live channel in Redis: {e}")
+        _listeners.pop(user_id, None)
+        return None
+
+
+async def unsubscribe_live(user_id: int, queue: asyncio.Queue) -> None:
+    """ Remove a live connection of user, the channel is unsubscribed when it was the last one on this worker. """
+    listeners = _listeners.get(user_id)
+    if listeners is None:
+        return
+
+    listeners.discard(queue)
+    if not listeners:
+        del _listeners[user_id]
+        try:
+            await _pubsub.unsubscribe(f"{LIVE_CHANNEL_PREFIX}{user_id}")
+        except RedisError as e:
+            logging.error(f"Error unsubscribing from live channel in Redis: {e}")
+
+
+async def close_live() -> None:
+    """ Stop dispatching live events and close the pubsub connection, called when the app shuts down. """
+    global _pubsub, _reader_task
+    if _reader_task is not None:
+        _reader_task.cancel()
+        try:
+            await _reader_task
+        except asyncio.CancelledError:
+            pass
+        _reader_task = None
+    if _pubsub is not None:
+        try:
+            await _pubsub.close()
+        except RedisError as e:
+            logging.error(f"Error closing live pubsub connection in Redis: {e}")
+        _pubsub = None
+    _listeners.clear()
+
+
+async def _read_live_events() -> None:
+    """ Dispatch messages of the shared pubsub connection to the queues of the live connections. """
+    while _listeners:
+        try:
+            message = await _pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+        except RedisError as e:
+            logging.error(f"Error reading live events from Redis: {e}")
+            await asyncio.sleep(1.0)
+            continue
+
+        if message is None or message.get("type") != "message":
+            continue
+
+        user_id = int(message["channel"].removeprefix(LIVE_CHANNEL_PREFIX))
+        for queue in _listeners.get(user_id, ()):
+            if queue.full():
+                # slow client, drop its oldest event instead of growing memory
+                queue.get_nowait()
+            queue.put_nowait(message["data"])
@@ -0,0 +1,47 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class LocalCache:
+    """ In-process LRU cache of one worker, entries expire after ttl_seconds. Every invalidation bumps the generation,
+    values loaded while an invalidation happened are not stored, so a slow load cannot bring back a stale value. """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, now: float | None = None) -> Any | None:
+        """ Value of key, None when it is not cached or expired. """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= (time.monotonic() if now is None else now):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, generation: int | None = None, now: float | None = None) -> bool:
+        """ Cache value of key, unless generation, read before loading the value, is no longer current. """
+        if generation is not None and generation != self.generation:
+            return False
+        self._entries[key] = ((time.monotonic() if now is None else now) + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return True
+
+    def invalidate(self, *keys: Hashable) -> None:
+        self.generation += 1
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from dto.locationDTO import LocationDTO, NearbyLocationDTO, BusyLocationDTO
+from model.Gyma import Gyma
+from model.Location import Location
+from provider.geoProvider import LocationGrid, add_to_grid, nearest_in_grid
+from provider.presenceProvider import PRESENCE_TTL_SECONDS
+from service.locationService import get_locations_with_coordinates
+
+LOCATION_INDEX_REFRESH_SECONDS = int(os.getenv("LOCATION_INDEX_REFRESH_SECONDS", "60"))
+
+# In-memory grid index of this worker, grid cell -> locations in that cell
+_grid = LocationGrid()
+_refresh_task: asyncio.Task | None = None
+
+
+def location_dto_of(location: Location) -> LocationDTO:
+    return LocationDTO(
+        location_id=location.location_id,
+        gym_name=location.gym_name,
+        country=location.country,
+        city=location.city,
+        address=location.address,
+        zip_code=location.zip_code,
+        latitude=location.latitude,
+        longitude=location.longitude,
+    )
+
+
+async def refresh_location_index(db: AsyncSession) -> None:
+    """ Rebuild the grid index of this worker from all locations with coordinates, so added, moved and removed
+    locations are picked up. """
+    global _grid
+    try:
+        locations = await get_locations_with_coordinates(db)
+        grid = LocationGrid()
+        for location in locations:
+            add_to_grid(grid, location_dto_of(location))
+        # searches in progress keep the index they started with
+        _grid = grid
+        logging.debug(f"Loaded {len(locations)} locations into the location index")
+    except Exception as e:
+        logging.error(f"Error refreshing location index: {e}")
+
+
+async def _refresh_periodically() -> None:
+    while True:
+        await asyncio.sleep(LOCATION_INDEX_REFRESH_SECONDS)
+        async with AsyncSessionLocal() as session:
+            await refresh_location_index(session)
+
+
+def start_location_index_refresh() -> None:
+    """ Rebuild the location index every LOCATION_INDEX_REFRESH_SECONDS in the background, called when the app
+    starts after loading the index once, so proximity searches never wait for the location table. """
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(_refresh_periodically())
+
+
+async def stop_location_index_refresh() -> None:
+    """ Stop refreshing the location index, called when the app shuts down. """
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
+
+
+def get_nearest_locations(latitude: float, longitude: float, limit: int = 10,
+                          max_distance_km: float | None = None) -> list[NearbyLocationDTO]:
+    """ Get the locations nearest to a coordinate from the grid index, without querying the location table. """
+    return [
+        NearbyLocationDTO(location=location, distance_km=round(distance, 3))
+        for distance, location in nearest_in_grid(_grid, latitude, longitude, limit, max_distance_km)
+    ]
+
+
+async def get_busiest_locations(db: AsyncSession, limit: int = 10) -> list[BusyLocationDTO]:
+    """ Get the locations with the most open gymas, gymas open longer than PRESENCE_TTL_SECONDS are ignored. """
+    training_now = (
+        select(Gyma.location_id, func.count().label("training_now"))
+        .where(Gyma.time_of_leaving.is_(None))
+        .where(Gyma.location_id.isnot(None))
+        .where(Gyma.time_of_arrival >= datetime.now() - timedelta(seconds=PRESENCE_TTL_SECONDS))
+        .group_by(Gyma.location_id)
+        .subquery()
+    )
+    result = await db.execute(
+        select(Location, training_now.c.training_now)
+        .join(training_now, training_now.c.location_id == Location.location_id)
+        .order_by(desc(training_now.c.training_now), Location.location_id)
+        .limit(limit)
+    )
+    return [
+        BusyLocationDTO(location=location_dto_of(location), training_now=count)
+        for location, count in result.all()
+    ]
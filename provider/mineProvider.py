@@ -1,29 +1,32 @@
 import logging
 from typing import List
-from sqlalchemy import select, desc
+from sqlalchemy import select
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
 from model.Gyma import Gyma
 from model.GymaExercise import GymaExercise
+from provider.watermarkProvider import Watermark, page_after_watermark, gyma_exists_after_watermark, get_feed_watermark
 
+MINE_FEED_SIZE = 3
 
-async def get_last_three_gyma_entry_of_user(db: AsyncSession, user_id: int, gyma_keys: str = None) -> List[Gyma] | None:
+
+async def get_last_three_gyma_entry_of_user(db: AsyncSession, user_id: int, gyma_keys: str = None,
+                                            watermark: Watermark | None = None) -> List[Gyma] | None:
     """ Get last three gyma entries of person by time_of_leaving,
-    include associated exercises. """
+    include associated exercises. With a watermark the first gymas finished after it are returned, oldest first. """
 
     try:
         gyma_keys_to_exclude = gyma_keys.split(",") if gyma_keys else []
         query = (
             select(Gyma)
             .options(joinedload(Gyma.exercises).joinedload(GymaExercise.exercise))
-            .order_by(desc(Gyma.time_of_leaving))
-            .limit(3)
             .where(Gyma.user_id == user_id)
             .where(~Gyma.gyma_id.in_(gyma_keys_to_exclude))
             .where(Gyma.time_of_leaving.isnot(None))
         )
+        query = page_after_watermark(query, MINE_FEED_SIZE, watermark)
 
         result = await db.execute(query)
         three_latest_gyma = result.scalars().unique().all()
@@ -35,3 +38,13 @@ async def get_last_three_gyma_entry_of_user(db: AsyncSession, user_id: int, gyma
     except Exception as e:
         logging.error(f"Error fetching gyma entries: {e}")
         return []
+
+
+async def has_gyma_entry_of_user_after(db: AsyncSession, user_id: int, watermark: Watermark) -> bool:
+    """ Check if the user finished a gyma after the watermark, without fetching it. """
+    return await gyma_exists_after_watermark(db, watermark, Gyma.user_id == user_id)
+
+
+async def get_latest_gyma_watermark_of_user(db: AsyncSession, user_id: int) -> Watermark | None:
+    """ Watermark of the latest finished gyma of the user, changes whenever the mine feed changes. """
+    return await get_feed_watermark(db, Gyma.user_id == user_id)
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+import os
+from datetime import date
+from typing import Awaitable, Callable, NamedTuple
+
+from redis.exceptions import RedisError
+
+from model.Person import Person
+from monitoring.metricsService import Counter, Gauge
+from provider.localCacheProvider import LocalCache
+from session.sessionService import create_redis_connection
+
+PERSON_CACHE_KEY_PREFIX = "person_cache:"
+PERSON_CACHE_INVALIDATION_CHANNEL = "person_cache_invalidation"
+PERSON_CACHE_L1_SIZE = int(os.getenv("PERSON_CACHE_L1_SIZE", "10000"))
+# the L1 of a worker that missed an invalidation, while its pubsub connection was down, is stale at most this long
+PERSON_CACHE_L1_TTL_SECONDS = int(os.getenv("PERSON_CACHE_L1_TTL_SECONDS", "60"))
+PERSON_CACHE_L2_TTL_SECONDS = int(os.getenv("PERSON_CACHE_L2_TTL_SECONDS", "300"))
+# a fill of L2 that took longer than this, from the version read to the write, can bring back a stale snapshot
+PERSON_CACHE_VERSION_TTL_SECONDS = int(os.getenv("PERSON_CACHE_VERSION_TTL_SECONDS", "3600"))
+
+# write a snapshot under its person_id and profile_url, only when the version of the key it was loaded by is
+# still the one read before loading it
+SET_SNAPSHOT_IF_VERSION_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+redis.call('SET', KEYS[3], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+class PersonSnapshot(NamedTuple):
+    """ Immutable copy of the columns of a Person, as kept by the person cache. """
+    person_id: int
+    profile_url: str
+    first_name: str
+    last_name: str
+    date_of_birth: date
+    sex: str
+    city: str | None
+    profile_text: str | None
+    gyma_share: str
+    pf_path_m: str | None
+    pf_path_l: str | None
+
+
+# L1, snapshots are kept under both their person_id and their lowercased profile_url
+_local_persons = LocalCache(PERSON_CACHE_L1_SIZE, PERSON_CACHE_L1_TTL_SECONDS)
+_invalidation_task: asyncio.Task | None = None
+
+PERSON_CACHE_LOOKUPS = Counter("person_cache_lookups_total", "Person cache lookups per result, l1_hit, l2_hit or miss.",
+                               ("result",))
+Gauge("person_cache_l1_entries", "Entries in the in-process person cache.", collect=lambda: {(): len(_local_persons)})
+
+
+def snapshot_of_person(person: Person) -> PersonSnapshot:
+    return PersonSnapshot(*(getattr(person, field) for field in PersonSnapshot._fields))
+
+
+def dump_snapshot(snapshot: PersonSnapshot) -> str:
+    """ Snapshot as a JSON array in field order, the compact form stored in Redis. """
+    return json.dumps([*snapshot[:4], snapshot.date_of_birth.isoformat(), *snapshot[5:]], separators=(",", ":"))
+
+
+def load_snapshot(raw_snapshot: str) -> PersonSnapshot:
+    values = json.loads(raw_snapshot)
+    values[4] = date.fromisoformat(values[4])
+    return PersonSnapshot(*values)
+
+
+def cache_key(key: int | str) -> int | str:
+    """ Key of a person in the cache. Profile urls are matched case-insensitively, as by the collation of the
+    profile_url column, so every spelling of a profile url shares one entry. """
+    return key.lower() if isinstance(key, str) else key
+
+
+def l2_key(key: int | str) -> str:
+    """ Redis key of a snapshot by person_id or by profile_url. """
+    return f"{PERSON_CACHE_KEY_PREFIX}{'id' if isinstance(key, int) else 'url'}:{cache_key(key)}"
+
+
+def version_key(key: int | str) -> str:
+    """ Redis key of the invalidation counter of a person by person_id or by profile_url. """
+    return f"{PERSON_CACHE_KEY_PREFIX}version:{'id' if isinstance(key, int) else 'url'}:{cache_key(key)}"
+
+
+async def get_l2_snapshots(keys: list[int | str]) \
+        -> tuple[dict[int | str, PersonSnapshot], dict[int | str, str]] | None:
+    """ Snapshots in Redis of keys and the versions of the keys, in one MGET. A key without a version was not
+    invalidated recently, its version is the empty string. None when Redis cannot be read, nothing is filled then. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            logging.error("Redis connection failed")
+            return None
+        values = await redis_connection.mget([l2_key(key) for key in keys] + [version_key(key) for key in keys])
+        snapshots = {key: load_snapshot(raw_snapshot) for key, raw_snapshot in zip(keys, values)
+                     if raw_snapshot is not None}
+        versions = {key: version or "" for key, version in zip(keys, values[len(keys):])}
+        return snapshots, versions
+    except RedisError as e:
+        logging.error(f"Error getting person snapshots from Redis: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"Other Exception while get_l2_snapshots: {e}")
+        return None
+
+
+async def set_l2_snapshots(snapshots: dict[int | str, PersonSnapshot], versions: dict[int | str, str]) -> None:
+    """ Store snapshots by the key they were loaded by, a snapshot is skipped when its person was invalidated
+    after versions were read, as it may have been loaded before the change was committed. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            logging.error("Redis connection failed")
+            return
+        async with redis_connection.pipeline(transaction=False) as pipe:
+            for key, snapshot in snapshots.items():
+                pipe.eval(SET_SNAPSHOT_IF_VERSION_SCRIPT, 3,
+                          version_key(key), l2_key(snapshot.person_id), l2_key(snapshot.profile_url),
+                          versions[key], dump_snapshot(snapshot), PERSON_CACHE_L2_TTL_SECONDS)
+            await pipe.execute()
+    except RedisError as e:
+        logging.error(f"Error setting person snapshots in Redis: {e}")
+    except Exception as e:
+        logging.error(f"Other Exception while set_l2_snapshots: {e}")
+
+
+async def get_person_snapshots(keys: list[int | str], load_persons: Callable[[list], Awaitable[list[Person]]]) \
+        -> dict[int | str, PersonSnapshot]:
+    """ Read-through lookup of persons by person_id or profile_url, from L1, then Redis, then one call of
+    load_persons with the keys that were not cached. Keys of persons that do not exist are left out. Snapshots are
+    returned under the keys as requested, also when the profile url of the person differs in case. """
+    snapshots = {}
+    for key in keys:
+        snapshot = _local_persons.get(cache_key(key))
+        if snapshot is not None:
+            snapshots[key] = snapshot
+    PERSON_CACHE_LOOKUPS.inc(("l1_hit",), len(snapshots))
+
+    missing_keys = [key for key in keys if key not in snapshots]
+    if not missing_keys:
+        return snapshots
+
+    generation = _local_persons.generation
+    l2_result = await get_l2_snapshots(missing_keys)
+    l2_snapshots, versions = l2_result or ({}, None)
+    PERSON_CACHE_LOOKUPS.inc(("l2_hit",), len(l2_snapshots))
+    snapshots.update(l2_snapshots)
+
+    missing_keys = [key for key in missing_keys if key not in l2_snapshots]
+    loaded_snapshots = {}
+    if missing_keys:
+        PERSON_CACHE_LOOKUPS.inc(("miss",), len(missing_keys))
+        missing_keys_by_cache_key: dict[int | str, list[int | str]] = {}
+        for key in missing_keys:
+            missing_keys_by_cache_key.setdefault(cache_key(key), []).append(key)
+        for person in await load_persons(missing_keys):
+            snapshot = snapshot_of_person(person)
+            for key in (*missing_keys_by_cache_key.get(snapshot.person_id, ()),
+                        *missing_keys_by_cache_key.get(cache_key(snapshot.profile_url), ())):
+                loaded_snapshots[key] = snapshot
+        if versions is not None:
+            await set_l2_snapshots(loaded_snapshots, versions)
+        snapshots.update(loaded_snapshots)
+
+    for snapshot in (*l2_snapshots.values(), *loaded_snapshots.values()):
+        _local_persons.set(snapshot.person_id, snapshot, generation)
+        _local_persons.set(cache_key(snapshot.profile_url), snapshot, generation)
+    return snapshots
+
+
+async def invalidate_person(person_id: int, profile_url: str) -> None:
+    """ Drop a changed person from the cache of every worker and from Redis. Bumping the versions first keeps
+    fills of L2 that loaded the person before the change from writing it back. """
+    _local_persons.invalidate(person_id, cache_key(profile_url))
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            logging.error("Redis connection failed")
+            return
+        async with redis_connection.pipeline(transaction=False) as pipe:
+            for key in (person_id, profile_url):
+                pipe.incr(version_key(key))
+                pipe.expire(version_key(key), PERSON_CACHE_VERSION_TTL_SECONDS)
+            pipe.delete(l2_key(person_id), l2_key(profile_url))
+            pipe.publish(PERSON_CACHE_INVALIDATION_CHANNEL, json.dumps([person_id, profile_url]))
+            await pipe.execute()
+    except RedisError as e:
+        logging.error(f"Error invalidating person cache in Redis: {e}")
+    except Exception as e:
+        logging.error(f"Other Exception while invalidate_person: {e}")
+
+
+async def _read_invalidations() -> None:
+    """ Apply the invalidations published by the workers to L1. The whole L1 is dropped when the pubsub connection
+    fails, as invalidations may have been missed. """
+    while True:
+        pubsub = None
+        try:
+            redis_connection = await create_redis_connection()
+            if redis_connection is None:
+                raise RedisError("Redis connection failed")
+            pubsub = redis_connection.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(PERSON_CACHE_INVALIDATION_CHANNEL)
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None and message.get("type") == "message":
+                    person_id, profile_url = json.loads(message["data"])
+                    _local_persons.invalidate(person_id, cache_key(profile_url))
+        except asyncio.CancelledError:
+            if pubsub is not None:
+                await pubsub.close()
+            raise
+        except Exception as e:
+            logging.error(f"Error reading person cache invalidations from Redis: {e}")
+            _local_persons.clear()
+            await asyncio.sleep(1.0)
+
+
+def start_person_cache_invalidation() -> None:
+    """ Start applying invalidations of other workers, called when the app starts. """
+    global _invalidation_task
+    if _invalidation_task is None or _invalidation_task.done():
+        _invalidation_task = asyncio.create_task(_read_invalidations())
+
+
+async def stop_person_cache_invalidation() -> None:
+    """ Stop applying invalidations and close the pubsub connection, called when the app shuts down. """
+    global _invalidation_task
+    if _invalidation_task is not None:
+        _invalidation_task.cancel()
+        try:
+            await _invalidation_task
+        except asyncio.CancelledError:
+            pass
+        _invalidation_task = None
+    _local_persons.clear()
@@ -0,0 +1,99 @@
+import logging
+import os
+import time
+from datetime import datetime
+
+from redis.exceptions import RedisError
+
+from session.sessionService import create_redis_connection
+
+PRESENCE_KEY_PREFIX = "presence:"
+PRESENCE_ACTIVE_KEY = "presence_active"
+PRESENCE_TTL_SECONDS = int(os.getenv("PRESENCE_TTL_SECONDS", str(6 * 60 * 60)))
+
+
+async def set_presence(user_id: int, time_of_arrival: datetime) -> bool:
+    """ Mark user as training since time_of_arrival, expires after PRESENCE_TTL_SECONDS if the gyma never ends. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            logging.error("Redis connection failed")
+            return False
+
+        async with redis_connection.pipeline(transaction=True) as pipe:
+            pipe.set(f"{PRESENCE_KEY_PREFIX}{user_id}", time_of_arrival.isoformat(), ex=PRESENCE_TTL_SECONDS)
+            pipe.zadd(PRESENCE_ACTIVE_KEY, {str(user_id): time.time()})
+            await pipe.execute()
+        return True
+    except RedisError as e:
+        logging.error(f"Error setting presence in Redis: {e}")
+        return False
+    except Exception as e:
+        logging.error(f"Other Exception while set_presence: {e}")
+        return False
+
+
+async def remove_presence(user_id: int) -> bool:
+    """ Remove user from the training now index, when the gyma has ended. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            logging.error("Redis connection failed")
+            return False
+
+        async with redis_connection.pipeline(transaction=True) as pipe:
+            pipe.delete(f"{PRESENCE_KEY_PREFIX}{user_id}")
+            pipe.zrem(PRESENCE_ACTIVE_KEY, str(user_id))
+            await pipe.execute()
+        return True
+    except RedisError as e:
+        logging.error(f"Error removing presence from Redis: {e}")
+        return False
+    except Exception as e:
+        logging.error(f"Other Exception while remove_presence: {e}")
+        return False
+
+
+async def get_presence_of_users(user_ids: list[int]) -> dict[int, datetime]:
+    """ Get which of the given users are training right now and since when, in one round trip. """
+    if not user_ids:
+        return {}
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            logging.error("Redis connection failed")
+            return {}
+
+        arrivals = await redis_connection.mget([f"{PRESENCE_KEY_PREFIX}{user_id}" for user_id in user_ids])
+        return {
+            user_id: datetime.fromisoformat(arrival)
+            for user_id, arrival in zip(user_ids, arrivals) if arrival is not None
+        }
+    except RedisError as e:
+        logging.error(f"Error getting presence from Redis: {e}")
+        return {}
+    except Exception as e:
+        logging.error(f"Other Exception while get_presence_of_users: {e}")
+        return {}
+
+
+async def count_presence() -> int | None:
+    """ Count the users training right now. Entries older than PRESENCE_TTL_SECONDS are swept first,
+    their presence key has expired already. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            logging.error("Redis connection failed")
+            return None
+
+        async with redis_connection.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(PRESENCE_ACTIVE_KEY, "-inf", time.time() - PRESENCE_TTL_SECONDS)
+            pipe.zcard(PRESENCE_ACTIVE_KEY)
+            _, count = await pipe.execute()
+        return count
+    except RedisError as e:
+        logging.error(f"Error counting presence in Redis: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"Other Exception while count_presence: {e}")
+        return None
@@ -1,30 +1,34 @@
 import logging
 from typing import List
 from fastapi import Depends
-from sqlalchemy import select, desc
+from sqlalchemy import select
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
 from model.Gyma import Gyma
 from model.GymaExercise import GymaExercise
+from provider.watermarkProvider import Watermark, page_after_watermark, gyma_exists_after_watermark, get_feed_watermark
 
+PUB_FEED_SIZE = 10
 
-async def get_last_ten_gyma_entry(db: AsyncSession, gyma_keys: str = None) -> List[Gyma] | None:
-    """ Get last three gyma entries by time_of_leaving, exclude gyma_keys, for the client already has them. """
+
+async def get_last_ten_gyma_entry(db: AsyncSession, gyma_keys: str = None,
+                                  watermark: Watermark | None = None) -> List[Gyma] | None:
+    """ Get last three gyma entries by time_of_leaving, exclude gyma_keys, for the client already has them.
+    With a watermark the first gymas finished after it are returned, oldest first. """
     try:
         gyma_keys_to_exclude = [key.strip() for key in (gyma_keys.split(",") if gyma_keys else [])]
         query = (
             select(Gyma)
             .options(joinedload(Gyma.exercises).joinedload(GymaExercise.exercise))
-            .order_by(desc(Gyma.time_of_leaving))
-            .limit(10)
             .where(Gyma.time_of_leaving.isnot(None))
         )
 
         if gyma_keys_to_exclude:
             query = query.where(~Gyma.gyma_id.in_(gyma_keys_to_exclude))
 
+        query = page_after_watermark(query, PUB_FEED_SIZE, watermark)
         result = await db.execute(query)
         three_latest_gyma = result.scalars().unique().all()
 
@@ -35,3 +39,13 @@ async def get_last_ten_gyma_entry(db: AsyncSession, gyma_keys: str = None) -> Li
     except Exception as e:
         logging.error(f"Error fetching gyma entries: {e}")
         return []
+
+
+async def has_gyma_entry_after(db: AsyncSession, watermark: Watermark) -> bool:
+    """ Check if any gyma is finished after the watermark, without fetching it. """
+    return await gyma_exists_after_watermark(db, watermark)
+
+
+async def get_latest_gyma_watermark(db: AsyncSession) -> Watermark | None:
+    """ Watermark of the latest finished gyma, changes whenever the pub feed changes. """
+    return await get_feed_watermark(db)
@@ -0,0 +1,101 @@
+import logging
+import math
+import os
+
+from redis.exceptions import RedisError
+from fastapi import HTTPException, Request
+
+from provider.tokenBucketProvider import RateLimitPolicy, take_local_token
+from session.sessionService import create_redis_connection
+
+RATE_LIMIT_KEY_PREFIX = "rate_limit:"
+
+
+def policy_from_env(name: str, default: RateLimitPolicy) -> RateLimitPolicy:
+    """ Read policy from RATE_LIMIT_<NAME> as capacity/period_seconds, e.g. RATE_LIMIT_LOGIN_IP=20/60. """
+    value = os.getenv(f"RATE_LIMIT_{name.upper()}")
+    if not value:
+        return default
+    capacity, period_seconds = value.split("/")
+    return RateLimitPolicy(int(capacity), int(period_seconds))
+
+
+RATE_LIMIT_POLICIES = {
+    name: policy_from_env(name, default) for name, default in {
+        "login_ip": RateLimitPolicy(20, 60),
+        "login_email": RateLimitPolicy(5, 300),
+        "register_ip": RateLimitPolicy(5, 3600),
+        "resend_verification_ip": RateLimitPolicy(5, 3600),
+        "resend_verification_email": RateLimitPolicy(3, 3600),
+        "picture_user": RateLimitPolicy(5, 600),
+    }.items()
+}
+
+# Refill and take one token atomically, one round trip. Uses the Redis clock so workers agree on time.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_per_second = tonumber(ARGV[2])
+local redis_time = redis.call('TIME')
+local now = tonumber(redis_time[1]) + tonumber(redis_time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * refill_per_second)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / refill_per_second
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill_per_second) + 1)
+return tostring(retry_after)
+"""
+
+_token_bucket_script = None
+
+
+async def take_redis_token(key: str, policy: RateLimitPolicy) -> float | None:
+    """ Token bucket in Redis shared by all workers, None if Redis is not available. """
+    global _token_bucket_script
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            return None
+        if _token_bucket_script is None:
+            _token_bucket_script = redis_connection.register_script(TOKEN_BUCKET_SCRIPT)
+        retry_after = await _token_bucket_script(keys=[key], args=[policy.capacity, policy.refill_per_second])
+        return float(retry_after)
+    except RedisError as e:
+        logging.error(f"Error taking rate limit token in Redis: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"Other Exception while take_redis_token: {e}")
+        return None
+
+
+async def check_rate_limit(policy_name: str, identity: str | int) -> None:
+    """ Take a token of the bucket of identity under policy, raises 429 with Retry-After when it is empty. """
+    policy = RATE_LIMIT_POLICIES[policy_name]
+    key = f"{RATE_LIMIT_KEY_PREFIX}{policy_name}:{identity}"
+
+    retry_after = await take_redis_token(key, policy)
+    if retry_after is None:
+        retry_after = take_local_token(key, policy)
+
+    if retry_after > 0:
+        logging.warning(f"Rate limit {policy_name} exceeded")
+        raise HTTPException(status_code=429, detail="Too many requests, please try again later",
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+
+
+def rate_limit_by_ip(policy_name: str):
+    """ Dependency limiting a route per client ip. Behind a proxy, run uvicorn with --proxy-headers. """
+    if policy_name not in RATE_LIMIT_POLICIES:
+        raise KeyError(f"Unknown rate limit policy: {policy_name}")
+
+    async def dependency(request: Request) -> None:
+        client_ip = request.client.host if request.client else "unknown"
+        await check_rate_limit(policy_name, client_ip)
+
+    return dependency
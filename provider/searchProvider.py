@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import re
+import unicodedata
+
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from model.Person import Person
+from session.sessionService import create_redis_connection
+
+SEARCH_PREFIX_KEY = "person_search"
+SEARCH_BUILT_KEY = "person_search_built"
+SEARCH_BUILDING = "building"
+SEARCH_BUILT = "built"
+SEARCH_BUILD_CLAIM_SECONDS = 300
+SEARCH_TERMS_KEY_PREFIX = "person_search_terms:"
+SEARCH_TRIGRAM_KEY_PREFIX = "person_trigram:"
+TRIGRAM_MIN_SIMILARITY = 0.3
+TRIGRAM_MAX_POSTINGS = 5000
+REBUILD_BATCH_SIZE = 1000
+
+_build_task: asyncio.Task | None = None
+
+
+def normalize_term(text: str | None) -> str:
+    """ Lowercase ascii letters and digits only, so 'Zoë van Dijk' and 'zoevandijk' match. """
+    if not text:
+        return ""
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]", "", ascii_text.lower())
+
+
+def trigrams(term: str) -> set[str]:
+    """ Trigrams of a normalized term, padded so short terms and word starts weigh in. """
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def person_search_terms(person: Person) -> set[str]:
+    """ Terms a person can be found by with a prefix search. """
+    terms = {
+        normalize_term(person.first_name),
+        normalize_term(person.last_name),
+        normalize_term(f"{person.first_name}{person.last_name}"),
+        normalize_term(person.profile_url),
+        normalize_term(person.city),
+    }
+    terms.discard("")
+    return terms
+
+
+async def index_person(person: Person) -> None:
+    """ Replace the search terms of person in the index, persons sharing solo are removed from it. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            logging.error("Redis connection failed")
+            return
+
+        old_entries = await redis_connection.smembers(f"{SEARCH_TERMS_KEY_PREFIX}{person.person_id}")
+        async with redis_connection.pipeline(transaction=True) as pipe:
+            _replace_entries(pipe, person, old_entries)
+            await pipe.execute()
+    except RedisError as e:
+        logging.error(f"Error indexing person for search in Redis: {e}")
+    except Exception as e:
+        logging.error(f"Other Exception while index_person: {e}")
+
+
+def _replace_entries(pipe, person: Person, old_entries: set[str]) -> None:
+    """ Queue replacing the old_entries of person in the index with its current terms on a pipeline. """
+    person_id = person.person_id
+    terms_key = f"{SEARCH_TERMS_KEY_PREFIX}{person_id}"
+
+    terms = person_search_terms(person) if person.gyma_share != "solo" else set()
+    new_entries = {f"p:{term}:{person_id}" for term in terms}
+    new_entries |= {f"t:{trigram}" for term in terms for trigram in trigrams(term)}
+
+    _remove_entries(pipe, person_id, old_entries - new_entries)
+    for entry in new_entries - old_entries:
+        if entry.startswith("p:"):
+            pipe.zadd(SEARCH_PREFIX_KEY, {entry[2:]: 0})
+        else:
+            pipe.sadd(f"{SEARCH_TRIGRAM_KEY_PREFIX}{entry[2:]}", person_id)
+    pipe.delete(terms_key)
+    if new_entries:
+        pipe.sadd(terms_key, *new_entries)
+
+
+def _remove_entries(pipe, person_id: int, entries: set[str]) -> None:
+    """ Queue removal of prefix terms and trigrams of person on a pipeline. """
+    for entry in entries:
+        if entry.startswith("p:"):
+            pipe.zrem(SEARCH_PREFIX_KEY, entry[2:])
+        else:
+            pipe.srem(f"{SEARCH_TRIGRAM_KEY_PREFIX}{entry[2:]}", person_id)
+
+
+async def build_search_index(db: AsyncSession) -> None:
+    """ Build the search index from the person table when Redis has no complete index yet. One worker claims the
+    build, the index is marked built only when every person is indexed, a failed build is retried by the next
+    worker that starts. Searches until then find the persons indexed so far. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            logging.error("Redis connection failed")
+            return
+
+        # the claim expires when the worker building the index dies, so a worker started later can build it
+        if not await redis_connection.set(SEARCH_BUILT_KEY, SEARCH_BUILDING, nx=True,
+                                          ex=SEARCH_BUILD_CLAIM_SECONDS):
+            return
+    except RedisError as e:
+        logging.error(f"Error claiming search index build in Redis: {e}")
+        return
+
+    try:
+        logging.info("Building person search index")
+        last_person_id = 0
+        while True:
+            result = await db.execute(
+                select(Person)
+                .where(Person.person_id > last_person_id)
+                .order_by(Person.person_id)
+                .limit(REBUILD_BATCH_SIZE)
+            )
+            persons = list(result.scalars().all())
+            if not persons:
+                break
+
+            async with redis_connection.pipeline(transaction=False) as pipe:
+                for person in persons:
+                    pipe.smembers(f"{SEARCH_TERMS_KEY_PREFIX}{person.person_id}")
+                old_entries_of_persons = await pipe.execute()
+            async with redis_connection.pipeline(transaction=False) as pipe:
+                for person, old_entries in zip(persons, old_entries_of_persons):
+                    _replace_entries(pipe, person, old_entries)
+                pipe.expire(SEARCH_BUILT_KEY, SEARCH_BUILD_CLAIM_SECONDS)
+                await pipe.execute()
+            last_person_id = persons[-1].person_id
+
+        await redis_connection.set(SEARCH_BUILT_KEY, SEARCH_BUILT)
+        logging.info("Built person search index")
+    except asyncio.CancelledError:
+        await _release_search_index_build(redis_connection)
+        raise
+    except Exception as e:
+        logging.error(f"Error building search index: {e}")
+        await _release_search_index_build(redis_connection)
+
+
+async def _release_search_index_build(redis_connection) -> None:
+    """ Drop the claim of an unfinished build, so the next worker that starts builds the index. """
+    try:
+        await redis_connection.delete(SEARCH_BUILT_KEY)
+    except RedisError as e:
+        logging.error(f"Error releasing search index build in Redis: {e}")
+
+
+async def _build_search_index_in_session() -> None:
+    async with AsyncSessionLocal() as session:
+        await build_search_index(session)
+
+
+def start_search_index_build() -> None:
+    """ Build the search index in the background, called when the app starts. """
+    global _build_task
+    if _build_task is None or _build_task.done():
+        _build_task = asyncio.create_task(_build_search_index_in_session())
+
+
+async def stop_search_index_build() -> None:
+    """ Stop a build in progress and release its claim, called when the app shuts down. """
+    global _build_task
+    if _build_task is not None:
+        _build_task.cancel()
+        try:
+            await _build_task
+        except asyncio.CancelledError:
+            pass
+        _build_task = None
+
+
+async def search_person_ids(query: str, limit: int = 10) -> list[int]:
+    """ Get ids of persons matching the query, prefix matches first, filled up with trigram matches
+    for misspelled queries. """
+    term = normalize_term(query)
+    if len(term) < 2:
+        return []
+
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            logging.error("Redis connection failed")
+            return []
+
+        # one person has multiple terms, fetch extra to fill limit after removing duplicates
+        members = await redis_connection.zrangebylex(SEARCH_PREFIX_KEY, f"[{term}", f"[{term}\x7f",
+                                                     start=0, num=limit * 5)
+        person_ids = list(dict.fromkeys(int(member.rsplit(":", 1)[1]) for member in members))[:limit]
+        if len(person_ids) >= limit:
+            return person_ids
+
+        query_trigrams = list(trigrams(term))
+        async with redis_connection.pipeline(transaction=False) as pipe:
+            for trigram in query_trigrams:
+                pipe.scard(f"{SEARCH_TRIGRAM_KEY_PREFIX}{trigram}")
+            trigram_sizes = await pipe.execute()
+
+        # trigrams shared by a large part of all persons say little and are expensive to fetch
+        selective_trigrams = [trigram for trigram, size in zip(query_trigrams, trigram_sizes)
+                              if 0 < size <= TRIGRAM_MAX_POSTINGS]
+        async with redis_connection.pipeline(transaction=False) as pipe:
+            for trigram in selective_trigrams:
+                pipe.smembers(f"{SEARCH_TRIGRAM_KEY_PREFIX}{trigram}")
+            trigram_members = await pipe.execute()
+
+        overlap: dict[int, int] = {}
+        for members_of_trigram in trigram_members:
+            for person_id in members_of_trigram:
+                overlap[int(person_id)] = overlap.get(int(person_id), 0) + 1
+
+        fuzzy_ids = sorted(
+            (person_id for person_id, count in overlap.items()
+             if count / len(query_trigrams) >= TRIGRAM_MIN_SIMILARITY and person_id not in person_ids),
+            key=lambda person_id: -overlap[person_id]
+        )
+        return (person_ids + fuzzy_ids)[:limit]
+    except RedisError as e:
+        logging.error(f"Error searching persons in Redis: {e}")
+        return []
+    except Exception as e:
+        logging.error(f"Other Exception while search_person_ids: {e}")
+        return []
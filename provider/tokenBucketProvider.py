@@ -0,0 +1,38 @@
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+LOCAL_BUCKETS_MAX_SIZE = 10000
+
+_local_buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+
+class RateLimitPolicy(NamedTuple):
+    """ Token bucket holding at most capacity tokens, refilled with capacity tokens every period_seconds. """
+    capacity: int
+    period_seconds: int
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.capacity / self.period_seconds
+
+
+def take_token(tokens: float, updated_at: float, now: float, policy: RateLimitPolicy) -> tuple[float, float]:
+    """ Refill bucket since updated_at and take one token, returns remaining tokens and seconds to wait,
+    which is 0 when the token was taken. """
+    tokens = min(policy.capacity, tokens + max(0.0, now - updated_at) * policy.refill_per_second)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / policy.refill_per_second
+
+
+def take_local_token(key: str, policy: RateLimitPolicy, now: float | None = None) -> float:
+    """ In-process token bucket, used when Redis is not available. Limits are then per worker. """
+    if now is None:
+        now = time.monotonic()
+    tokens, updated_at = _local_buckets.pop(key, (policy.capacity, now))
+    tokens, retry_after = take_token(tokens, updated_at, now, policy)
+    _local_buckets[key] = (tokens, now)
+    if len(_local_buckets) > LOCAL_BUCKETS_MAX_SIZE:
+        _local_buckets.popitem(last=False)
+    return retry_after
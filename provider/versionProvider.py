@@ -0,0 +1,45 @@
+import logging
+
+from redis.exceptions import RedisError
+
+from session.sessionService import create_redis_connection
+
+PERSON_VERSION_PREFIX = "person_version:"
+
+
+async def bump_person_version(*person_ids: int) -> None:
+    """ Increment the version counter of persons, so ETags of their profile and feeds no longer match. """
+    if not person_ids:
+        return
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            logging.error("Redis connection failed")
+            return
+
+        async with redis_connection.pipeline(transaction=False) as pipe:
+            for person_id in set(person_ids):
+                pipe.incr(f"{PERSON_VERSION_PREFIX}{person_id}")
+            await pipe.execute()
+    except RedisError as e:
+        logging.error(f"Error bumping person version in Redis: {e}")
+    except Exception as e:
+        logging.error(f"Other Exception while bump_person_version: {e}")
+
+
+async def get_person_versions(*person_ids: int) -> list[int] | None:
+    """ Get the version counters of persons in one round trip, None if they cannot be read. """
+    try:
+        redis_connection = await create_redis_connection()
+        if redis_connection is None:
+            logging.error("Redis connection failed")
+            return None
+
+        versions = await redis_connection.mget([f"{PERSON_VERSION_PREFIX}{person_id}" for person_id in person_ids])
+        return [int(version) if version is not None else 0 for version in versions]
+    except RedisError as e:
+        logging.error(f"Error getting person versions from Redis: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"Other Exception while get_person_versions: {e}")
+        return None
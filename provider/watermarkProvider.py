@@ -0,0 +1,97 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import List, NamedTuple
+
+from fastapi import Response
+from sqlalchemy import select, exists, or_, and_, desc, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from model.Gyma import Gyma
+
+WATERMARK_HEADER = "X-Gyma-Watermark"
+MORE_HEADER = "X-Gyma-More"
+
+
+class Watermark(NamedTuple):
+    """ High-water mark of a feed; the client has every gyma up to and including this one. """
+    time_of_leaving: datetime
+    gyma_id: int
+
+
+def encode_watermark(watermark: Watermark) -> str:
+    """ Encode watermark as an opaque url safe string, for sending to client. """
+    raw = f"{watermark.time_of_leaving.isoformat()}|{watermark.gyma_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('utf-8')
+
+
+def decode_watermark(encoded_watermark: str) -> Watermark | None:
+    """ Decode watermark received from client, returns None if it was not issued by encode_watermark. """
+    try:
+        raw = base64.urlsafe_b64decode(encoded_watermark.encode('utf-8')).decode('utf-8')
+        time_of_leaving, gyma_id = raw.split("|")
+        return Watermark(datetime.fromisoformat(time_of_leaving), int(gyma_id))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def after_watermark(watermark: Watermark):
+    """ Where clause for gymas finished after the watermark, gyma_id breaks ties on equal time_of_leaving. """
+    return or_(
+        Gyma.time_of_leaving > watermark.time_of_leaving,
+        and_(Gyma.time_of_leaving == watermark.time_of_leaving, Gyma.gyma_id > watermark.gyma_id)
+    )
+
+
+def page_after_watermark(query: Select, limit: int, watermark: Watermark | None = None) -> Select:
+    """ Limit query of finished gymas to the latest limit gymas, newest first. With a watermark it is limited to
+    the first limit gymas finished after it, oldest first, so a client that is behind pages through every gyma
+    instead of skipping the ones between the watermark and the latest page. """
+    if watermark is None:
+        return query.order_by(desc(Gyma.time_of_leaving), desc(Gyma.gyma_id)).limit(limit)
+    return query.where(after_watermark(watermark)).order_by(Gyma.time_of_leaving, Gyma.gyma_id).limit(limit)
+
+
+def latest_watermark(gymas: List[Gyma], watermark: Watermark | None = None) -> Watermark | None:
+    """ Highest watermark of the given gymas and the current watermark of the client. """
+    watermarks = [Watermark(gyma.time_of_leaving, gyma.gyma_id) for gyma in gymas if gyma.time_of_leaving is not None]
+    if watermark is not None:
+        watermarks.append(watermark)
+    return max(watermarks, default=None)
+
+
+def set_watermark_header(response: Response, gymas: List[Gyma], watermark: Watermark | None = None,
+                         limit: int | None = None) -> None:
+    """ Send the new watermark to the client, to be used as since parameter on the next poll. A full page after a
+    watermark may be followed by more gymas, which is signalled so the client polls again right away. """
+    new_watermark = latest_watermark(gymas, watermark)
+    if new_watermark is not None:
+        response.headers[WATERMARK_HEADER] = encode_watermark(new_watermark)
+    if watermark is not None and limit is not None and len(gymas) >= limit:
+        response.headers[MORE_HEADER] = "true"
+
+
+async def gyma_exists_after_watermark(db: AsyncSession, watermark: Watermark, *criteria) -> bool:
+    """ Indexed existence check for finished gymas after the watermark, matching the extra criteria. """
+    query = select(
+        exists().where(
+            Gyma.time_of_leaving.isnot(None),
+            after_watermark(watermark),
+            *criteria
+        )
+    )
+    result = await db.execute(query)
+    return bool(result.scalar())
+
+
+async def get_feed_watermark(db: AsyncSession, *criteria) -> Watermark | None:
+    """ Watermark of the latest finished gyma matching the criteria, used as cheap version of a feed. """
+    query = (
+        select(Gyma.time_of_leaving, Gyma.gyma_id)
+        .where(Gyma.time_of_leaving.isnot(None), *criteria)
+        .order_by(desc(Gyma.time_of_leaving), desc(Gyma.gyma_id))
+        .limit(1)
+    )
+    result = await db.execute(query)
+    row = result.first()
+    return Watermark(row[0], row[1]) if row is not None else None
@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import APIRouter, Depends, HTTPException
 from database import get_db
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -5,30 +7,36 @@ import logging
 
 from dto.personDTO import PersonDTO, PersonSimpleDTO
 from dto.profileDTO import MyProfileDTO
-from mail.emailService import send_verification_email
-from provider.authProvider import check_user_credentials, encode_str, get_auth_key
+from mail.emailQueue import queue_verification_email
+from provider.rateLimitProvider import rate_limit_by_ip, check_rate_limit
+from provider.authProvider import check_user_credentials, encode_str, get_auth_key, create_verification_token, \
+    verify_verification_token
 from dto.loginDTO import LoginDTO, LoginResponseDTO
-from service.friendshipService import get_friends_by_person_id, get_pending_friendships_to_be_accepted
-from service.personService import get_person_by_user_id
-from service.userService import get_user_by_email, get_user_by_user_id, set_email_verification
-from service.userVerificationService import get_user_id_by_verification_code, remove_user_verification, \
-    get_verification_code_by_user_id
+from service.friendshipService import get_friends_and_pending_requesters
+from service.userService import get_user_by_email, get_user_by_user_id, set_email_verification, \
+    get_user_and_person_by_email
+from service.userVerificationService import get_user_id_by_verification_code, remove_user_verification
 from session.sessionService import set_session, delete_session
 from session.sessionDataObject import SessionDataObject
 
 router = APIRouter(prefix="/api/v1/auth", tags=["authentication"])
 
 
-@router.post("/login", response_model=LoginResponseDTO, status_code=200)
+@router.post("/login", response_model=LoginResponseDTO, status_code=200,
+             dependencies=[Depends(rate_limit_by_ip("login_ip"))])
 async def login(login_dto: LoginDTO, db: AsyncSession = Depends(get_db)):
     logging.info("Attempting login for user with email: %s", login_dto.email)
+    await check_rate_limit("login_email", login_dto.email.lower())
 
-    user = await get_user_by_email(db, login_dto.email)
-    if user is None:
+    user_and_person = await get_user_and_person_by_email(db, login_dto.email)
+    if user_and_person is None:
         raise HTTPException(status_code=400,
                             detail="User not found")
+    user, person = user_and_person
 
-    user_id_of_ok_credentials = check_user_credentials(user, login_dto.password)
+    # bcrypt takes a while, keep it off the event loop. The friend lists are only loaded after the credentials
+    # are checked, so failed login attempts do not cost a query.
+    user_id_of_ok_credentials = await asyncio.to_thread(check_user_credentials, user, login_dto.password)
     if user_id_of_ok_credentials is None:
         raise HTTPException(status_code=401,
                             detail="Incorrect email or password")
@@ -38,16 +46,20 @@ async def login(login_dto: LoginDTO, db: AsyncSession = Depends(get_db)):
                             detail="Email not verified. Please check your email to verify your account.")
 
     session_object_only_user_id = SessionDataObject(user_id=user_id_of_ok_credentials, trustDevice=login_dto.trustDevice)
-    raw_session_key = await set_session(session_object_only_user_id)
+    if person is not None:
+        raw_session_key, (friends, pending_friends) = await asyncio.gather(
+            set_session(session_object_only_user_id),
+            get_friends_and_pending_requesters(db, person.person_id)
+        )
+    else:
+        raw_session_key = await set_session(session_object_only_user_id)
     if raw_session_key is None:
         raise HTTPException(status_code=500,
                             detail="Unable to login, please try later")
 
-    person = await get_person_by_user_id(db, user_id_of_ok_credentials)
     encoded_session_key = encode_str(raw_session_key)
 
     if person is not None:
-        friends = await get_friends_by_person_id(db, person.person_id)
         friend_list = [
             PersonSimpleDTO(
                 profile_url=friend.profile_url,
@@ -71,7 +83,6 @@ async def login(login_dto: LoginDTO, db: AsyncSession = Depends(get_db)):
             pf_path_m=person.pf_path_m,
         )
 
-        pending_friends = await get_pending_friendships_to_be_accepted(db, user_id_of_ok_credentials)
         pending_friend_list = [
             PersonSimpleDTO(
                 profile_url=friend.profile_url,
@@ -110,8 +121,11 @@ async def logout(auth_token: str | None = Depends(get_auth_key)):
 @router.get("/verify/{verification_code}", status_code=200)
 async def verify(verification_code: str, db: AsyncSession = Depends(get_db)):
     logging.info("Attempting email verification with verification code")
-    user_id = await get_user_id_by_verification_code(db, verification_code)
-    logging.info(f"Verification code: {verification_code}")
+    user_id = verify_verification_token(verification_code)
+    is_stored_code = user_id is None
+    if is_stored_code:
+        user_id = await get_user_id_by_verification_code(db, verification_code)
+
     if user_id is None:
         raise HTTPException(status_code=404, detail="Verification code does not exist")
     else:
@@ -120,7 +134,7 @@ async def verify(verification_code: str, db: AsyncSession = Depends(get_db)):
         if user is None:
             raise HTTPException(status_code=404, detail="User not found")
         else:
-            verification_code_removed = await remove_user_verification(db, user_id)
+            verification_code_removed = await remove_user_verification(db, user_id) if is_stored_code else True
             email_verified = await set_email_verification(db, user)
             if email_verified is True and verification_code_removed is True:
                 return True
@@ -128,23 +142,25 @@ async def verify(verification_code: str, db: AsyncSession = Depends(get_db)):
                 raise HTTPException(status_code=403, detail="Unable to verify email, please contact support")
 
 
-@router.post("/resend_verification_mail", status_code=200)
+@router.post("/resend_verification_mail", status_code=200,
+             dependencies=[Depends(rate_limit_by_ip("resend_verification_ip"))])
 async def resend_verification(login_dto: LoginDTO, db: AsyncSession = Depends(get_db)):
-    logging.info("Attempting email resend: " + login_dto.email)
+    logging.info("Attempting email resend: %s", login_dto.email)
     if login_dto.email is None:
         raise HTTPException(status_code=404, detail="Please provide email")
     else:
+        await check_rate_limit("resend_verification_email", login_dto.email.lower())
         user_of_email = await get_user_by_email(db, login_dto.email)
         if user_of_email is None:
             raise HTTPException(status_code=400, detail="User not found")
         elif user_of_email.email_verified:
             raise HTTPException(status_code=403, detail="User already verified")
         else:
-            verification_code_from_user_id = await get_verification_code_by_user_id(db, user_of_email.user_id)
-            if verification_code_from_user_id is None:
-                raise HTTPException(status_code=404, detail="Verification code does not exist, please contact support")
+            verification_token = create_verification_token(user_of_email.user_id)
+            if verification_token is None:
+                raise HTTPException(status_code=500, detail="Unable to create verification token")
             else:
-                email_send = await send_verification_email(verification_code_from_user_id, login_dto.email)
+                email_send = await queue_verification_email(verification_token, login_dto.email)
                 if email_send:
                     return True
                 else:
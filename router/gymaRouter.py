@@ -5,27 +5,36 @@ from database import get_db
 from dto.exerciseDTO import ExerciseDTO
 from dto.gymaDTO import GymaDTO
 from provider.authProvider import get_auth_key
+from provider.liveProvider import publish_gyma_event
+from provider.presenceProvider import set_presence, remove_presence
 from service.exerciseService import add_exercise_db
 from session.sessionService import get_user_id_from_session_data, set_gyma_id_in_session, get_session_data, \
     delete_gyma_id_from_session
 from service.gymaService import add_gyma, set_time_of_leaving, get_gyma_by_gyma_id
+from service.locationService import get_location_by_location_id
 
 router = APIRouter(prefix="/api/v1/gyma", tags=["gyma"])
 
 
 @router.post("/start", response_model=GymaDTO, status_code=201)
-async def start_gyma(auth_token: str | None = Depends(get_auth_key),
+async def start_gyma(location_id: int | None = None,
+                     auth_token: str | None = Depends(get_auth_key),
                      db: AsyncSession = Depends(get_db)):
 
     user_id = await get_user_id_from_session_data(auth_token)
     if user_id is None:
         raise HTTPException(status_code=401, detail="Session invalid")
     else:
-        gyma = await add_gyma(db, user_id)
+        if location_id is not None and await get_location_by_location_id(db, location_id) is None:
+            raise HTTPException(status_code=404, detail="Location does not exist")
+
+        gyma = await add_gyma(db, user_id, location_id)
         if gyma is None:
             raise HTTPException(status_code=404, detail="Gyma cannot be added")
         else:
             if await set_gyma_id_in_session(auth_token, gyma.gyma_id):
+                await set_presence(user_id, gyma.time_of_arrival)
+                await publish_gyma_event(db, user_id, "start_gyma", gyma)
                 return gyma
             else:
                 return HTTPException(status_code=404, detail="Gyma cannot be set in session")
@@ -48,6 +57,8 @@ async def end_gyma(auth_token: str = Depends(get_auth_key),
                 raise HTTPException(status_code=500, detail="Failed to set time of_leave")
             else:
                 if await delete_gyma_id_from_session(auth_token):
+                    await remove_presence(session_data.user_id)
+                    await publish_gyma_event(db, session_data.user_id, "end_gyma", gyma)
                     return {"time_of_leaving": time_of_leaving}
                 else:
                     return HTTPException(status_code=500, detail="Gyma cannot be removed from session")
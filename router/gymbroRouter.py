@@ -1,36 +1,85 @@
+import asyncio
 import logging
-from typing import List
+from typing import List, Union
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response, Header, WebSocket, WebSocketDisconnect, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import get_db
 from dto.exerciseDTO import ExerciseDTO
-from dto.gymaDTO import GymaDTO
+from dto.gymaDTO import GymaDTO, CompactFeedDTO
 from dto.personDTO import PersonSimpleDTO
-from provider.authProvider import get_auth_key
-from provider.gymbroProvider import get_last_ten_gyma_entries_of_user_and_friends
-from service.personService import get_person_by_user_id
+from dto.presenceDTO import PresenceDTO
+from provider.authProvider import get_auth_key, decode_str
+from provider.etagProvider import make_weak_etag, etag_matches, not_modified, ETAG_HEADER
+from provider.feedProvider import build_compact_feed
+from provider.gymbroProvider import get_gymbro_ids, get_last_ten_gyma_entries_of_user_and_friends, \
+    has_gyma_entry_of_user_and_friends_after, get_latest_gyma_watermark_of_user_and_friends, \
+    GYMBRO_FEED_SIZE
+from provider.liveProvider import subscribe_live, unsubscribe_live
+from provider.presenceProvider import get_presence_of_users
+from provider.versionProvider import get_person_versions
+from provider.watermarkProvider import decode_watermark, set_watermark_header, WATERMARK_HEADER
+from service.friendshipService import get_accepted_friend_ids
+from service.personService import get_person_by_user_id, get_persons_by_user_ids
 from session.sessionService import get_user_id_from_session_data
 
 router = APIRouter(prefix="/api/v1/gymbro", tags=["gymbro"])
 
 
-@router.get("/", response_model=List[GymaDTO], status_code=200)
-async def get_gymbro_ten_latest(gyma_keys: str = None,
+@router.get("/", response_model=Union[List[GymaDTO], CompactFeedDTO], status_code=200)
+async def get_gymbro_ten_latest(response: Response,
+                                gyma_keys: str = None,
+                                since: str = None,
+                                compact: bool = False,
+                                if_none_match: str | None = Header(default=None),
                                 auth_token: str | None = Depends(get_auth_key),
                                 db: AsyncSession = Depends(get_db)):
-    logging.info(f"Searching for the latest ten gyma entries {'excluding: ' + gyma_keys if gyma_keys else ''}")
+    logging.debug("Searching for the latest ten gyma entries of gymbros")
 
     user_id = await get_user_id_from_session_data(auth_token)
     if user_id is None:
         raise HTTPException(status_code=401, detail="Session invalid")
     else:
-        gymbro_ten_latest_gyma = await get_last_ten_gyma_entries_of_user_and_friends(db, user_id, gyma_keys)
+        friend_ids = await get_gymbro_ids(db, user_id)
+
+        # friend changes and profile edits of friends bump the person version of user
+        person_versions = await get_person_versions(user_id)
+        if person_versions is not None:
+            etag = make_weak_etag("gymbro", user_id, person_versions[0],
+                                  await get_latest_gyma_watermark_of_user_and_friends(db, user_id, friend_ids),
+                                  gyma_keys, since, compact)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+            response.headers[ETAG_HEADER] = etag
+
+        watermark = None
+        if since is not None:
+            watermark = decode_watermark(since)
+            if watermark is None:
+                raise HTTPException(status_code=400, detail="Invalid since watermark")
+            if not await has_gyma_entry_of_user_and_friends_after(db, user_id, friend_ids, watermark):
+                headers = {WATERMARK_HEADER: since}
+                if ETAG_HEADER in response.headers:
+                    headers[ETAG_HEADER] = response.headers[ETAG_HEADER]
+                return Response(status_code=204, headers=headers)
+
+        gymbro_ten_latest_gyma = await get_last_ten_gyma_entries_of_user_and_friends(db, user_id, friend_ids,
+                                                                                      gyma_keys, watermark)
+        set_watermark_header(response, gymbro_ten_latest_gyma, watermark, GYMBRO_FEED_SIZE)
+
+        # the lookups are started together, so the persons missing from the person cache are loaded in one query
+        gyma_user_ids = list(dict.fromkeys(gyma.user_id for gyma in gymbro_ten_latest_gyma))
+        persons_by_user_id = dict(zip(gyma_user_ids, await asyncio.gather(
+            *(get_person_by_user_id(db, gyma_user_id) for gyma_user_id in gyma_user_ids)
+        )))
+
+        if compact:
+            return build_compact_feed(gymbro_ten_latest_gyma, persons_by_user_id)
 
         gymbro_gyma_with_exercises = []
         for gyma in gymbro_ten_latest_gyma:
-            person_of_gyma = await get_person_by_user_id(db, gyma.user_id)
+            person_of_gyma = persons_by_user_id[gyma.user_id]
 
             person_simple_dto = PersonSimpleDTO(
                 profile_url=person_of_gyma.profile_url,
@@ -65,3 +114,76 @@ async def get_gymbro_ten_latest(gyma_keys: str = None,
             gymbro_gyma_with_exercises.append(gyma_dto)
 
         return gymbro_gyma_with_exercises
+
+
+@router.get("/now", response_model=List[PresenceDTO], status_code=200)
+async def get_gymbros_training_now(auth_token: str | None = Depends(get_auth_key),
+                                   db: AsyncSession = Depends(get_db)):
+    user_id = await get_user_id_from_session_data(auth_token)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Session invalid")
+
+    friend_ids = await get_accepted_friend_ids(db, user_id)
+    presence_by_user_id = await get_presence_of_users(friend_ids)
+    training_friends = await get_persons_by_user_ids(db, list(presence_by_user_id))
+
+    return [
+        PresenceDTO(
+            person=PersonSimpleDTO(
+                profile_url=friend.profile_url,
+                first_name=friend.first_name,
+                last_name=friend.last_name,
+                sex=friend.sex,
+                pf_path_m=friend.pf_path_m,
+            ),
+            since=presence_by_user_id[friend.person_id],
+        )
+        for friend in sorted(training_friends, key=lambda friend: presence_by_user_id[friend.person_id])
+        if friend.gyma_share != "solo"
+    ]
+
+
+@router.websocket("/live")
+async def gymbro_live(websocket: WebSocket, token: str = None):
+    """ Push start_gyma and end_gyma events of accepted friends. Browsers cannot set the Authorization header
+    on a websocket, so the encoded session token can also be given as token query parameter. """
+    try:
+        auth_token = decode_str(websocket.headers.get("authorization") or token)
+    except Exception:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    user_id = await get_user_id_from_session_data(auth_token)
+    if user_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    queue = await subscribe_live(user_id)
+    if queue is None:
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+        return
+
+    await websocket.accept()
+    disconnected = asyncio.create_task(_wait_for_disconnect(websocket))
+    try:
+        while True:
+            next_event = asyncio.create_task(queue.get())
+            await asyncio.wait({next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                next_event.cancel()
+                break
+            await websocket.send_text(next_event.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        disconnected.cancel()
+        await unsubscribe_live(user_id, queue)
+
+
+async def _wait_for_disconnect(websocket: WebSocket) -> None:
+    """ Read and ignore client messages until the client disconnects. """
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        return
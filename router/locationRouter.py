@@ -0,0 +1,27 @@
+import logging
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db
+from dto.locationDTO import NearbyLocationDTO, BusyLocationDTO
+from provider.locationProvider import get_nearest_locations, get_busiest_locations
+
+router = APIRouter(prefix="/api/v1/location", tags=["location"])
+
+
+@router.get("/nearby", response_model=List[NearbyLocationDTO], status_code=200)
+async def get_nearby_locations(latitude: float = Query(..., ge=-90, le=90),
+                               longitude: float = Query(..., ge=-180, le=180),
+                               limit: int = Query(10, ge=1, le=50),
+                               max_distance_km: float | None = Query(None, gt=0)):
+    logging.info("Searching for nearby locations")
+    return get_nearest_locations(latitude, longitude, limit, max_distance_km)
+
+
+@router.get("/busy", response_model=List[BusyLocationDTO], status_code=200)
+async def get_busy_locations(limit: int = Query(10, ge=1, le=50),
+                             db: AsyncSession = Depends(get_db)):
+    logging.info("Searching for the busiest locations")
+    return await get_busiest_locations(db, limit)
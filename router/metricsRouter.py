@@ -0,0 +1,24 @@
+import os
+import secrets
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from monitoring.metricsPublisher import get_samples_of_workers, publish_metrics
+from monitoring.metricsService import render_metrics
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics(x_metrics_token: str | None = Header(default=None)):
+    if METRICS_TOKEN and not secrets.compare_digest(x_metrics_token or "", METRICS_TOKEN):
+        raise HTTPException(status_code=403, detail="Metrics token invalid")
+
+    # a scrape reaches one worker of the shared socket, it answers with the samples every worker published in Redis,
+    # labelled per worker, falling back to only its own samples when Redis is down
+    await publish_metrics()
+    samples_of_workers = await get_samples_of_workers()
+    return PlainTextResponse(render_metrics(samples_of_workers), media_type="text/plain; version=0.0.4")
@@ -1,5 +1,5 @@
 from typing import List
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Response, Header
 import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
@@ -7,20 +7,40 @@ from dto.exerciseDTO import ExerciseDTO
 
 from dto.gymaDTO import GymaDTO
 from provider.authProvider import get_auth_key
-from provider.mineProvider import get_last_three_gyma_entry_of_user
+from provider.etagProvider import make_weak_etag, etag_matches, not_modified, ETAG_HEADER
+from provider.mineProvider import get_last_three_gyma_entry_of_user, has_gyma_entry_of_user_after, \
+    get_latest_gyma_watermark_of_user, MINE_FEED_SIZE
+from provider.watermarkProvider import decode_watermark, set_watermark_header, WATERMARK_HEADER
 from session.sessionService import get_user_id_from_session_data
 
 router = APIRouter(prefix="/api/v1/mine", tags=["mine"])
 
 
 @router.get("/", status_code=200, response_model=List[GymaDTO])
-async def get_mine_three_latest(gyma_keys: str = None,
+async def get_mine_three_latest(response: Response,
+                                gyma_keys: str = None,
+                                since: str = None,
+                                if_none_match: str | None = Header(default=None),
                                 auth_token: str | None = Depends(get_auth_key),
                                 db: AsyncSession = Depends(get_db)):
-    logging.info(f"Searching for the latest three gyma entries {'excluding: ' + gyma_keys if gyma_keys else ''}")
+    logging.debug("Searching for the latest three gyma entries")
 
     user_id: int = await get_user_id_from_session_data(auth_token)
-    mine_three_latest_gyma = await get_last_three_gyma_entry_of_user(db, user_id, gyma_keys)
+
+    etag = make_weak_etag("mine", user_id, await get_latest_gyma_watermark_of_user(db, user_id), gyma_keys, since)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers[ETAG_HEADER] = etag
+
+    watermark = None
+    if since is not None:
+        watermark = decode_watermark(since)
+        if watermark is None:
+            raise HTTPException(status_code=400, detail="Invalid since watermark")
+        if not await has_gyma_entry_of_user_after(db, user_id, watermark):
+            return Response(status_code=204, headers={WATERMARK_HEADER: since, ETAG_HEADER: etag})
+
+    mine_three_latest_gyma = await get_last_three_gyma_entry_of_user(db, user_id, gyma_keys, watermark)
 
     mine_gyma_with_exercises = []
     for gyma in mine_three_latest_gyma:
@@ -49,4 +69,5 @@ async def get_mine_three_latest(gyma_keys: str = None,
 
         mine_gyma_with_exercises.append(gyma_dto)
 
+    set_watermark_header(response, mine_three_latest_gyma, watermark, MINE_FEED_SIZE)
     return mine_gyma_with_exercises
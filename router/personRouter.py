@@ -11,7 +11,8 @@ from dto.personDTO import PersonDTO, EnterPersonDTO
 from dto.profileDTO import MyProfileDTO
 from provider.authProvider import get_auth_key
 from provider.imageProvider import process_image, move_images_to_archive
-from service.personService import add_person, get_person_by_user_id, edit_person, set_pf_paths
+from provider.rateLimitProvider import check_rate_limit
+from service.personService import add_person, get_person_for_update, edit_person, set_pf_paths
 from session.sessionService import get_user_id_from_session_data
 
 router = APIRouter(prefix="/api/v1/person", tags=["person"])
@@ -28,7 +29,7 @@ async def add_or_edit_person(enter_person_dto: EnterPersonDTO,
     if user_id is None:
         raise HTTPException(status_code=401, detail="Session invalid")
     else:
-        person = await get_person_by_user_id(db, user_id)
+        person = await get_person_for_update(db, user_id)
         if person is None:
             logging.info("Creating person object for user")
             new_person = await add_person(db, user_id, enter_person_dto)
@@ -97,7 +98,9 @@ async def upload_picture(
     if user_id is None:
         raise HTTPException(status_code=401, detail="Session invalid")
 
-    person = await get_person_by_user_id(db, user_id)
+    await check_rate_limit("picture_user", user_id)
+
+    person = await get_person_for_update(db, user_id)
     if person is None:
         raise HTTPException(status_code=404, detail="Picture cannot be added if there is no person")
 
@@ -1,12 +1,16 @@
+import asyncio
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response, Header
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
+from database import get_db, gather_queries
 from dto.personDTO import PersonDTO, PersonSimpleDTO
 from dto.profileDTO import ProfileDTO
+from model.Friendship import Friendship
 from provider.authProvider import get_auth_key_or_none, get_auth_key
+from provider.etagProvider import make_weak_etag, etag_matches, not_modified, ETAG_HEADER
+from provider.versionProvider import get_person_versions
 from service.friendshipService import get_friends_by_person_id, get_friendship, add_friendship, remove_friendship, \
     get_friendship_of_requester, update_friendship_status
 from service.personService import get_person_by_profile_url, get_person_by_user_id
@@ -23,6 +27,8 @@ router = APIRouter(prefix="/api/v1/profile", tags=["profile"])
 
 @router.get("/{profile_url}", response_model=ProfileDTO, status_code=200)
 async def get_profile(profile_url: str,
+                      response: Response,
+                      if_none_match: str | None = Header(default=None),
                       auth_token: str | None = Depends(get_auth_key_or_none),
                       db: AsyncSession = Depends(get_db)):
     logging.info("Get profile: %s", profile_url)
@@ -32,31 +38,41 @@ async def get_profile(profile_url: str,
         raise HTTPException(status_code=404, detail="Profile does not exist")
 
     friendship_status = None
-    user_id = None
-
-    if auth_token is not None:
-        user_id_from_session = await get_user_id_from_session_data(auth_token)
-        if user_id_from_session is not None:
-            user_id = user_id_from_session
-
-            friendship = await get_friendship(db, user_id, person_by_profile_url.person_id)
-            if friendship is not None:
-                if friendship.status == "pending":
-                    if friendship.friend_id == user_id:
-                        friendship_status = "received"
-                    else:
-                        friendship_status = "pending"
-                else:
-                    friendship_status = friendship.status
-
-    if person_by_profile_url.gyma_share == "gymbros":
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Profile for friends")
-
-        if friendship_status != "accepted":
-            raise HTTPException(status_code=403, detail="Profile for friends")
-
-    friends = await get_friends_by_person_id(db, person_by_profile_url.person_id)
+    person_id = person_by_profile_url.person_id
+
+    async def get_user_id_of_viewer() -> int | None:
+        return await get_user_id_from_session_data(auth_token) if auth_token is not None else None
+
+    # edits of the person, its friends and friendship changes bump the person version
+    user_id, person_versions = await asyncio.gather(get_user_id_of_viewer(), get_person_versions(person_id))
+
+    if person_by_profile_url.gyma_share == "gymbros" and user_id is None:
+        raise HTTPException(status_code=401, detail="Profile for friends")
+
+    async def get_friendship_of_viewer(session: AsyncSession) -> Friendship | None:
+        return await get_friendship(session, user_id, person_id) if user_id is not None else None
+
+    # the friend list is loaded while the friendship of the viewer is checked
+    friendship, friends = await gather_queries(get_friendship_of_viewer,
+                                               lambda session: get_friends_by_person_id(session, person_id))
+    if friendship is not None:
+        if friendship.status == "pending":
+            if friendship.friend_id == user_id:
+                friendship_status = "received"
+            else:
+                friendship_status = "pending"
+        else:
+            friendship_status = friendship.status
+
+    if person_by_profile_url.gyma_share == "gymbros" and friendship_status != "accepted":
+        raise HTTPException(status_code=403, detail="Profile for friends")
+
+    # only checked once the viewer may see the profile, If-None-Match: * matches any ETag
+    if person_versions is not None:
+        etag = make_weak_etag("profile", person_id, person_versions[0], user_id)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        response.headers[ETAG_HEADER] = etag
 
     friend_list = [
         PersonSimpleDTO(
@@ -1,21 +1,43 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response, Header
 import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 from dto.exerciseDTO import ExerciseDTO
 
 from dto.gymaDTO import GymaDTO
-from provider.pubProvider import get_last_ten_gyma_entry
+from dto.presenceDTO import TrainingNowDTO
+from provider.etagProvider import make_weak_etag, etag_matches, not_modified, ETAG_HEADER
+from provider.presenceProvider import count_presence
+from provider.pubProvider import get_last_ten_gyma_entry, has_gyma_entry_after, get_latest_gyma_watermark, \
+    PUB_FEED_SIZE
+from provider.watermarkProvider import decode_watermark, set_watermark_header, WATERMARK_HEADER
 
 router = APIRouter(prefix="/api/v1/pub", tags=["pub"])
 
 
 @router.get("/", response_model=List[GymaDTO], status_code=200)
-async def get_pub_ten_latest(gyma_keys: str = None, db: AsyncSession = Depends(get_db)):
-    logging.info(f"Searching for the latest ten gyma entries {'excluding: ' + gyma_keys if gyma_keys else ''}")
+async def get_pub_ten_latest(response: Response,
+                             gyma_keys: str = None,
+                             since: str = None,
+                             if_none_match: str | None = Header(default=None),
+                             db: AsyncSession = Depends(get_db)):
+    logging.debug("Searching for the latest ten gyma entries")
 
-    pub_ten_latest_gyma = await get_last_ten_gyma_entry(db, gyma_keys)
+    etag = make_weak_etag("pub", await get_latest_gyma_watermark(db), gyma_keys, since)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers[ETAG_HEADER] = etag
+
+    watermark = None
+    if since is not None:
+        watermark = decode_watermark(since)
+        if watermark is None:
+            raise HTTPException(status_code=400, detail="Invalid since watermark")
+        if not await has_gyma_entry_after(db, watermark):
+            return Response(status_code=204, headers={WATERMARK_HEADER: since, ETAG_HEADER: etag})
+
+    pub_ten_latest_gyma = await get_last_ten_gyma_entry(db, gyma_keys, watermark)
     if not pub_ten_latest_gyma:
         raise HTTPException(status_code=404, detail="No gyma entries found")
 
@@ -45,4 +67,13 @@ async def get_pub_ten_latest(gyma_keys: str = None, db: AsyncSession = Depends(g
 
         pub_gyma_with_exercises.append(gyma_dto)
 
+    set_watermark_header(response, pub_ten_latest_gyma, watermark, PUB_FEED_SIZE)
     return pub_gyma_with_exercises
+
+
+@router.get("/now", response_model=TrainingNowDTO, status_code=200)
+async def get_training_now():
+    training_now = await count_presence()
+    if training_now is None:
+        raise HTTPException(status_code=503, detail="Presence is not available")
+    return TrainingNowDTO(training_now=training_now)
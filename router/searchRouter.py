@@ -0,0 +1,46 @@
+import logging
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db
+from dto.personDTO import PersonSimpleDTO
+from provider.authProvider import get_auth_key_or_none
+from provider.searchProvider import search_person_ids
+from service.friendshipService import get_blocked_person_ids
+from service.personService import get_persons_by_user_ids
+from session.sessionService import get_user_id_from_session_data
+
+router = APIRouter(prefix="/api/v1/search", tags=["search"])
+
+
+@router.get("/person", response_model=List[PersonSimpleDTO], status_code=200)
+async def search_person(q: str = Query(..., min_length=2, max_length=64),
+                        limit: int = Query(10, ge=1, le=25),
+                        auth_token: str | None = Depends(get_auth_key_or_none),
+                        db: AsyncSession = Depends(get_db)):
+    logging.info("Searching persons")
+
+    blocked_person_ids = set()
+    if auth_token is not None:
+        user_id = await get_user_id_from_session_data(auth_token)
+        if user_id is not None:
+            blocked_person_ids = await get_blocked_person_ids(db, user_id)
+
+    # enough candidates to fill the page when blocked persons are among the best matches
+    person_ids = await search_person_ids(q, limit + len(blocked_person_ids))
+    person_ids = [person_id for person_id in person_ids if person_id not in blocked_person_ids][:limit]
+
+    persons_by_id = {person.person_id: person for person in await get_persons_by_user_ids(db, person_ids)}
+    return [
+        PersonSimpleDTO(
+            profile_url=person.profile_url,
+            first_name=person.first_name,
+            last_name=person.last_name,
+            sex=person.sex,
+            pf_path_m=person.pf_path_m,
+        )
+        for person in (persons_by_id.get(person_id) for person_id in person_ids)
+        if person is not None and person.gyma_share != "solo"
+    ]
@@ -3,17 +3,18 @@ from database import get_db
 from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
-from mail.emailService import send_verification_email
+from mail.emailQueue import queue_verification_email
+from provider.authProvider import create_verification_token
+from provider.rateLimitProvider import rate_limit_by_ip
 from service.userService import add_user, email_available
 from dto.registerDTO import RegisterDTO
-from service.userVerificationService import add_user_verification, generate_verification_code
 
 router = APIRouter(prefix="/api/v1/user", tags=["user"])
 
 
-@router.post("/", status_code=201)
+@router.post("/", status_code=201, dependencies=[Depends(rate_limit_by_ip("register_ip"))])
 async def register(register_dto: RegisterDTO, db: AsyncSession = Depends(get_db)):
-    logging.info("Trying to registering user with email: " + register_dto.email)
+    logging.info("Trying to register user with email: %s", register_dto.email)
 
     if not await email_available(db, register_dto.email):
         raise HTTPException(status_code=400, detail="Email is not available")
@@ -22,12 +23,11 @@ async def register(register_dto: RegisterDTO, db: AsyncSession = Depends(get_db)
     if user is None:
         raise HTTPException(status_code=400, detail="Unable to create user")
     else:
-        verification_code = await generate_verification_code(db)
-        user_verification_added = await add_user_verification(db, user.user_id, verification_code)
-        if not user_verification_added:
-            raise HTTPException(status_code=400, detail="Unable to create user_verification")
+        verification_token = create_verification_token(user.user_id)
+        if verification_token is None:
+            raise HTTPException(status_code=500, detail="Unable to create verification token")
         else:
-            email_send = await send_verification_email(verification_code, "s1koldewijn@gmail.com")
+            email_send = await queue_verification_email(verification_token, "s1koldewijn@gmail.com")
             if email_send:
                 return True
             else:
@@ -0,0 +1,183 @@
+""" Production entry point, runs the app of main.py in SERVER_WORKERS uvicorn worker processes.
+
+    python -m server
+
+The listening socket is bound once by this supervisor process and shared by the workers. Every worker is a freshly
+spawned interpreter that imports main.py itself, so the engine, Redis and SMTP connections and the other module
+globals are created per worker, by the lifespan of the app. The supervisor does not import the app.
+
+A worker exits after handling SERVER_MAX_REQUESTS requests, plus a random jitter so they do not all recycle at
+once, and is replaced by a new one, which caps the memory a long running worker can grow to. On SIGTERM or SIGINT
+the workers stop accepting connections, finish the requests in progress for at most
+SERVER_GRACEFUL_SHUTDOWN_SECONDS, and close their pools in the lifespan shutdown.
+
+A worker that exits within WORKER_FAST_FAILURE_SECONDS of starting, such as one that fails to import the app, is
+restarted after a delay that doubles with every fast failure in a row. After SERVER_MAX_FAST_FAILURES in a row the
+supervisor stops the other workers and exits with an error, so the service manager sees the failure.
+
+Metrics are kept per worker process. Every worker publishes its samples to Redis, and GET /metrics, answered by
+whichever worker the scrape reaches, returns the samples of all live workers with a worker label of host and pid.
+Sum over the worker label to get the totals of the server; a recycled worker starts new series.
+"""
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from multiprocessing.context import SpawnProcess
+
+import uvicorn
+
+import environment  # noqa: F401
+from monitoring.loggingService import setup_logging
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1)))
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+SERVER_KEEP_ALIVE_SECONDS = int(os.getenv("SERVER_KEEP_ALIVE_SECONDS", "5"))
+SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", "10000"))  # 0 never recycles workers
+SERVER_MAX_REQUESTS_JITTER = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", "1000"))
+SERVER_GRACEFUL_SHUTDOWN_SECONDS = int(os.getenv("SERVER_GRACEFUL_SHUTDOWN_SECONDS", "30"))
+# addresses of the reverse proxies whose X-Forwarded-For is trusted as client address, used by the rate limits
+SERVER_FORWARDED_ALLOW_IPS = os.getenv("SERVER_FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+SERVER_MAX_FAST_FAILURES = int(os.getenv("SERVER_MAX_FAST_FAILURES", "5"))
+
+WORKER_CHECK_INTERVAL_SECONDS = 1.0
+WORKER_FAST_FAILURE_SECONDS = 10.0
+WORKER_MAX_RESTART_DELAY_SECONDS = 30.0
+
+# workers are fresh interpreters on every platform, they never inherit the state of the supervisor
+_spawn_context = multiprocessing.get_context("spawn")
+
+
+def build_config(limit_max_requests: int | None = None) -> uvicorn.Config:
+    """ Uvicorn configuration of a worker, on uvloop and httptools. """
+    return uvicorn.Config(
+        "main:app",
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        loop="uvloop",
+        http="httptools",
+        lifespan="on",
+        backlog=SERVER_BACKLOG,
+        timeout_keep_alive=SERVER_KEEP_ALIVE_SECONDS,
+        limit_max_requests=limit_max_requests,
+        timeout_graceful_shutdown=SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        proxy_headers=True,
+        forwarded_allow_ips=SERVER_FORWARDED_ALLOW_IPS,
+        # the app logs through its own queue handler, and request metrics replace the access log
+        log_config=None,
+        access_log=False,
+    )
+
+
+def restart_delay(fast_failures: int) -> float:
+    """ Seconds to wait before restarting a worker that failed fast fast_failures times in a row. """
+    if fast_failures <= 0:
+        return 0.0
+    return min(WORKER_CHECK_INTERVAL_SECONDS * 2 ** (fast_failures - 1), WORKER_MAX_RESTART_DELAY_SECONDS)
+
+
+def run_worker(config: uvicorn.Config, sockets: list) -> None:
+    """ Entry point of a worker process, serves the app on the sockets bound by the supervisor. """
+    config.configure_logging()
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+def max_requests_of_worker() -> int | None:
+    """ Requests after which a new worker exits, None when workers are not recycled. """
+    if SERVER_MAX_REQUESTS <= 0:
+        return None
+    return SERVER_MAX_REQUESTS + random.randint(0, SERVER_MAX_REQUESTS_JITTER)
+
+
+class WorkerSupervisor:
+    """ Keep worker processes running on a shared socket, replacing the ones that exit. """
+
+    def __init__(self, workers: int = SERVER_WORKERS):
+        self.workers = workers
+        self.processes: list[SpawnProcess | None] = []
+        self.started_at: list[float] = []
+        self.fast_failures: list[int] = []
+        self.restart_at: list[float] = []
+        self.should_exit = threading.Event()
+        self.failed = False
+
+    def start_worker(self, sockets: list) -> SpawnProcess:
+        config = build_config(max_requests_of_worker())
+        process = _spawn_context.Process(target=run_worker, args=(config, sockets))
+        process.start()
+        logging.info(f"Started worker {process.pid}")
+        return process
+
+    def run(self) -> None:
+        sockets = [build_config().bind_socket()]
+        for stop_signal in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(stop_signal, lambda *_: self.should_exit.set())
+
+        logging.info(f"Listening on {SERVER_HOST}:{SERVER_PORT} with {self.workers} workers")
+        self.processes = [self.start_worker(sockets) for _ in range(self.workers)]
+        self.started_at = [time.monotonic()] * self.workers
+        self.fast_failures = [0] * self.workers
+        self.restart_at = [0.0] * self.workers
+        while not self.should_exit.wait(WORKER_CHECK_INTERVAL_SECONDS):
+            for index in range(self.workers):
+                self.check_worker(index, sockets)
+
+        self.shutdown()
+        for sock in sockets:
+            sock.close()
+        if self.failed:
+            sys.exit(1)
+
+    def check_worker(self, index: int, sockets: list) -> None:
+        """ Replace the worker of index when it exited, after the backoff of its fast failures. """
+        process = self.processes[index]
+        now = time.monotonic()
+        if process is not None:
+            if process.is_alive() or self.should_exit.is_set():
+                return
+            process.join()
+            self.processes[index] = None
+            if now - self.started_at[index] < WORKER_FAST_FAILURE_SECONDS:
+                self.fast_failures[index] += 1
+            else:
+                self.fast_failures[index] = 0
+            if self.fast_failures[index] >= SERVER_MAX_FAST_FAILURES:
+                logging.error(f"Worker {process.pid} exited with code {process.exitcode}, "
+                              f"{self.fast_failures[index]} fast failures in a row, stopping the server")
+                self.failed = True
+                self.should_exit.set()
+                return
+            delay = restart_delay(self.fast_failures[index])
+            logging.info(f"Worker {process.pid} exited with code {process.exitcode}, "
+                         f"starting a new one in {delay:.0f}s")
+            self.restart_at[index] = now + delay
+
+        if now >= self.restart_at[index] and not self.should_exit.is_set():
+            self.processes[index] = self.start_worker(sockets)
+            self.started_at[index] = now
+
+    def shutdown(self) -> None:
+        """ Let the workers drain their connections and close their pools, killing the ones that do not stop. """
+        processes = [process for process in self.processes if process is not None]
+        for process in processes:
+            process.terminate()
+        deadline = time.monotonic() + SERVER_GRACEFUL_SHUTDOWN_SECONDS + 10
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logging.error(f"Worker {process.pid} did not stop in time, killing it")
+                process.kill()
+                process.join()
+        logging.info("Stopped all workers")
+
+
+if __name__ == "__main__":
+    setup_logging()
+    WorkerSupervisor().run()
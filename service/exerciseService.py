@@ -11,8 +11,10 @@ from database import get_db
 from dto.exerciseDTO import ExerciseDTO
 from model.Exercise import Exercise
 from model.GymaExercise import GymaExercise
+from monitoring.tracingService import traced
 
 
+@traced
 async def get_exercise_by_exercise_id(db: AsyncSession, exercise_id: int) -> Exercise | None:
     """ Get Exercise object by exercise id from database. """
     try:
@@ -23,6 +25,7 @@ async def get_exercise_by_exercise_id(db: AsyncSession, exercise_id: int) -> Exe
         return None
 
 
+@traced
 async def get_exercises_by_gyma_id(db: AsyncSession, gyma_id: int) -> List[Exercise] | None:
     """ Get list of Exercise objects by gyma id from database. """
     try:
@@ -33,6 +36,7 @@ async def get_exercises_by_gyma_id(db: AsyncSession, gyma_id: int) -> List[Exerc
         return None
 
 
+@traced
 async def add_exercise_db(db: AsyncSession, gyma_id: int, exercise_dto: ExerciseDTO) -> bool:
     """ Add a new exercise to a Gyma and create a record in GymaExercise table. """
     try:
@@ -1,14 +1,19 @@
 import logging
 from datetime import date
 
-from sqlalchemy import select, or_, and_
+from sqlalchemy import select, or_, and_, func, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import aliased
 
 from model.Friendship import Friendship
 from model.Person import Person
+from model.User import User
+from provider.batchLoaderProvider import get_batch_loader
+from provider.versionProvider import bump_person_version
+from monitoring.tracingService import traced
 
 
+@traced
 async def get_friends_by_person_id(db: AsyncSession, person_id: int) -> list[Person]:
     """ Get all accepted friends for a given person by their person_id. """
     result = await db.execute(
@@ -20,11 +25,35 @@ async def get_friends_by_person_id(db: AsyncSession, person_id: int) -> list[Per
                 ),
                 Person.person_id != person_id
             )
-        ).options(joinedload(Person.friends)).distinct()
+        ).distinct()
     )
-    return list(result.scalars().unique().all())
+    return list(result.scalars().all())
 
 
+@traced
+async def get_friends_and_pending_requesters(db: AsyncSession, person_id: int) -> tuple[list[Person], list[Person]]:
+    """ Get accepted friends and persons with a pending request to person_id in a single query. """
+    result = await db.execute(
+        select(Person, Friendship.status).join(
+            Friendship,
+            or_(
+                and_(Friendship.person_id == person_id, Friendship.friend_id == Person.person_id),
+                and_(Friendship.friend_id == person_id, Friendship.person_id == Person.person_id)
+            )
+        ).where(
+            or_(
+                Friendship.status == "accepted",
+                and_(Friendship.status == "pending", Friendship.friend_id == person_id)
+            )
+        )
+    )
+    friends, pending_requesters = [], []
+    for person, status in result.all():
+        (friends if status == "accepted" else pending_requesters).append(person)
+    return friends, pending_requesters
+
+
+@traced
 async def get_friendship(db: AsyncSession, person_id: int, friend_id: int) -> Friendship | None:
     """ Get friendship connection. """
     try:
@@ -32,22 +61,32 @@ async def get_friendship(db: AsyncSession, person_id: int, friend_id: int) -> Fr
             logging.error("Cannot have friendship connection with oneself")
             return None
 
-        logging.info(f"Getting friendship for {person_id} and {friend_id}")
-        result = await db.execute(
-            select(Friendship).where(
-                or_(
-                    and_(Friendship.person_id == person_id, Friendship.friend_id == friend_id),
-                    and_(Friendship.person_id == friend_id, Friendship.friend_id == person_id)
-                )
-            )
-        )
-        friendship = result.scalar_one_or_none()
-        return friendship
+        logging.debug("Getting friendship for %s and %s", person_id, friend_id)
+        # lookups of the same request started in the same iteration of the event loop are loaded in one query
+        friendship_loader = get_batch_loader(db, "friendship", lambda pairs: get_friendships_of_pairs(db, pairs))
+        return await friendship_loader.load((min(person_id, friend_id), max(person_id, friend_id)))
     except Exception as e:
         logging.error(f"Failed to get friendship: {e}")
         return None
 
 
+@traced
+async def get_friendships_of_pairs(db: AsyncSession, pairs: list[tuple[int, int]]) -> dict[tuple[int, int], Friendship]:
+    """ Get the friendships of multiple pairs of persons in one query, by (lowest person_id, highest person_id). """
+    result = await db.execute(
+        select(Friendship).where(
+            tuple_(Friendship.person_id, Friendship.friend_id).in_(
+                [*pairs, *((friend_id, person_id) for person_id, friend_id in pairs)]
+            )
+        )
+    )
+    return {
+        (min(friendship.person_id, friendship.friend_id), max(friendship.person_id, friendship.friend_id)): friendship
+        for friendship in result.scalars().all()
+    }
+
+
+@traced
 async def get_friendship_of_requester(db: AsyncSession, person_id: int, friend_id: int) -> Friendship | None:
     """ Get friendship object; person_id is the requesting party, friend_id is the receiving party. """
     try:
@@ -63,6 +102,7 @@ async def get_friendship_of_requester(db: AsyncSession, person_id: int, friend_i
         return None
 
 
+@traced
 async def add_friendship(db: AsyncSession, person_id: int, friend_id: int) -> bool:
     """ Add a new friendship. """
     try:
@@ -75,6 +115,7 @@ async def add_friendship(db: AsyncSession, person_id: int, friend_id: int) -> bo
         db.add(new_friendship)
         await db.commit()
         await db.refresh(new_friendship)
+        await bump_person_version(person_id, friend_id)
         return True
     except Exception as e:
         await db.rollback()
@@ -82,11 +123,15 @@ async def add_friendship(db: AsyncSession, person_id: int, friend_id: int) -> bo
         return False
 
 
+@traced
 async def update_friendship_status(db: AsyncSession, friendship: Friendship, status: str) -> bool:
     """ Update the status of a friendship. """
     try:
+        # the attributes expire on commit and cannot be lazy loaded on an AsyncSession
+        person_ids = (friendship.person_id, friendship.friend_id)
         friendship.status = status
         await db.commit()
+        await bump_person_version(*person_ids)
         return True
     except Exception as e:
         await db.rollback()
@@ -94,11 +139,14 @@ async def update_friendship_status(db: AsyncSession, friendship: Friendship, sta
         return False
 
 
+@traced
 async def remove_friendship(db: AsyncSession, friendship: Friendship) -> bool:
     """ Remove a friendship. """
     try:
+        person_ids = (friendship.person_id, friendship.friend_id)
         await db.delete(friendship)
         await db.commit()
+        await bump_person_version(*person_ids)
         return True
     except Exception as e:
         await db.rollback()
@@ -106,27 +154,69 @@ async def remove_friendship(db: AsyncSession, friendship: Friendship) -> bool:
         return False
 
 
-async def get_pending_friendships_to_be_accepted(db: AsyncSession, person_id: int) -> list[Person]:
-    """ Get all persons who have sent pending friendship requests to the given person. """
+@traced
+async def get_connected_person_ids(db: AsyncSession, person_id: int) -> list[int]:
+    """ Get the ids of all persons with a friendship connection to person_id, in either direction and any status. """
     result = await db.execute(
-        select(Person).join(Friendship, Friendship.person_id == Person.person_id).where(
+        select(Friendship.person_id, Friendship.friend_id).where(
+            or_(Friendship.person_id == person_id, Friendship.friend_id == person_id)
+        )
+    )
+    return [friend_id if requester_id == person_id else requester_id for requester_id, friend_id in result.all()]
+
+
+@traced
+async def get_accepted_friend_ids(db: AsyncSession, person_id: int) -> list[int]:
+    """ Get the ids of all accepted friends of person_id, without loading the Person objects. """
+    result = await db.execute(
+        select(Friendship.person_id, Friendship.friend_id).where(
             and_(
-                Friendship.friend_id == person_id,
-                Friendship.status == 'pending'
+                or_(Friendship.person_id == person_id, Friendship.friend_id == person_id),
+                Friendship.status == "accepted"
             )
-        ).options(joinedload(Person.friends)).distinct()
+        )
     )
-    return list(result.scalars().unique().all())
+    return [friend_id if requester_id == person_id else requester_id for requester_id, friend_id in result.all()]
+
+
+@traced
+async def get_blocked_person_ids(db: AsyncSession, person_id: int) -> set[int]:
+    """ Get the ids of persons person_id blocked or is blocked by. """
+    result = await db.execute(
+        select(Friendship.person_id, Friendship.friend_id).where(
+            and_(
+                or_(Friendship.person_id == person_id, Friendship.friend_id == person_id),
+                Friendship.status == "blocked"
+            )
+        )
+    )
+    return {friend_id if requester_id == person_id else requester_id for requester_id, friend_id in result.all()}
+
+
+@traced
+async def get_last_friendship_id(db: AsyncSession) -> int:
+    """ Get the highest friendship id, 0 when there are no friendships. """
+    result = await db.execute(select(func.max(Friendship.id)))
+    return result.scalar() or 0
 
 
-async def get_blocked_friendships(db: AsyncSession, person_id: int) -> list[Person]:
-    """ Get all persons blocked by person_id. """
+@traced
+async def get_pending_friend_requests_after(db: AsyncSession, friendship_id: int,
+                                            limit: int) -> list[tuple[int, str, str, Person]]:
+    """ Get pending friend requests to verified users with an id above friendship_id, in id order,
+    as (friendship id, recipient email, recipient first name, requester). """
+    recipient = aliased(Person)
     result = await db.execute(
-        select(Person).join(Friendship).where(
+        select(Friendship.id, User.email, recipient.first_name, Person).select_from(Friendship)
+        .join(Person, Person.person_id == Friendship.person_id)
+        .join(recipient, recipient.person_id == Friendship.friend_id)
+        .join(User, User.user_id == Friendship.friend_id)
+        .where(
             and_(
-                Friendship.person_id == person_id,
-                Friendship.status == 'blocked'
+                Friendship.id > friendship_id,
+                Friendship.status == "pending",
+                User.email_verified.is_(True)
             )
-        ).options(joinedload(Person.friends)).distinct()
+        ).order_by(Friendship.id).limit(limit)
     )
-    return list(result.scalars().unique().all())
+    return [tuple(row) for row in result.all()]
@@ -8,8 +8,10 @@ from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from model.Gyma import Gyma
+from monitoring.tracingService import traced
 
 
+@traced
 async def get_gyma_by_gyma_id(db: AsyncSession, gyma_id: int) -> Gyma | None:
     """ Get Gyma object by gyma id from database. """
     try:
@@ -20,15 +22,17 @@ async def get_gyma_by_gyma_id(db: AsyncSession, gyma_id: int) -> Gyma | None:
         return None
 
 
-async def add_gyma(db: AsyncSession, user_id: int | None) -> Gyma | None:
-    """ Add new Gyma to database. """
+@traced
+async def add_gyma(db: AsyncSession, user_id: int | None, location_id: int | None = None) -> Gyma | None:
+    """ Add new Gyma to database, optionally at a location. """
     if user_id is None:
         raise Exception("Gyma requires a person_id")
 
     try:
         new_gyma = Gyma(
             user_id=user_id,
-            time_of_arrival=datetime.now()
+            time_of_arrival=datetime.now(),
+            location_id=location_id
         )
         db.add(new_gyma)
         await db.commit()
@@ -39,6 +43,7 @@ async def add_gyma(db: AsyncSession, user_id: int | None) -> Gyma | None:
         return None
 
 
+@traced
 async def set_time_of_leaving(db: AsyncSession, user_id: int, gyma: Gyma) -> Optional[datetime]:
     """ Time of leaving the gyma. """
     try:
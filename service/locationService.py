@@ -0,0 +1,28 @@
+from sqlalchemy import select
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from model.Location import Location
+from monitoring.tracingService import traced
+
+
+@traced
+async def get_location_by_location_id(db: AsyncSession, location_id: int) -> Location | None:
+    """ Get Location object by location id from database. """
+    try:
+        result = await db.execute(select(Location).filter_by(location_id=location_id))
+        location = result.scalar_one()
+        return location
+    except NoResultFound:
+        return None
+
+
+@traced
+async def get_locations_with_coordinates(db: AsyncSession) -> list[Location]:
+    """ Get all Location objects with coordinates. """
+    result = await db.execute(
+        select(Location)
+        .where(Location.latitude.isnot(None), Location.longitude.isnot(None))
+        .order_by(Location.location_id)
+    )
+    return list(result.scalars().all())
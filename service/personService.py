@@ -1,15 +1,37 @@
 import logging
 
 from sqlalchemy import select
-from sqlalchemy.exc import NoResultFound
+from sqlalchemy.exc import NoResultFound, IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from dto.personDTO import EnterPersonDTO
 from model.Person import Person
-
-
-async def get_person_by_user_id(db: AsyncSession, user_id: int) -> Person | None:
-    """ Get Person object by user id. """
+from provider.batchLoaderProvider import get_batch_loader
+from provider.personCacheProvider import PersonSnapshot, get_person_snapshots, invalidate_person
+from provider.searchProvider import index_person
+from provider.versionProvider import bump_person_version
+from service.friendshipService import get_connected_person_ids
+from monitoring.tracingService import traced
+
+PROFILE_URL_MAX_LENGTH = 32
+PROFILE_URL_MAX_COUNT_DIGITS = 6
+PROFILE_URL_ALLOCATION_ATTEMPTS = 3
+
+
+@traced
+async def get_person_by_user_id(db: AsyncSession, user_id: int) -> PersonSnapshot | None:
+    """ Get a read-only snapshot of the Person of user id, through the person cache. Lookups of the same request
+    started in the same iteration of the event loop are loaded in one query. """
+    person_loader = get_batch_loader(
+        db, "person_by_user_id",
+        lambda user_ids: get_person_snapshots(user_ids, lambda missing_ids: get_persons_by_user_ids(db, missing_ids))
+    )
+    return await person_loader.load(user_id)
+
+
+@traced
+async def get_person_for_update(db: AsyncSession, user_id: int) -> Person | None:
+    """ Get Person object by user id from the database, for changing it. """
     try:
         result = await db.execute(select(Person).filter_by(person_id=user_id))
         person = result.scalar_one()
@@ -18,47 +40,71 @@ async def get_person_by_user_id(db: AsyncSession, user_id: int) -> Person | None
         return None
 
 
-async def get_person_by_profile_url(db: AsyncSession, profile_url: str) -> Person | None:
-    """ Get Person object by profile url. """
-    try:
-        result = await db.execute(select(Person).filter_by(profile_url=profile_url))
-        person = result.scalar_one()
-        return person
-    except NoResultFound:
-        return None
+@traced
+async def get_persons_by_user_ids(db: AsyncSession, user_ids: list[int]) -> list[Person]:
+    """ Get Person objects of multiple user ids in one query. """
+    if not user_ids:
+        return []
+    result = await db.execute(select(Person).where(Person.person_id.in_(user_ids)))
+    return list(result.scalars().all())
+
+
+@traced
+async def get_person_by_profile_url(db: AsyncSession, profile_url: str) -> PersonSnapshot | None:
+    """ Get a read-only snapshot of the Person with profile url, through the person cache. Lookups of the same
+    request started in the same iteration of the event loop are loaded in one query. """
+    async def load_persons(profile_urls: list[str]) -> list[Person]:
+        result = await db.execute(select(Person).where(Person.profile_url.in_(profile_urls)))
+        return list(result.scalars().all())
+
+    person_loader = get_batch_loader(db, "person_by_profile_url",
+                                     lambda profile_urls: get_person_snapshots(profile_urls, load_persons))
+    return await person_loader.load(profile_url)
 
 
+@traced
 async def add_person(db: AsyncSession, user_id: int, enter_person_dto: EnterPersonDTO) -> Person | None:
-    """ Add personal information of a user. """
+    """ Add personal information of a user. When a concurrent registration took the same profile url,
+    the unique constraint fails and a new profile url is allocated, at most PROFILE_URL_ALLOCATION_ATTEMPTS times. """
     if user_id is None:
         return None
 
-    try:
-        unique_profile_url_fullname = await generate_unique_profile_url(db,
-                                                                        enter_person_dto.first_name,
-                                                                        enter_person_dto.last_name)
-
-        new_person = Person(
-            person_id=user_id,
-            profile_url=unique_profile_url_fullname,
-            first_name=enter_person_dto.first_name,
-            last_name=enter_person_dto.last_name,
-            date_of_birth=enter_person_dto.date_of_birth,
-            sex=enter_person_dto.sex,
-            city=enter_person_dto.city,
-            profile_text=enter_person_dto.profile_text,
-            # gyma_share=person_dto.gyma_share,
-        )
-        db.add(new_person)
-        await db.commit()
-        await db.refresh(new_person)
-        return new_person
-    except Exception as e:
-        await db.rollback()
-        logging.error(e)
-        return None
-
-
+    for attempt in range(1, PROFILE_URL_ALLOCATION_ATTEMPTS + 1):
+        try:
+            unique_profile_url_fullname = await generate_unique_profile_url(db,
+                                                                            enter_person_dto.first_name,
+                                                                            enter_person_dto.last_name)
+
+            new_person = Person(
+                person_id=user_id,
+                profile_url=unique_profile_url_fullname,
+                first_name=enter_person_dto.first_name,
+                last_name=enter_person_dto.last_name,
+                date_of_birth=enter_person_dto.date_of_birth,
+                sex=enter_person_dto.sex,
+                city=enter_person_dto.city,
+                profile_text=enter_person_dto.profile_text,
+                # gyma_share=person_dto.gyma_share,
+            )
+            db.add(new_person)
+            await db.commit()
+            await db.refresh(new_person)
+            await invalidate_person(new_person.person_id, new_person.profile_url)
+            await index_person(new_person)
+            return new_person
+        except IntegrityError as e:
+            await db.rollback()
+            logging.warning(f"Failed to add person (attempt {attempt}): {e}")
+        except Exception as e:
+            await db.rollback()
+            logging.error(e)
+            return None
+
+    logging.error(f"Unable to allocate a unique profile url after {PROFILE_URL_ALLOCATION_ATTEMPTS} attempts")
+    return None
+
+
+@traced
 async def edit_person(db: AsyncSession, user_id: int, person: Person, enter_person_dto: EnterPersonDTO) -> Person | None:
     """ Edit personal information of a user. """
     if user_id is None:
@@ -74,6 +120,9 @@ async def edit_person(db: AsyncSession, user_id: int, person: Person, enter_pers
 
         await db.commit()
         await db.refresh(person)
+        await invalidate_person(person.person_id, person.profile_url)
+        await index_person(person)
+        await bump_person_version(person.person_id, *await get_connected_person_ids(db, person.person_id))
         return person
     except Exception as e:
         await db.rollback()
@@ -81,6 +130,7 @@ async def edit_person(db: AsyncSession, user_id: int, person: Person, enter_pers
         return None
 
 
+@traced
 async def set_pf_paths(db: AsyncSession, person: Person, pf_path_l: str, pf_path_m: str) -> Person | None:
     """ Set or replace pf_path_l and pf_path_m of person object. """
     try:
@@ -89,6 +139,8 @@ async def set_pf_paths(db: AsyncSession, person: Person, pf_path_l: str, pf_path
 
         await db.commit()
         await db.refresh(person)
+        await invalidate_person(person.person_id, person.profile_url)
+        await bump_person_version(person.person_id, *await get_connected_person_ids(db, person.person_id))
         return person
     except Exception as e:
         await db.rollback()
@@ -96,25 +148,38 @@ async def set_pf_paths(db: AsyncSession, person: Person, pf_path_l: str, pf_path
         return None
 
 
+@traced
 async def generate_unique_profile_url(db: AsyncSession, first_name: str, last_name: str) -> str:
-    """Generate a unique profile URL based on full name, by adding a count to it."""
+    """Generate a unique profile URL based on full name, by adding a count to it.
+    All taken profile urls sharing the prefix are fetched in one indexed query, the count is picked in memory."""
     base_profile_url = f"{first_name.lower()}{last_name.lower()}"
-    max_chars = 32
-    max_base_length = max_chars - len(str(max_chars))
+    max_base_length = PROFILE_URL_MAX_LENGTH - len(str(PROFILE_URL_MAX_LENGTH))
     base_profile_url = base_profile_url[:max_base_length]
 
+    # every candidate starts with this prefix, also when the base is shortened to fit a long count
+    prefix = base_profile_url[:PROFILE_URL_MAX_LENGTH - PROFILE_URL_MAX_COUNT_DIGITS]
+    escaped_prefix = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    result = await db.execute(
+        select(Person.profile_url).where(Person.profile_url.like(f"{escaped_prefix}%", escape="\\"))
+    )
+    taken_profile_urls = set(result.scalars().all())
+
+    return next_free_profile_url(base_profile_url, taken_profile_urls)
+
+
+def next_free_profile_url(base_profile_url: str, taken_profile_urls: set[str]) -> str:
+    """Get the first of base_profile_url, base_profile_url1, base_profile_url2, ... that is not taken,
+    the base is shortened when base and count do not fit in PROFILE_URL_MAX_LENGTH."""
     profile_url = base_profile_url
     count = 1
-    while True:
-        if await check_profile_url_available(db, profile_url):
-            return profile_url
+    while profile_url in taken_profile_urls:
         count_str = str(count)
-        max_count_length = max_chars - len(base_profile_url)
-        count_str = count_str[:max_count_length]
-        profile_url = f"{base_profile_url}{count_str}"
+        profile_url = f"{base_profile_url[:PROFILE_URL_MAX_LENGTH - len(count_str)]}{count_str}"
         count += 1
+    return profile_url
 
 
+@traced
 async def check_profile_url_available(db: AsyncSession, profile_url: str) -> bool:
     """Check if profile url is available."""
     try:
@@ -2,15 +2,19 @@ from sqlalchemy import select
 from sqlalchemy.exc import NoResultFound
 
 from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
 import bcrypt
 import logging
+from model.Person import Person
 from model.User import User
+from monitoring.tracingService import traced
 
 
+@traced
 async def add_user(db: AsyncSession, email: str, password: str) -> User | None:
     """ Registers a new user to database. """
     try:
-        salt, hashed_password = password_hasher(password)
+        salt, hashed_password = await asyncio.to_thread(password_hasher, password)
 
         new_user = User(
             email=email,
@@ -28,6 +32,7 @@ async def add_user(db: AsyncSession, email: str, password: str) -> User | None:
         return None
 
 
+@traced
 async def get_user_by_user_id(db: AsyncSession, user_id: int) -> User | None:
     """ Get User object by user id from database. """
     try:
@@ -38,6 +43,7 @@ async def get_user_by_user_id(db: AsyncSession, user_id: int) -> User | None:
         return None
 
 
+@traced
 async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
     """ Get User object by email from database. """
     try:
@@ -48,6 +54,19 @@ async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
         return None
 
 
+@traced
+async def get_user_and_person_by_email(db: AsyncSession, email: str) -> tuple[User, Person | None] | None:
+    """ Get User object by email together with its Person, if there is one, in a single query. """
+    result = await db.execute(
+        select(User, Person).outerjoin(Person, Person.person_id == User.user_id).where(User.email == email)
+    )
+    user_and_person = result.first()
+    if user_and_person is None:
+        return None
+    return user_and_person[0], user_and_person[1]
+
+
+@traced
 async def email_available(db: AsyncSession, email: str) -> bool:
     """ Check if email is already registered. """
     result = await db.execute(select(User).filter_by(email=email))
@@ -63,6 +82,7 @@ def password_hasher(password_plain: str) -> (bytes, bytes):
     return salt, hashed_password
 
 
+@traced
 async def set_email_verification(db: AsyncSession, user: User, verified: bool = True) -> bool:
     """ Change the value of email_verification, a user needs to be email verified to be able to log in. """
     try:
@@ -1,15 +1,16 @@
 import logging
 import string
 import random
-import aioredis
+import redis.asyncio as redis
 import pydantic
 import os
 
-from aioredis import RedisError
-from dotenv import load_dotenv
+from redis.exceptions import RedisError
+import environment  # noqa: F401
+from monitoring.metricsService import instrument_redis
+from monitoring.tracingService import trace_redis, traced
 from session.sessionDataObject import SessionDataObject
 
-load_dotenv()
 
 expire_time_default = int(os.getenv("SESSION_EXPIRE_TIME_SECONDS"))
 expire_time_trust_device = int(os.getenv("SESSION_EXPIRE_TIME_SECONDS_TRUST_DEVICE"))
@@ -27,15 +28,17 @@ async def create_redis_connection():
 
         try:
             if redis_password:
-                _redis_connection = await aioredis.from_url(
+                _redis_connection = await redis.from_url(
                     f"redis://:{redis_password}@{redis_host}:{redis_port}/{redis_db}",
                     decode_responses=True
                 )
             else:
-                _redis_connection = await aioredis.from_url(
+                _redis_connection = await redis.from_url(
                     f"redis://{redis_host}:{redis_port}/{redis_db}",
                     decode_responses=True
                 )
+            instrument_redis(_redis_connection)
+            trace_redis(_redis_connection)
         except RedisError as e:
             logging.error(f"Error connecting to Redis: {e}")
             return None
@@ -46,6 +49,20 @@ async def create_redis_connection():
     return _redis_connection
 
 
+async def close_redis_connection() -> None:
+    """ Close the cached Redis connection and its pool, called when the app shuts down. """
+    global _redis_connection
+    if _redis_connection is None:
+        return
+    try:
+        await _redis_connection.close()
+        await _redis_connection.connection_pool.disconnect()
+    except Exception as e:
+        logging.error(f"Other Exception while close_redis_connection: {e}")
+    _redis_connection = None
+
+
+@traced
 async def get_session_data(key: str) -> SessionDataObject | None:
     """ Retrieve the session data as a SessionDataObject from Redis. """
     try:
@@ -77,6 +94,7 @@ async def get_session_data(key: str) -> SessionDataObject | None:
         return None
 
 
+@traced
 async def get_user_id_from_session_data(key: str) -> int | None:
     try:
         session_data_object: SessionDataObject = await get_session_data(key)
@@ -95,6 +113,7 @@ async def get_user_id_from_session_data(key: str) -> int | None:
         return None
 
 
+@traced
 async def get_gyma_id_from_session_data(key: str) -> int | None:
     try:
         session_data_object: SessionDataObject = await get_session_data(key)
@@ -110,6 +129,7 @@ async def get_gyma_id_from_session_data(key: str) -> int | None:
         return False
 
 
+@traced
 async def set_session(session_data: SessionDataObject, key: str | None = None) -> str | None:
     """ Stores session data in Redis with a randomly generated key and expiration time. """
     try:
@@ -137,6 +157,7 @@ async def set_session(session_data: SessionDataObject, key: str | None = None) -
         return None
 
 
+@traced
 async def set_gyma_id_in_session(key: str, gyma_id: int) -> bool:
     """ Adds gyma_id to the existing session data. """
     session_data: SessionDataObject = await get_session_data(key)
@@ -152,6 +173,7 @@ async def set_gyma_id_in_session(key: str, gyma_id: int) -> bool:
     return False
 
 
+@traced
 async def delete_gyma_id_from_session(key: str) -> bool:
     """ Deletes gyma_id from the existing session data. """
     if key is None:
@@ -179,6 +201,7 @@ async def delete_gyma_id_from_session(key: str) -> bool:
         return False
 
 
+@traced
 async def delete_session(key: str) -> bool:
     """ Deletes the session data from Redis. """
     try:
@@ -190,7 +213,7 @@ async def delete_session(key: str) -> bool:
         if key and await get_session_data(key) is not None:
             async with redis_connection:
                 await redis_connection.delete(key)
-                logging.info(f"Deleted session data from Redis: {key}")
+                logging.info("Deleted session data from Redis")
                 return True
 
     except RedisError as e:
@@ -201,9 +224,9 @@ async def delete_session(key: str) -> bool:
         return False
 
 
+@traced
 async def generate_random_key(length: int = 16) -> str:
     """Generates a random alphanumeric string for use as a session key and makes sure it's not already used. """
-    logging.info("Generating random key for session key")
     letters_and_digits = string.ascii_letters + string.digits
     key = ''.join(random.choice(letters_and_digits) for _ in range(length))
 